@@ -2,10 +2,15 @@
 """
 Secure API Key Manager
 Gestión segura de API keys con encriptación Fernet
+
+Las keys descifradas se mantienen en memoria y sólo se vuelven a leer y
+descifrar cuando el archivo cambia (mtime/tamaño/inode), ya sea por
+save_api_keys() o por otro proceso que comparte el directorio config.
 """
 
 import os
 import json
+import threading
 from pathlib import Path
 from cryptography.fernet import Fernet
 from typing import Dict, Optional
@@ -28,6 +33,27 @@ class APIKeyManager:
         self.config_file = self.config_dir / 'api_keys.enc'
         
         self.cipher = self._get_or_create_cipher()
+        
+        # Caché de las keys descifradas, válida mientras el archivo no cambie
+        self._lock = threading.Lock()
+        self._cached_keys = None
+        self._cached_signature = None
+        self.version = 0  # Aumenta cada vez que cambia el contenido de las keys
+    
+    def _file_signature(self) -> Optional[tuple]:
+        """Identifica la versión actual del archivo (None si no existe)"""
+        try:
+            st = os.stat(self.config_file)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+    
+    def _update_cache(self, api_keys: Dict[str, str], signature: Optional[tuple]) -> None:
+        """Guarda las keys en memoria (llamar con self._lock tomado)"""
+        if api_keys != self._cached_keys:
+            self.version += 1
+        self._cached_keys = api_keys
+        self._cached_signature = signature
     
     def _get_or_create_cipher(self) -> Fernet:
         """Obtiene o crea una clave de encriptación"""
@@ -63,12 +89,18 @@ class APIKeyManager:
             # Encriptar
             encrypted_data = self.cipher.encrypt(json_data.encode('utf-8'))
             
-            # Guardar en archivo
-            with open(self.config_file, 'wb') as f:
+            # Guardar en un archivo temporal y reemplazar de forma atómica, para que
+            # otros procesos nunca lean un archivo a medio escribir
+            tmp_file = self.config_file.with_name(f'{self.config_file.name}.{os.getpid()}.tmp')
+            with open(tmp_file, 'wb') as f:
                 f.write(encrypted_data)
             
             # Proteger el archivo (solo lectura/escritura para el propietario)
-            os.chmod(self.config_file, 0o600)
+            os.chmod(tmp_file, 0o600)
+            os.replace(tmp_file, self.config_file)
+            
+            with self._lock:
+                self._update_cache(filtered_keys, self._file_signature())
             
             return True
         except Exception as e:
@@ -77,29 +109,37 @@ class APIKeyManager:
     
     def load_api_keys(self) -> Dict[str, str]:
         """
-        Carga las API keys desde el almacenamiento seguro
+        Carga las API keys desde el almacenamiento seguro (en memoria mientras
+        el archivo no cambie)
         
         Returns:
             Diccionario con las API keys {source: key}
         """
-        if not self.config_file.exists():
-            return {}
-        
-        try:
-            # Leer archivo encriptado
-            with open(self.config_file, 'rb') as f:
-                encrypted_data = f.read()
+        with self._lock:
+            signature = self._file_signature()
+            if self._cached_keys is not None and signature == self._cached_signature:
+                return dict(self._cached_keys)
             
-            # Desencriptar
-            decrypted_data = self.cipher.decrypt(encrypted_data)
+            if signature is None:
+                self._update_cache({}, None)
+                return {}
             
-            # Deserializar JSON
-            api_keys = json.loads(decrypted_data.decode('utf-8'))
+            try:
+                # Leer archivo encriptado
+                with open(self.config_file, 'rb') as f:
+                    encrypted_data = f.read()
+                
+                # Desencriptar
+                decrypted_data = self.cipher.decrypt(encrypted_data)
+                
+                # Deserializar JSON
+                api_keys = json.loads(decrypted_data.decode('utf-8'))
+            except Exception as e:
+                print(f"Error loading API keys: {e}")
+                return {}
             
-            return api_keys
-        except Exception as e:
-            print(f"Error loading API keys: {e}")
-            return {}
+            self._update_cache(api_keys, signature)
+            return dict(api_keys)
     
     def get_api_key(self, source: str) -> Optional[str]:
         """
@@ -4,20 +4,20 @@ Domain Reputation Checker - Web Application
 Flask backend for domain reputation analysis
 """
 
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, render_template, request, jsonify, send_file, Response, stream_with_context
 from flask_cors import CORS
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from flask_compress import Compress
 import sys
 import os
+import asyncio
 import re
 import ipaddress
 import logging
 from logging.handlers import RotatingFileHandler
 from io import BytesIO
-from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+from datetime import datetime, timezone
 
 # Add CLI directory to path to import the domain checker module
 # Works both in Docker (cli/) and development (../Domain-Reputation-Checker/)
@@ -87,23 +87,33 @@ def set_security_headers(response):
     response.headers['Content-Security-Policy'] = "default-src 'self'; script-src 'self' 'unsafe-inline' https://cdn.jsdelivr.net; style-src 'self' 'unsafe-inline' https://fonts.googleapis.com; img-src 'self' data: blob: https://cdn.jsdelivr.net; font-src 'self' https://fonts.gstatic.com; connect-src 'self' http://ip-api.com https://cdn.jsdelivr.net; worker-src blob:; frame-ancestors 'none'"
     return response
 
+ENV_FILE = os.path.join(os.path.dirname(__file__), 'flask-app.env')
+
+def _load_env_file():
+    """Re-read flask-app.env into the environment (runs before every configuration reload)"""
+    if os.path.exists(ENV_FILE):
+        from dotenv import load_dotenv
+        load_dotenv(ENV_FILE, override=True)
+
 def get_checker():
     """Get or initialize the domain reputation checker with API keys"""
     global checker
-    if checker is None and DomainReputationChecker:
+    if checker is not None:
+        # Cheap generation check: applies reloads published by other workers
+        checker.settings
+    elif DomainReputationChecker:
         checker = DomainReputationChecker(
             use_visual=False,
             quiet_startup=True
         )
+        checker.add_reload_hook(_load_env_file)
         
         # Inject API keys from encrypted config + environment variables
         api_keys = get_api_keys()
-        if api_keys:
-            checker.api_keys.update(api_keys)
-            # Recompute available_sources after injecting keys, since _check_api_availability
-            # ran at __init__ time before keys were loaded and would have excluded API-gated
-            # sources like Shodan even when a key is configured.
-            checker.available_sources = checker._check_api_availability()
+        # update_api_keys recomputes available_sources, since _check_api_availability
+        # ran at __init__ time before keys were loaded and would have excluded API-gated
+        # sources like Shodan even when a key is configured.
+        if checker.update_api_keys(api_keys):
             app.logger.info(f'Loaded {len(api_keys)} API keys from config/environment')
     
     return checker
@@ -112,13 +122,23 @@ def get_checker():
 import json
 from pathlib import Path
 from api_manager import APIKeyManager
+import dns_resolver
+from geolocation import get_geolocator
+from http_pool import get_session
+from ip_reputation import (analyze_ip, analyze_ips_bulk, extract_ips, take_rate_token, rate_limited,
+                           BULK_MAX_IPS, IP_PROVIDER_DEADLINES)
+from job_queue import JobQueue
+from stats_store import StatsStore
 
 # Initialize API manager globally
 api_manager = APIKeyManager()
 
+# Merged keys, reused until the encrypted config or the environment changes
+_api_keys_cache = {'signature': None, 'keys': {}}
+
 def get_api_keys():
     """Get API keys from encrypted config with fallback to environment variables"""
-    # Load from encrypted storage
+    # Load from encrypted storage (decrypted only when the file changed)
     encrypted_keys = api_manager.load_api_keys()
     
     # Environment variable mapping
@@ -138,6 +158,10 @@ def get_api_keys():
         'networksdb': 'NETWORKSDB_API_KEY'
     }
     
+    signature = (api_manager.version, tuple(os.getenv(env_var) for env_var in env_mapping.values()))
+    if signature == _api_keys_cache['signature']:
+        return dict(_api_keys_cache['keys'])
+    
     # Merge: prioritize encrypted config, fallback to environment
     api_keys = {}
     for source, env_var in env_mapping.items():
@@ -150,39 +174,28 @@ def get_api_keys():
             if env_value:
                 api_keys[source] = env_value
     
-    return api_keys
+    _api_keys_cache.update(signature=signature, keys=api_keys)
+    return dict(api_keys)
 
-STATS_FILE = Path(__file__).parent / 'stats.json'
+STATS_DB = Path(__file__).parent / 'stats.db'
+LEGACY_STATS_FILE = Path(__file__).parent / 'stats.json'  # Imported into STATS_DB once
 
-def load_stats():
-    """Load statistics from file"""
-    if STATS_FILE.exists():
-        try:
-            with open(STATS_FILE, 'r') as f:
-                return json.load(f)
-        except:
-            return {'searches': [], 'summary': {'total': 0, 'domains': 0, 'ips': 0, 'hashes': 0, 'malicious': 0, 'suspicious': 0, 'clean': 0}}
-    return {'searches': [], 'summary': {'total': 0, 'domains': 0, 'ips': 0, 'hashes': 0, 'malicious': 0, 'suspicious': 0, 'clean': 0}}
+stats_store = None
 
-def save_stats(stats):
-    """Save statistics to file"""
-    try:
-        with open(STATS_FILE, 'w') as f:
-            json.dump(stats, f, indent=2)
-    except Exception as e:
-        app.logger.error(f"Error saving stats: {e}")
+def get_stats_store():
+    """Get or open the shared statistics store"""
+    global stats_store
+    if stats_store is None:
+        stats_store = StatsStore(str(STATS_DB), legacy_file=str(LEGACY_STATS_FILE))
+    return stats_store
 
 def get_country_from_ip(ip_address):
-    """Get country from IP address using ip-api.com (free, no key required)"""
+    """Get country code for an IP (shared geolocation cache, /24 neighbours included)"""
     try:
-        import requests
-        response = requests.get(f'http://ip-api.com/json/{ip_address}?fields=country,countryCode', timeout=3)
-        if response.status_code == 200:
-            data = response.json()
-            return data.get('countryCode') or data.get('country')
-    except:
-        pass
-    return None
+        geo = get_geolocator().locate(ip_address, approximate_ok=True)
+        return geo['country_code'] or geo['country']
+    except Exception:
+        return None
 
 def get_country_flag_emoji(country_code):
     """Convert ISO country code to flag emoji"""
@@ -194,7 +207,7 @@ def get_country_flag_emoji(country_code):
     code = country_code.upper()
     return chr(ord(code[0]) + 127397) + chr(ord(code[1]) + 127397)
 
-def check_networksdb_ip(ip_address, api_key=None):
+def check_networksdb_ip(ip_address, api_key=None, rate_limiter=None):
     """Check IP address with NetworksDB.io API (ip-info and ip-geo endpoints)
     
     Returns comprehensive information including:
@@ -220,7 +233,9 @@ def check_networksdb_ip(ip_address, api_key=None):
         headers = {'X-Api-Key': api_key}
         params = {'ip': ip_address}
         
-        response = requests.get(ip_info_url, headers=headers, params=params, timeout=10)
+        if not take_rate_token(rate_limiter, 'networksdb'):
+            return rate_limited('NetworksDB.io', 'networksdb')[0]
+        response = get_session('networksdb').get(ip_info_url, headers=headers, params=params, timeout=10)
         
         if response.status_code == 200:
             data = response.json()
@@ -273,9 +288,12 @@ def check_networksdb_ip(ip_address, api_key=None):
         
         # IP Geolocation endpoint - Geographic details
         ip_geo_url = 'https://networksdb.io/api/ip-geo'
-        geo_response = requests.get(ip_geo_url, headers=headers, params=params, timeout=10)
+        # Skipped when the quota ran out after the IP info request
+        geo_response = None
+        if take_rate_token(rate_limiter, 'networksdb'):
+            geo_response = get_session('networksdb').get(ip_geo_url, headers=headers, params=params, timeout=10)
         
-        if geo_response.status_code == 200:
+        if geo_response is not None and geo_response.status_code == 200:
             geo_data = geo_response.json()
             
             if geo_data.get('continent'):
@@ -317,7 +335,7 @@ def check_networksdb_ip(ip_address, api_key=None):
         app.logger.error(f'NetworksDB IP check error: {str(e)}')
         return None
 
-def check_networksdb_domain(domain, api_key=None):
+def check_networksdb_domain(domain, api_key=None, rate_limiter=None):
     """Check domain with NetworksDB.io API (dns endpoint for forward lookup)"""
     if not api_key:
         return None
@@ -336,7 +354,9 @@ def check_networksdb_domain(domain, api_key=None):
         headers = {'X-Api-Key': api_key}
         params = {'domain': domain}
         
-        response = requests.get(dns_url, headers=headers, params=params, timeout=10)
+        if not take_rate_token(rate_limiter, 'networksdb'):
+            return rate_limited('NetworksDB.io', 'networksdb')[0]
+        response = get_session('networksdb').get(dns_url, headers=headers, params=params, timeout=10)
         
         if response.status_code == 200:
             data = response.json()
@@ -406,149 +426,46 @@ def check_networksdb_domain(domain, api_key=None):
         app.logger.error(f'NetworksDB domain check error: {str(e)}')
         return None
 
-def get_detailed_geolocation(ip_address, api_keys=None):
+def get_detailed_geolocation(ip_address, api_keys=None, rate_limiter=None):
     """Get detailed geolocation info from multiple sources (Tier 4 APIs)"""
-    import requests
     
-    geolocation = {
-        'ip': ip_address,
-        'country': None,
-        'country_code': None,
-        'country_flag': '🌐',
-        'city': None,
-        'region': None,
-        'latitude': None,
-        'longitude': None,
-        'timezone': None,
-        'isp': None,
-        'organization': None,
-        'asn': None,
-        'is_proxy': False,
-        'is_vpn': False,
-        'is_tor': False,
-        'threat_level': 'low',
-        'sources_used': []
-    }
+    # IP-API.com, IPData.co (if key available) and IPApi.co are queried concurrently;
+    # answers come from the shared geolocation cache when fresh
+    geo = get_geolocator().locate(ip_address, api_keys, threats=True, rate_limiter=rate_limiter)
     
-    # Try IP-API.com (Free, no key required - comprehensive data)
-    try:
-        response = requests.get(
-            f'http://ip-api.com/json/{ip_address}?fields=status,country,countryCode,region,city,lat,lon,timezone,isp,org,as,proxy,hosting',
-            timeout=5
-        )
-        if response.status_code == 200:
-            data = response.json()
-            if data.get('status') == 'success':
-                geolocation['country'] = data.get('country')
-                geolocation['country_code'] = data.get('countryCode')
-                geolocation['country_flag'] = get_country_flag_emoji(data.get('countryCode'))
-                geolocation['city'] = data.get('city')
-                geolocation['region'] = data.get('region')
-                geolocation['latitude'] = data.get('lat')
-                geolocation['longitude'] = data.get('lon')
-                geolocation['timezone'] = data.get('timezone')
-                geolocation['isp'] = data.get('isp')
-                geolocation['organization'] = data.get('org')
-                geolocation['asn'] = data.get('as')
-                geolocation['is_proxy'] = data.get('proxy', False)
-                geolocation['is_vpn'] = data.get('hosting', False)  # hosting often indicates VPN/datacenter
-                geolocation['sources_used'].append('IP-API.com')
-    except Exception as e:
-        app.logger.debug(f'IP-API.com failed: {str(e)}')
+    if 'KNOWN_THREAT' in geo['threats']:
+        threat_level = 'high'
+    elif geo['is_tor'] or geo['is_proxy']:
+        threat_level = 'medium'
+    else:
+        threat_level = 'low'
     
-    # Try IPData.co if API key available (Enhanced threat intelligence)
-    if api_keys and 'ipdata' in api_keys:
-        try:
-            response = requests.get(
-                f'https://api.ipdata.co/{ip_address}?api-key={api_keys["ipdata"]}',
-                timeout=5
-            )
-            if response.status_code == 200:
-                data = response.json()
-                
-                # Fill in missing data or enhance existing
-                if not geolocation['country']:
-                    geolocation['country'] = data.get('country_name')
-                if not geolocation['country_code']:
-                    geolocation['country_code'] = data.get('country_code')
-                    geolocation['country_flag'] = get_country_flag_emoji(data.get('country_code'))
-                if not geolocation['city']:
-                    geolocation['city'] = data.get('city')
-                if not geolocation['region']:
-                    geolocation['region'] = data.get('region')
-                if not geolocation['latitude']:
-                    geolocation['latitude'] = data.get('latitude')
-                if not geolocation['longitude']:
-                    geolocation['longitude'] = data.get('longitude')
-                if not geolocation['timezone']:
-                    geolocation['timezone'] = data.get('time_zone', {}).get('name')
-                if not geolocation['isp']:
-                    geolocation['isp'] = data.get('asn', {}).get('name')
-                if not geolocation['asn']:
-                    geolocation['asn'] = data.get('asn', {}).get('asn')
-                
-                # Enhanced threat detection from IPData
-                threat_data = data.get('threat', {})
-                geolocation['is_tor'] = threat_data.get('is_tor', False)
-                geolocation['is_proxy'] = threat_data.get('is_proxy', False) or geolocation['is_proxy']
-                geolocation['is_vpn'] = threat_data.get('is_vpn', False) or geolocation['is_vpn']
-                
-                if threat_data.get('is_threat'):
-                    geolocation['threat_level'] = 'high'
-                elif geolocation['is_tor'] or geolocation['is_proxy']:
-                    geolocation['threat_level'] = 'medium'
-                
-                geolocation['sources_used'].append('IPData.co')
-        except Exception as e:
-            app.logger.debug(f'IPData.co failed: {str(e)}')
-    
-    # Try IPApi.co as fallback (Free alternative)
-    if not geolocation['country']:
-        try:
-            response = requests.get(f'https://ipapi.co/{ip_address}/json/', timeout=5)
-            if response.status_code == 200:
-                data = response.json()
-                if not data.get('error'):
-                    geolocation['country'] = data.get('country_name')
-                    geolocation['country_code'] = data.get('country_code')
-                    geolocation['country_flag'] = get_country_flag_emoji(data.get('country_code'))
-                    geolocation['city'] = data.get('city')
-                    geolocation['region'] = data.get('region')
-                    geolocation['latitude'] = data.get('latitude')
-                    geolocation['longitude'] = data.get('longitude')
-                    geolocation['timezone'] = data.get('timezone')
-                    geolocation['isp'] = data.get('org')
-                    geolocation['asn'] = data.get('asn')
-                    geolocation['sources_used'].append('IPApi.co')
-        except Exception as e:
-            app.logger.debug(f'IPApi.co failed: {str(e)}')
-    
-    return geolocation
+    return {
+        'ip': ip_address,
+        'country': geo['country'],
+        'country_code': geo['country_code'],
+        'country_flag': get_country_flag_emoji(geo['country_code']),
+        'city': geo['city'],
+        'region': geo['region'],
+        'latitude': geo['latitude'],
+        'longitude': geo['longitude'],
+        'timezone': geo['timezone'],
+        'isp': geo['isp'],
+        'organization': geo['organization'],
+        'asn': geo['asn'],
+        'is_proxy': geo['is_proxy'],
+        'is_vpn': geo['is_vpn'],
+        'is_tor': geo['is_tor'],
+        'threat_level': threat_level,
+        'sources_used': geo['sources_used']
+    }
 
 def add_search_stat(search_type, target, reputation, country=None):
     """Add a search to statistics"""
-    stats = load_stats()
-    
-    search_entry = {
-        'timestamp': datetime.now().isoformat(),
-        'type': search_type,
-        'target': target,
-        'reputation': reputation,
-        'country': country
-    }
-    
-    stats['searches'].insert(0, search_entry)
-    stats['searches'] = stats['searches'][:100]  # Keep last 100
-    
-    # Update summary
-    stats['summary']['total'] += 1
-    summary_key = 'hashes' if search_type == 'hash' else f"{search_type}s"
-    stats['summary'][summary_key] = stats['summary'].get(summary_key, 0) + 1
-    
-    if reputation in ['malicious', 'suspicious', 'clean']:
-        stats['summary'][reputation] = stats['summary'].get(reputation, 0) + 1
-    
-    save_stats(stats)
+    try:
+        get_stats_store().record(search_type, target, reputation, country)
+    except Exception as e:
+        app.logger.error(f"Error saving stats: {e}")
 
 def sanitize_input(input_string):
     """
@@ -606,6 +523,220 @@ def index():
     """Serve the main page"""
     return render_template('index.html')
 
+def _domain_sources(checker_instance, domain, sources=None):
+    """Refresh API keys and pick the sources for a domain or hash; returns (is_hash, sources_list)"""
+    # Refresh API keys on every check so that keys configured after startup
+    # (e.g. Shodan added via the web UI) take effect; available_sources is
+    # only recomputed when a key actually changed.
+    _current_keys = get_api_keys()
+    checker_instance.update_api_keys(_current_keys)
+
+    # Determine if it's a hash or domain BEFORE analysis
+    is_hash = re.match(r'^[a-f0-9]{32}$|^[a-f0-9]{40}$|^[a-f0-9]{64}$', domain)
+    
+    # Parse sources if provided, or filter based on input type
+    if is_hash:
+        # MalwareBazaar and ThreatFox are public; only add VT if key is configured
+        hash_sources = ['malware_bazaar', 'threatfox']
+        if _current_keys.get('virustotal'):
+            hash_sources.insert(0, 'virustotal')
+        if sources and sources != 'all':
+            sources_list = [s.strip() for s in sources.split(',') if s.strip() in hash_sources]
+        else:
+            sources_list = hash_sources
+    else:
+        # For domains, use all sources or specified ones
+        if sources and sources != 'all':
+            sources_list = [s.strip() for s in sources.split(',')]
+        elif sources == 'all':
+            sources_list = ['all']
+        else:
+            sources_list = None
+    
+    return is_hash, sources_list
+
+def _record_domain_search(domain, is_hash, results, overall_reputation):
+    """Add a finished domain/hash analysis to the statistics; returns the resolved IP (if any)"""
+    # Hashes are counted separately from domains
+    search_type = 'hash' if is_hash else 'domain'
+    
+    # Track statistics - resolve IP first for consistent ISO country codes
+    country = None
+    resolved_ip = None
+    if search_type == 'domain':
+        try:
+            # Shared with the sources: usually answered from the resolution cache
+            resolved_ips = dns_resolver.resolve(domain)
+            if resolved_ips:
+                resolved_ip = resolved_ips[0]
+                country = get_country_from_ip(resolved_ip)
+        except:
+            pass
+    # Fallback: whois country only if IP lookup failed and it looks like ISO code
+    if not country:
+        whois_country = results.get('whois_info', {}).get('country', None)
+        if whois_country and len(str(whois_country).strip()) == 2:
+            country = str(whois_country).strip().upper()
+    
+    add_search_stat(search_type, domain, overall_reputation, country)
+    
+    app.logger.info(f'{search_type.capitalize()} analysis completed: {domain} - {overall_reputation}')
+    
+    return resolved_ip
+
+def _format_source_result(source_id, result, domain, is_hash):
+    """Shape one source result the way the dashboard renders it"""
+    formatted_result = {
+        'source': source_id.replace('_', ' ').title(),
+        'source_id': source_id,
+        'status': result.get('status', 'unknown'),
+        'reputation': result.get('reputation', 'unknown'),
+        'message': result.get('message', ''),
+        'cached_at': result.get('cached_at'),
+        'stale': bool(result.get('stale')),
+        'details': {}
+    }
+
+    # Add source-specific details
+    if result.get('status') == 'success':
+        # Copy relevant fields to details
+        detail_fields = [
+            'malicious', 'suspicious', 'harmless', 'undetected',
+            'pulse_count', 'detections', 'detection_rate', 'detected_by', 'total_engines',
+            'abuse_confidence', 'total_reports',
+            'ip_address', 'country', 'isp', 'age_years', 'age_days', 'age_risk',
+            'registrar', 'creation_date', 'scan_count', 'malicious_scans',
+            'suspicious_scans', 'analysis_count', 'malicious_indicators',
+            'malicious_indicators_found', 'suspicious_indicators',
+            'suspicious_indicators_found', 'threat_indicators', 'location',
+            'open_ports', 'countries', 'additional_ips', 'geolocation_sources',
+            'services_used', 'ioc_type', 'hash_type', 'malware_detected',
+            'file_name', 'file_type', 'file_size', 'signature', 'tags', 
+            'delivery_method', 'vt_checked', 'mb_checked', 'first_seen',
+            'attack_categories', 'recent_attacks', 'engines', 'categories'
+        ]
+
+        for field in detail_fields:
+            if field in result:
+                value = result[field]
+                # Skip empty values EXCEPT for attack fields (show them as empty to indicate no attacks)
+                if value is None or value == '':
+                    continue
+                if isinstance(value, list) and len(value) == 0:
+                    # Show empty attack fields explicitly
+                    if field in ['attack_categories', 'recent_attacks']:
+                        formatted_result['details'][field] = []  # Include empty array
+                    continue
+
+                # Special handling for VirusTotal engines - extract malicious ones
+                if field == 'engines' and isinstance(value, dict):
+                    malicious_engines = [name for name, data in value.items() 
+                                       if isinstance(data, dict) and data.get('result') not in ['clean', 'unrated', None]]
+                    if malicious_engines:
+                        formatted_result['details']['malicious_engines'] = malicious_engines[:10]  # First 10
+                    continue  # Don't add raw engines dict
+
+                # Special handling for VirusTotal categories
+                if field == 'categories' and isinstance(value, dict):
+                    # Extract non-empty categories
+                    cats = [cat for cat, val in value.items() if val]
+                    if cats:
+                        formatted_result['details']['vt_categories'] = cats[:5]  # First 5
+                    continue  # Don't add raw categories dict
+
+                formatted_result['details'][field] = value
+
+        # If the CLI result already has a pre-built details dict (e.g. Shodan via
+        # _parse_shodan_host), merge it in — fields not already set take precedence.
+        for k, v in result.get('details', {}).items():
+            if k not in formatted_result['details'] and v is not None and v != '' and not (isinstance(v, list) and len(v) == 0):
+                formatted_result['details'][k] = v
+
+    # Add investigation URL — use result's own URL or build one for hash sources
+    if 'url' in result:
+        formatted_result['url'] = result['url']
+    elif is_hash:
+        _hash_urls = {
+            'virustotal':     f'https://www.virustotal.com/gui/file/{domain}',
+            'malware_bazaar': f'https://bazaar.abuse.ch/sample/{domain}/',
+            'threatfox':      f'https://threatfox.abuse.ch/ioc/?q={domain}',
+        }
+        if source_id in _hash_urls:
+            formatted_result['url'] = _hash_urls[source_id]
+
+    # Add investigation workflow if present
+    if 'investigation_workflow' in result:
+        formatted_result['investigation_workflow'] = result['investigation_workflow']
+
+    return formatted_result
+
+def _networksdb_domain_result(checker_instance, domain):
+    """NetworksDB card for a domain (None without an API key or on failure)"""
+    api_keys = get_api_keys()
+    if not api_keys.get('networksdb'):
+        return None
+    try:
+        networksdb_result = check_networksdb_domain(domain, api_keys['networksdb'], checker_instance.rate_limiter)
+        if networksdb_result:
+            # Format NetworksDB result to match frontend structure
+            return {
+                'source': networksdb_result.get('source', 'NetworksDB.io'),
+                'source_id': 'networksdb',
+                'status': networksdb_result.get('status', 'unknown'),
+                'reputation': 'unknown',  # NetworksDB is informational, not reputation
+                'message': networksdb_result.get('message', ''),
+                'details': networksdb_result.get('details', {})
+            }
+    except Exception as e:
+        app.logger.error(f'NetworksDB domain check failed: {str(e)}')
+    return None
+
+def _domain_check_payload(checker_instance, domain, sources=None, use_cache=True, timeout=40):
+    """Analyze a sanitized domain or hash and build the /api/check response payload
+
+    Shared by the synchronous endpoint and background jobs. Raises
+    asyncio.TimeoutError when the analysis misses its ``timeout``.
+    """
+    is_hash, sources_list = _domain_sources(checker_instance, domain, sources)
+    
+    # Perform the analysis on the checker's asyncio engine with an overall deadline.
+    # Cached sources are served immediately; stale ones are refreshed in the background.
+    # Identical concurrent requests wait for one shared analysis
+    # (sources run concurrently with 20s each, so 40s covers slow ones)
+    results = checker_instance.analyze_domain_shared(
+        domain, sources_list, use_cache, allow_stale=True, timeout=timeout
+    )
+    
+    # Calculate overall reputation
+    overall_reputation = checker_instance.calculate_overall_reputation(results)
+    resolved_ip = _record_domain_search(domain, is_hash, results, overall_reputation)
+    
+    # Format results for frontend
+    formatted_results = [
+        _format_source_result(source_id, result, domain, is_hash)
+        for source_id, result in results.items()
+    ]
+    
+    # NetworksDB Check for domains (not hashes)
+    if not is_hash:
+        networksdb = _networksdb_domain_result(checker_instance, domain)
+        if networksdb:
+            formatted_results.append(networksdb)
+    
+    response_data = {
+        'domain': domain,
+        'overall_reputation': overall_reputation,
+        'results': formatted_results,
+        'stale': any(r.get('stale') for r in results.values()),
+        'timestamp': results.timestamp
+    }
+    
+    # Add resolved IP if available
+    if resolved_ip:
+        response_data['resolved_ip'] = resolved_ip
+    
+    return response_data
+
 @app.route('/api/check', methods=['POST'])
 @limiter.limit("10 per minute")  # Strict limit for analysis endpoint
 def check_domain():
@@ -629,205 +760,90 @@ def check_domain():
     if not checker_instance:
         return jsonify({'error': 'Domain reputation checker not available'}), 500
     
+    use_cache = data.get('use_cache', True) is not False
     try:
-        # Refresh API keys and available_sources on every check so that keys
-        # configured after startup (e.g. Shodan added via the web UI) take effect.
-        _current_keys = get_api_keys()
-        if _current_keys:
-            checker_instance.api_keys.update(_current_keys)
-            checker_instance.available_sources = checker_instance._check_api_availability()
-
-        # Reset results for new check
-        checker_instance.results = {}
-
-        # Determine if it's a hash or domain BEFORE analysis
-        is_hash = re.match(r'^[a-f0-9]{32}$|^[a-f0-9]{40}$|^[a-f0-9]{64}$', domain)
-        
-        # Parse sources if provided, or filter based on input type
-        if is_hash:
-            # MalwareBazaar and ThreatFox are public; only add VT if key is configured
-            _api_keys = get_api_keys()
-            hash_sources = ['malware_bazaar', 'threatfox']
-            if _api_keys.get('virustotal'):
-                hash_sources.insert(0, 'virustotal')
-            if sources and sources != 'all':
-                sources_list = [s.strip() for s in sources.split(',') if s.strip() in hash_sources]
-            else:
-                sources_list = hash_sources
-        else:
-            # For domains, use all sources or specified ones
-            if sources and sources != 'all':
-                sources_list = [s.strip() for s in sources.split(',')]
-            elif sources == 'all':
-                sources_list = ['all']
-            else:
-                sources_list = None
-        
-        # Perform the analysis with timeout (45 seconds) using ThreadPoolExecutor
-        executor = ThreadPoolExecutor(max_workers=1)
-        future = executor.submit(
-            checker_instance.analyze_domain,
-            domain,
-            sources_list,
-            False  # use_cache
-        )
-        
+        return jsonify(_domain_check_payload(checker_instance, domain, sources, use_cache))
+    except asyncio.TimeoutError:
+        app.logger.error(f'Analysis timed out for {domain}')
+        return jsonify({'error': 'Analysis timed out after 40 seconds. Sources run concurrently, but some APIs may be slow.'}), 504
+    except Exception as e:
+        app.logger.error(f'Analysis failed for {domain}: {str(e)}')
+        return jsonify({'error': f'Analysis failed: {str(e)}'}), 500
+
+def _sse(event, data):
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@app.route('/api/check/stream', methods=['GET'])
+@limiter.limit("10 per minute")
+def check_domain_stream():
+    """API endpoint streaming a domain/hash check as Server-Sent Events
+
+    Query: ?domain=...&sources=a,b&use_cache=0. Emits ``start`` with the
+    sources being checked, one ``result`` per source as soon as it finishes
+    (same shape as /api/check results), then ``done`` with the overall
+    reputation - or ``analysis_error`` (EventSource reserves ``error`` for
+    connection failures).
+    """
+    domain, error = sanitize_input(request.args.get('domain', ''))
+    if error:
+        return jsonify({'error': error}), 400
+    sources = request.args.get('sources') or None
+    use_cache = request.args.get('use_cache', '1').lower() not in ('0', 'false', 'no')
+    
+    checker_instance = get_checker()
+    if not checker_instance:
+        return jsonify({'error': 'Domain reputation checker not available'}), 500
+    
+    def generate():
         try:
-            results = future.result(timeout=40)  # 40 second timeout (CLI now parallelizes with 20s per source)
-        except FuturesTimeoutError:
-            app.logger.error(f'Analysis timed out for {domain}')
-            executor.shutdown(wait=False)
-            return jsonify({'error': 'Analysis timed out after 40 seconds. The CLI parallelizes requests, but some APIs may be slow.'}), 504
-        finally:
-            executor.shutdown(wait=False)
-        
-        # Calculate overall reputation
-        overall_reputation = checker_instance.calculate_overall_reputation()
-        
-        # Use the hash detection from earlier
-        search_type = 'hash' if is_hash else 'domain'
-        
-        # Track statistics - resolve IP first for consistent ISO country codes
-        country = None
-        resolved_ip = None
-        if search_type == 'domain':
+            is_hash, sources_list = _domain_sources(checker_instance, domain, sources)
+            yield _sse('start', {'domain': domain, 'type': 'hash' if is_hash else 'domain'})
+            
+            collected = {}
+            partial = False
+            results = None
             try:
-                import socket
-                resolved_ip = socket.gethostbyname(domain)
-                country = get_country_from_ip(resolved_ip)
-            except:
-                pass
-        # Fallback: whois country only if IP lookup failed and it looks like ISO code
-        if not country:
-            whois_country = results.get('whois_info', {}).get('country', None)
-            if whois_country and len(str(whois_country).strip()) == 2:
-                country = str(whois_country).strip().upper()
-        
-        add_search_stat(search_type, domain, overall_reputation, country)
-        
-        app.logger.info(f'{search_type.capitalize()} analysis completed: {domain} - {overall_reputation}')
-        
-        # Format results for frontend
-        formatted_results = []
-        for source_id, result in results.items():
-            formatted_result = {
-                'source': source_id.replace('_', ' ').title(),
-                'source_id': source_id,
-                'status': result.get('status', 'unknown'),
-                'reputation': result.get('reputation', 'unknown'),
-                'message': result.get('message', ''),
-                'details': {}
-            }
+                for source_id, result in checker_instance.analyze_domain_stream(
+                        domain, sources_list, use_cache, allow_stale=True, timeout=40):
+                    if source_id is None:
+                        results = result
+                        break
+                    collected[source_id] = result
+                    yield _sse('result', _format_source_result(source_id, result, domain, is_hash))
+            except asyncio.TimeoutError:
+                # Whatever finished within the deadline still makes up the verdict
+                app.logger.error(f'Streaming analysis timed out for {domain}')
+                partial = True
             
-            # Add source-specific details
-            if result.get('status') == 'success':
-                # Copy relevant fields to details
-                detail_fields = [
-                    'malicious', 'suspicious', 'harmless', 'undetected',
-                    'pulse_count', 'detections', 'detection_rate', 'detected_by', 'total_engines',
-                    'abuse_confidence', 'total_reports',
-                    'ip_address', 'country', 'isp', 'age_years', 'age_days', 'age_risk',
-                    'registrar', 'creation_date', 'scan_count', 'malicious_scans',
-                    'suspicious_scans', 'analysis_count', 'malicious_indicators',
-                    'malicious_indicators_found', 'suspicious_indicators',
-                    'suspicious_indicators_found', 'threat_indicators', 'location',
-                    'open_ports', 'countries', 'additional_ips', 'geolocation_sources',
-                    'services_used', 'ioc_type', 'hash_type', 'malware_detected',
-                    'file_name', 'file_type', 'file_size', 'signature', 'tags', 
-                    'delivery_method', 'vt_checked', 'mb_checked', 'first_seen',
-                    'attack_categories', 'recent_attacks', 'engines', 'categories'
-                ]
-                
-                for field in detail_fields:
-                    if field in result:
-                        value = result[field]
-                        # Skip empty values EXCEPT for attack fields (show them as empty to indicate no attacks)
-                        if value is None or value == '':
-                            continue
-                        if isinstance(value, list) and len(value) == 0:
-                            # Show empty attack fields explicitly
-                            if field in ['attack_categories', 'recent_attacks']:
-                                formatted_result['details'][field] = []  # Include empty array
-                            continue
-                        
-                        # Special handling for VirusTotal engines - extract malicious ones
-                        if field == 'engines' and isinstance(value, dict):
-                            malicious_engines = [name for name, data in value.items() 
-                                               if isinstance(data, dict) and data.get('result') not in ['clean', 'unrated', None]]
-                            if malicious_engines:
-                                formatted_result['details']['malicious_engines'] = malicious_engines[:10]  # First 10
-                            continue  # Don't add raw engines dict
-                        
-                        # Special handling for VirusTotal categories
-                        if field == 'categories' and isinstance(value, dict):
-                            # Extract non-empty categories
-                            cats = [cat for cat, val in value.items() if val]
-                            if cats:
-                                formatted_result['details']['vt_categories'] = cats[:5]  # First 5
-                            continue  # Don't add raw categories dict
-                        
-                        formatted_result['details'][field] = value
-
-                # If the CLI result already has a pre-built details dict (e.g. Shodan via
-                # _parse_shodan_host), merge it in — fields not already set take precedence.
-                for k, v in result.get('details', {}).items():
-                    if k not in formatted_result['details'] and v is not None and v != '' and not (isinstance(v, list) and len(v) == 0):
-                        formatted_result['details'][k] = v
-
-            # Add investigation URL — use result's own URL or build one for hash sources
-            if 'url' in result:
-                formatted_result['url'] = result['url']
-            elif is_hash:
-                _hash_urls = {
-                    'virustotal':     f'https://www.virustotal.com/gui/file/{domain}',
-                    'malware_bazaar': f'https://bazaar.abuse.ch/sample/{domain}/',
-                    'threatfox':      f'https://threatfox.abuse.ch/ioc/?q={domain}',
-                }
-                if source_id in _hash_urls:
-                    formatted_result['url'] = _hash_urls[source_id]
+            if results is None:
+                results = collected
             
-            # Add investigation workflow if present
-            if 'investigation_workflow' in result:
-                formatted_result['investigation_workflow'] = result['investigation_workflow']
+            if not is_hash:
+                networksdb = _networksdb_domain_result(checker_instance, domain)
+                if networksdb:
+                    yield _sse('result', networksdb)
             
-            formatted_results.append(formatted_result)
-        
-        # NetworksDB Check for domains (not hashes)
-        if not is_hash:
-            api_keys = get_api_keys()
-            if api_keys.get('networksdb'):
-                try:
-                    networksdb_result = check_networksdb_domain(domain, api_keys['networksdb'])
-                    if networksdb_result:
-                        # Format NetworksDB result to match frontend structure
-                        formatted_networksdb = {
-                            'source': networksdb_result.get('source', 'NetworksDB.io'),
-                            'source_id': 'networksdb',
-                            'status': networksdb_result.get('status', 'unknown'),
-                            'reputation': 'unknown',  # NetworksDB is informational, not reputation
-                            'message': networksdb_result.get('message', ''),
-                            'details': networksdb_result.get('details', {})
-                        }
-                        formatted_results.append(formatted_networksdb)
-                except Exception as e:
-                    app.logger.error(f'NetworksDB domain check failed: {str(e)}')
-        
-        response_data = {
-            'domain': domain,
-            'overall_reputation': overall_reputation,
-            'results': formatted_results,
-            'timestamp': checker_instance.results.get('timestamp', None)
-        }
-        
-        # Add resolved IP if available
-        if resolved_ip:
-            response_data['resolved_ip'] = resolved_ip
-        
-        return jsonify(response_data)
-        
-    except Exception as e:
-        app.logger.error(f'Analysis failed for {domain}: {str(e)}')
-        return jsonify({'error': f'Analysis failed: {str(e)}'}), 500
+            overall_reputation = checker_instance.calculate_overall_reputation(results)
+            resolved_ip = _record_domain_search(domain, is_hash, results, overall_reputation)
+            done = {
+                'domain': domain,
+                'overall_reputation': overall_reputation,
+                'stale': any(r.get('stale') for r in results.values()),
+                'partial': partial,
+                'timestamp': getattr(results, 'timestamp', datetime.now().isoformat())
+            }
+            if resolved_ip:
+                done['resolved_ip'] = resolved_ip
+            yield _sse('done', done)
+        except Exception as e:
+            app.logger.error(f'Streaming analysis failed for {domain}: {str(e)}')
+            yield _sse('analysis_error', {'error': f'Analysis failed: {str(e)}'})
+    
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # Disable proxy buffering (nginx)
+    return response
 
 @app.route('/api/sources', methods=['GET'])
 def get_sources():
@@ -1207,6 +1223,101 @@ def export_csv():
         app.logger.error(f'CSV export failed: {str(e)}')
         return jsonify({'error': f'CSV export failed: {str(e)}'}), 500
 
+def _networksdb_ip_provider(ip_address, api_keys, rate_limiter=None):
+    """NetworksDB card for the IP pipeline (informational, not scored)"""
+    if not api_keys.get('networksdb'):
+        return None
+    networksdb_result = check_networksdb_ip(ip_address, api_keys['networksdb'], rate_limiter)
+    return (networksdb_result, None) if networksdb_result else None
+
+def _geolocation_card(geolocation):
+    """Format get_detailed_geolocation() output as a result card"""
+    geo_details = {}
+    if geolocation['country']:
+        geo_details['location'] = f"{geolocation['country_flag']} {geolocation['country']}"
+    if geolocation['city'] and geolocation['region']:
+        geo_details['city_region'] = f"{geolocation['city']}, {geolocation['region']}"
+    elif geolocation['city']:
+        geo_details['city'] = geolocation['city']
+    elif geolocation['region']:
+        geo_details['region'] = geolocation['region']
+    if geolocation['latitude'] and geolocation['longitude']:
+        geo_details['coordinates'] = f"{geolocation['latitude']}, {geolocation['longitude']}"
+    if geolocation['timezone']:
+        geo_details['timezone'] = geolocation['timezone']
+    if geolocation['isp']:
+        geo_details['isp'] = geolocation['isp']
+    if geolocation['organization']:
+        geo_details['organization'] = geolocation['organization']
+    if geolocation['asn']:
+        geo_details['asn'] = geolocation['asn']
+    
+    # Threat indicators
+    threat_indicators = []
+    if geolocation['is_tor']:
+        threat_indicators.append('🔒 Tor Exit Node')
+    if geolocation['is_proxy']:
+        threat_indicators.append('🌐 Proxy Server')
+    if geolocation['is_vpn']:
+        threat_indicators.append('🛡️ VPN/Datacenter')
+    
+    if threat_indicators:
+        geo_details['threat_indicators'] = ', '.join(threat_indicators)
+        geo_details['threat_level'] = geolocation['threat_level'].upper()
+    
+    if geolocation['sources_used']:
+        geo_details['data_sources'] = ', '.join(geolocation['sources_used'])
+    
+    return {
+        'source': 'Geolocation & Network Info',
+        'status': 'success',
+        'details': geo_details
+    }
+
+def _analyze_ip(checker_instance, ip_address):
+    """Run the IP reputation pipeline and return the JSON payload for /api/check-ip"""
+    # Refresh API keys on every request (mirrors domain check behavior)
+    _api_keys = get_api_keys()
+    checker_instance.update_api_keys(_api_keys)
+    
+    geolocation = {}
+    
+    def geolocation_provider(ip, api_keys, rate_limiter=None):
+        geolocation.update(get_detailed_geolocation(ip, api_keys, rate_limiter))
+        return _geolocation_card(geolocation), None
+    
+    # All providers run concurrently, each with its own deadline
+    payload = analyze_ip(
+        ip_address, _api_keys, checker_instance.rate_limiter,
+        extra_providers=[
+            ('networksdb', 'NetworksDB.io', _networksdb_ip_provider),
+            ('geolocation', 'Geolocation & Network Info', geolocation_provider),
+        ],
+        log=app.logger
+    )
+    payload['country'] = geolocation.get('country_code')
+    
+    if payload['timed_out']:
+        app.logger.warning(f"IP analysis for {ip_address} timed out on: {', '.join(payload['timed_out'])}")
+    app.logger.info(f"IP analysis completed: {ip_address} - {payload['reputation']} (APIs used: {len(payload['results'])})")
+    
+    return payload
+
+def _ip_check_payload(checker_instance, ip_address):
+    """Analyze a normalized IP (coalescing identical requests) and record the search"""
+    # Identical concurrent requests wait for one shared analysis, at most as long
+    # as the slowest provider may take
+    payload = checker_instance.single_flight.do(
+        ['ip', ip_address], lambda: _analyze_ip(checker_instance, ip_address),
+        timeout=max(IP_PROVIDER_DEADLINES.values())
+    )
+    
+    # Track statistics (the geolocation provider already resolved the country)
+    country = payload.get('country') or get_country_from_ip(ip_address)
+    add_search_stat('ip', ip_address, payload['reputation'], country)
+    
+    return payload
+
 @app.route('/api/check-ip', methods=['POST'])
 @limiter.limit("10 per minute")
 def check_ip():
@@ -1232,454 +1343,210 @@ def check_ip():
         if not checker_instance:
             return jsonify({'error': 'Domain reputation checker not available'}), 500
 
-        # Refresh API keys on every request (mirrors domain check behavior)
-        _api_keys = get_api_keys()
-        if _api_keys:
-            checker_instance.api_keys.update(_api_keys)
+        return jsonify(_ip_check_payload(checker_instance, ip_address))
+        
+    except Exception as e:
+        app.logger.error(f'IP analysis failed for {ip_address}: {str(e)}')
+        return jsonify({'error': f'IP analysis failed: {str(e)}'}), 500
 
-        # Reset results for new check
-        checker_instance.results = {}
+@app.route('/api/check-ips', methods=['POST'])
+@limiter.limit("5 per minute")
+def check_ips():
+    """API endpoint to check many IPs at once, streamed back as NDJSON
 
-        # Call AbuseIPDB if available
-        formatted_results = {}
-        overall_score = 0
-        scores_count = 0
+    Accepts {"ips": [...]} or a plain-text body (IP list or raw log lines).
+    Emits one JSON line per unique IP, then a summary line.
+    """
+    data = request.get_json(silent=True)
+    if data is not None:
+        raw = data.get('ips') if isinstance(data, dict) else data
+        if isinstance(raw, str):
+            raw = raw.splitlines()
+        if not isinstance(raw, list):
+            return jsonify({'error': 'A list of IP addresses is required'}), 400
+        ip_addresses = extract_ips(str(item) for item in raw)
+    else:
+        ip_addresses = extract_ips(request.get_data(as_text=True).splitlines())
+
+    if not ip_addresses:
+        return jsonify({'error': 'No valid IP addresses found'}), 400
+    if len(ip_addresses) > BULK_MAX_IPS:
+        return jsonify({'error': f'Too many IP addresses ({len(ip_addresses)}), maximum is {BULK_MAX_IPS}'}), 400
 
-        # AbuseIPDB Check (direct API call — supports IPv4 and IPv6)
-        if _api_keys.get('abuseipdb'):
-            try:
-                import requests as _req
-                abuse_resp = _req.get(
-                    'https://api.abuseipdb.com/api/v2/check',
-                    headers={'Key': _api_keys['abuseipdb'], 'Accept': 'application/json'},
-                    params={'ipAddress': ip_address, 'maxAgeInDays': 90},
-                    timeout=10
-                )
-                if abuse_resp.status_code == 200:
-                    ad = abuse_resp.json().get('data', {})
-                    confidence = ad.get('abuseConfidenceScore', 0)
-                    if confidence >= 75:
-                        abuse_rep = 'malicious'
-                        overall_score -= 3
-                    elif confidence >= 25:
-                        abuse_rep = 'suspicious'
-                        overall_score -= 2
-                    else:
-                        abuse_rep = 'clean'
-                        overall_score += 1
-                    scores_count += 1
-                    formatted_results['abuseipdb'] = {
-                        'source': 'AbuseIPDB',
-                        'status': 'success',
-                        'reputation': abuse_rep,
-                        'details': {
-                            'confidence': f"{confidence}%",
-                            'reports': ad.get('totalReports', 0),
-                            'last_reported': ad.get('lastReportedAt') or 'N/A',
-                            'country': ad.get('countryCode', 'Unknown'),
-                            'isp': ad.get('isp', 'Unknown'),
-                            'usage_type': ad.get('usageType', 'Unknown'),
-                        }
-                    }
-                else:
-                    formatted_results['abuseipdb'] = {
-                        'source': 'AbuseIPDB', 'status': 'error',
-                        'message': f'API error {abuse_resp.status_code}'
-                    }
-            except Exception as e:
-                app.logger.error(f'AbuseIPDB check failed: {str(e)}')
-                formatted_results['abuseipdb'] = {
-                    'source': 'AbuseIPDB', 'status': 'error', 'message': 'Check failed'
-                }
-        
-        # VirusTotal IP Check
-        if 'virustotal' in checker_instance.api_keys:
-            try:
-                import requests
-                vt_url = f"https://www.virustotal.com/api/v3/ip_addresses/{ip_address}"
-                headers = {'x-apikey': checker_instance.api_keys['virustotal']}
-                response = requests.get(vt_url, headers=headers, timeout=10)
-                
-                if response.status_code == 200:
-                    vt_data = response.json().get('data', {}).get('attributes', {})
-                    stats = vt_data.get('last_analysis_stats', {})
-                    malicious = stats.get('malicious', 0)
-                    suspicious = stats.get('suspicious', 0)
-                    
-                    vt_reputation = 'clean'
-                    if malicious >= 5:
-                        vt_reputation = 'malicious'
-                        overall_score -= 3
-                    elif malicious >= 2 or suspicious >= 5:
-                        vt_reputation = 'suspicious'
-                        overall_score -= 2
-                    else:
-                        overall_score += 1
-                    
-                    formatted_results['virustotal'] = {
-                        'source': 'VirusTotal',
-                        'status': 'success',
-                        'reputation': vt_reputation,
-                        'details': {
-                            'malicious': malicious,
-                            'suspicious': suspicious,
-                            'harmless': stats.get('harmless', 0),
-                            'undetected': stats.get('undetected', 0),
-                            'country': vt_data.get('country', 'Unknown'),
-                            'as_owner': vt_data.get('as_owner', 'Unknown')
-                        }
-                    }
-                    scores_count += 1
-            except Exception as e:
-                app.logger.error(f'VirusTotal IP check failed: {str(e)}')
-                formatted_results['virustotal'] = {
-                    'source': 'VirusTotal',
-                    'status': 'error',
-                    'message': 'Check failed'
-                }
-        
-        # Shodan IP Check
-        api_keys = get_api_keys()
-        if api_keys.get('shodan'):
-            try:
-                import requests as _req
-                shodan_key = api_keys['shodan']
-                try:
-                    info_resp = _req.get(
-                        f"https://api.shodan.io/api-info?key={shodan_key}", timeout=5
-                    )
-                    scheme = "https" if info_resp.json().get("https", False) else "http"
-                except Exception:
-                    scheme = "https"
-
-                shodan_resp = _req.get(
-                    f"{scheme}://api.shodan.io/shodan/host/{ip_address}?key={shodan_key}",
-                    timeout=15,
-                    verify=(scheme == "https")
-                )
-                if shodan_resp.status_code == 200:
-                    sd = shodan_resp.json()
-
-                    # Build services list: "80/tcp (Apache httpd 2.4.51)"
-                    services = []
-                    for entry in sd.get('data', []):
-                        port = entry.get('port', '')
-                        transport = entry.get('transport', 'tcp')
-                        product = entry.get('product', '')
-                        version = entry.get('version', '')
-                        module = entry.get('_shodan', {}).get('module', '')
-                        label = product or module or ''
-                        if version:
-                            label = f"{label} {version}".strip()
-                        svc = f"{port}/{transport}"
-                        if label:
-                            svc += f" ({label})"
-                        services.append(svc)
-
-                    open_ports = sorted({e.get('port', 0) for e in sd.get('data', [])})
-                    vulns_raw = sd.get('vulns', {})
-                    vulns = list(vulns_raw.keys()) if isinstance(vulns_raw, dict) else (vulns_raw if isinstance(vulns_raw, list) else [])
-                    tags = sd.get('tags', [])
-                    hostnames = sd.get('hostnames', [])
-                    domains_found = sd.get('domains', [])
-                    location_parts = [p for p in [sd.get('city'), sd.get('region_code'), sd.get('country_name')] if p]
-
-                    ssl_info = ''
-                    for entry in sd.get('data', []):
-                        if 'ssl' in entry:
-                            cert = entry['ssl'].get('cert', {})
-                            cn = cert.get('subject', {}).get('CN', '')
-                            expires = cert.get('expires', '')
-                            if cn:
-                                ssl_info = cn + (f' (exp: {expires})' if expires else '')
-                            break
-
-                    suspicious_set = {21, 22, 23, 25, 135, 139, 445, 1433, 3306, 3389, 5900, 6379, 27017}
-                    suspicious_count = len(set(open_ports).intersection(suspicious_set))
-
-                    if vulns or suspicious_count > 3 or 'honeypot' in tags:
-                        sd_rep = 'suspicious'
-                        overall_score -= 2
-                    elif suspicious_count > 0 or tags:
-                        sd_rep = 'questionable'
-                        overall_score -= 1
-                    else:
-                        sd_rep = 'clean'
-                        overall_score += 0.5
-                    scores_count += 1
-
-                    details = {}
-                    if sd.get('org'):
-                        details['organization'] = sd['org']
-                    if sd.get('isp') and sd.get('isp') != sd.get('org'):
-                        details['isp'] = sd['isp']
-                    if sd.get('asn'):
-                        details['asn'] = sd['asn']
-                    if location_parts:
-                        details['location'] = ', '.join(location_parts)
-                    if sd.get('os'):
-                        details['operating_system'] = sd['os']
-                    if open_ports:
-                        details['open_ports'] = open_ports
-                    if services:
-                        details['services'] = services
-                    if vulns:
-                        details['vulnerabilities'] = vulns
-                    if tags:
-                        details['tags'] = tags
-                    if hostnames:
-                        details['hostnames'] = hostnames[:10]
-                    if domains_found:
-                        details['domains'] = domains_found[:10]
-                    if ssl_info:
-                        details['ssl_certificate'] = ssl_info
-                    if sd.get('last_update'):
-                        details['last_update'] = sd['last_update']
-
-                    formatted_results['shodan'] = {
-                        'source': 'Shodan',
-                        'source_id': 'shodan',
-                        'status': 'success',
-                        'reputation': sd_rep,
-                        'details': details,
-                        'url': f"https://www.shodan.io/host/{ip_address}",
-                    }
-                elif shodan_resp.status_code == 404:
-                    formatted_results['shodan'] = {
-                        'source': 'Shodan', 'status': 'not_found',
-                        'message': 'No Shodan data for this IP'
-                    }
-                else:
-                    formatted_results['shodan'] = {
-                        'source': 'Shodan', 'status': 'error',
-                        'message': f'Shodan API error: HTTP {shodan_resp.status_code}'
-                    }
-            except Exception as e:
-                app.logger.error(f'Shodan IP check failed: {str(e)}')
-                formatted_results['shodan'] = {
-                    'source': 'Shodan', 'status': 'error', 'message': 'Check failed'
-                }
+    checker_instance = get_checker()
+    if not checker_instance:
+        return jsonify({'error': 'Domain reputation checker not available'}), 500
 
-        # NetworksDB Check
-        if api_keys.get('networksdb'):
-            try:
-                networksdb_result = check_networksdb_ip(ip_address, api_keys['networksdb'])
-                if networksdb_result:
-                    formatted_results['networksdb'] = networksdb_result
-            except Exception as e:
-                app.logger.error(f'NetworksDB IP check failed: {str(e)}')
-                formatted_results['networksdb'] = {
-                    'source': 'NetworksDB.io',
-                    'status': 'error',
-                    'message': 'Check failed'
-                }
-        
-        # DNS Blacklist checks (comprehensive list - 30+ important blacklists)
-        import socket
-        from concurrent.futures import ThreadPoolExecutor, as_completed
-        
-        blacklists = [
-            # Tier 1 - Most Important (High Authority)
-            'zen.spamhaus.org',          # Spamhaus combined list
-            'bl.spamcop.net',            # SpamCop
-            'b.barracudacentral.org',    # Barracuda
-            'dnsbl.sorbs.net',           # SORBS aggregate
-            'bl.blocklist.de',           # Blocklist.de
-            'cbl.abuseat.org',           # Composite Blocking List
-            'psbl.surriel.com',          # Passive Spam Block List
-            
-            # Tier 2 - Important (Widely Used)
-            'dnsbl-1.uceprotect.net',    # UCEProtect Level 1
-            'dnsbl-2.uceprotect.net',    # UCEProtect Level 2
-            'spam.dnsbl.sorbs.net',      # SORBS spam sources
-            'http.dnsbl.sorbs.net',      # SORBS HTTP proxies
-            'misc.dnsbl.sorbs.net',      # SORBS misc
-            'smtp.dnsbl.sorbs.net',      # SORBS SMTP
-            'socks.dnsbl.sorbs.net',     # SORBS SOCKS
-            'web.dnsbl.sorbs.net',       # SORBS web servers
-            'zombie.dnsbl.sorbs.net',    # SORBS zombies
-            
-            # Tier 3 - Additional Coverage
-            'dyna.spamrats.com',         # SpamRats dynamic
-            'spam.spamrats.com',         # SpamRats spam
-            'noptr.spamrats.com',        # SpamRats no PTR
-            'ubl.unsubscore.com',        # Lashback UBL
-            'rbl.realtimeblacklist.com', # RBL
-            'ix.dnsbl.manitu.net',       # NiX Spam
-            'dnsbl.inps.de',             # INPS
-            'bl.mailspike.net',          # Mailspike
-            'bl.spameatingmonkey.net',   # Spam Eating Monkey
-            'dnsbl.cobion.com',          # Cobion
-            'rbl.efnetrbl.org',          # EFnet RBL
-            'blackholes.mail-abuse.org', # MAPS RBL
-            'dnsbl.httpbl.org',          # Project Honey Pot
-            'truncate.gbudb.net'         # GBUdb
-        ]
-        
-        def check_blacklist(bl_domain):
-            try:
-                addr = ipaddress.ip_address(ip_address)
-                if addr.version == 6:
-                    nibbles = addr.exploded.replace(':', '')
-                    reversed_addr = '.'.join(reversed(nibbles))
-                else:
-                    reversed_addr = '.'.join(reversed(ip_address.split('.')))
-                query = f"{reversed_addr}.{bl_domain}"
-                socket.gethostbyname(query)
-                return True
-            except:
-                return False
-        
-        blacklist_results = []
-        with ThreadPoolExecutor(max_workers=15) as executor:  # Increased for faster parallel checks
-            futures = {executor.submit(check_blacklist, bl): bl for bl in blacklists}
-            for future in as_completed(futures):
-                bl = futures[future]
-                if future.result():
-                    blacklist_results.append(bl)
-        
-        # Get hostname
+    def generate():
+        # Per-IP statistics are not recorded: a single log dump would flood the history
+        summary = {'malicious': 0, 'suspicious': 0, 'questionable': 0, 'clean': 0, 'unknown': 0}
         try:
-            hostname = socket.gethostbyaddr(ip_address)[0]
-        except:
-            hostname = 'No hostname'
-        
-        formatted_results['blacklist_check'] = {
-            'source': 'DNS Blacklists (30+ Sources)',
-            'status': 'success',
-            'details': {
-                'checked': len(blacklists),
-                'listed': len(blacklist_results),
-                'blacklists': blacklist_results if blacklist_results else [],
-                'hostname': hostname
-            }
-        }
-        
-        # Get detailed geolocation with Tier 4 APIs
-        api_keys = get_api_keys()
-        geolocation = get_detailed_geolocation(ip_address, api_keys)
-        
-        # Format geolocation as a separate result card
-        geo_details = {}
-        if geolocation['country']:
-            geo_details['location'] = f"{geolocation['country_flag']} {geolocation['country']}"
-        if geolocation['city'] and geolocation['region']:
-            geo_details['city_region'] = f"{geolocation['city']}, {geolocation['region']}"
-        elif geolocation['city']:
-            geo_details['city'] = geolocation['city']
-        elif geolocation['region']:
-            geo_details['region'] = geolocation['region']
-        if geolocation['latitude'] and geolocation['longitude']:
-            geo_details['coordinates'] = f"{geolocation['latitude']}, {geolocation['longitude']}"
-        if geolocation['timezone']:
-            geo_details['timezone'] = geolocation['timezone']
-        if geolocation['isp']:
-            geo_details['isp'] = geolocation['isp']
-        if geolocation['organization']:
-            geo_details['organization'] = geolocation['organization']
-        if geolocation['asn']:
-            geo_details['asn'] = geolocation['asn']
-        
-        # Threat indicators
-        threat_indicators = []
-        if geolocation['is_tor']:
-            threat_indicators.append('🔒 Tor Exit Node')
-        if geolocation['is_proxy']:
-            threat_indicators.append('🌐 Proxy Server')
-        if geolocation['is_vpn']:
-            threat_indicators.append('🛡️ VPN/Datacenter')
-        
-        if threat_indicators:
-            geo_details['threat_indicators'] = ', '.join(threat_indicators)
-            geo_details['threat_level'] = geolocation['threat_level'].upper()
-        
-        if geolocation['sources_used']:
-            geo_details['data_sources'] = ', '.join(geolocation['sources_used'])
-        
-        formatted_results['geolocation'] = {
-            'source': 'Geolocation & Network Info',
-            'status': 'success',
-            'details': geo_details
+            for payload in analyze_ips_bulk(ip_addresses, checker_instance.api_keys,
+                                            checker_instance.rate_limiter, log=app.logger):
+                summary[payload['reputation']] = summary.get(payload['reputation'], 0) + 1
+                yield json.dumps(payload) + '\n'
+        except Exception as e:
+            app.logger.error(f'Bulk IP analysis failed: {str(e)}')
+            yield json.dumps({'error': f'Bulk IP analysis failed: {str(e)}'}) + '\n'
+        yield json.dumps({'summary': summary, 'total': len(ip_addresses)}) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+# Background analysis jobs
+job_queue = None
+
+JOB_TIMEOUT = 120  # Queued analyses do not hold a request open, so slow sources get longer
+
+def _run_domain_job(params):
+    checker_instance = get_checker()
+    if not checker_instance:
+        raise RuntimeError('Domain reputation checker not available')
+    return _domain_check_payload(checker_instance, params['domain'], params.get('sources'),
+                                 params.get('use_cache', True), timeout=JOB_TIMEOUT)
+
+def _run_ip_job(params):
+    checker_instance = get_checker()
+    if not checker_instance:
+        raise RuntimeError('Domain reputation checker not available')
+    return _ip_check_payload(checker_instance, params['ip'])
+
+def get_job_queue(workers=None):
+    """Get or open the shared job queue and start its workers
+
+    The queue lives next to the checker cache, so every process of this
+    deployment (web workers and worker.py) shares it. JOB_WORKERS sets the
+    worker threads per web process; 0 makes the web tier enqueue only.
+    """
+    global job_queue
+    if job_queue is None:
+        checker_instance = get_checker()
+        if not checker_instance:
+            return None
+        if workers is None:
+            workers = int(os.getenv('JOB_WORKERS', '4'))
+        job_queue = JobQueue(
+            os.path.splitext(checker_instance.cache_file)[0] + '_queue.db',
+            {'domain': _run_domain_job, 'ip': _run_ip_job},
+            workers=workers,
+            logger=app.logger
+        )
+        job_queue.start()
+    return job_queue
+
+@app.route('/api/jobs', methods=['POST'])
+@limiter.limit("10 per minute")
+def submit_job():
+    """API endpoint to queue a domain/hash or IP analysis and return its job ID immediately"""
+    data = request.get_json()
+    
+    if not data:
+        return jsonify({'error': 'Domain or IP is required'}), 400
+    
+    if data.get('ip') or data.get('type') == 'ip':
+        try:
+            params = {'ip': str(ipaddress.ip_address(str(data.get('ip', '')).strip()))}
+        except ValueError:
+            return jsonify({'error': 'Invalid IP address format'}), 400
+        kind = 'ip'
+    else:
+        domain, error = sanitize_input(data.get('domain'))
+        if error:
+            return jsonify({'error': error}), 400
+        params = {
+            'domain': domain,
+            'sources': data.get('sources'),
+            'use_cache': data.get('use_cache', True) is not False
         }
-        
-        # Add blacklist score (adjusted for 30+ blacklists)
-        listed_percentage = (len(blacklist_results) / len(blacklists)) * 100
-        
-        if listed_percentage >= 20:  # Listed in 20%+ of blacklists (6+)
-            overall_score -= 3
-        elif listed_percentage >= 10:  # Listed in 10-20% (3-5)
-            overall_score -= 2
-        elif listed_percentage >= 3:   # Listed in 3-10% (1-2)
-            overall_score -= 1
-        else:  # Clean or minimal listings
-            overall_score += 0.5
-        scores_count += 1
-        
-        # Calculate final reputation
-        if scores_count > 0:
-            avg_score = overall_score / scores_count
-            if avg_score <= -1.5:
-                reputation = 'malicious'
-            elif avg_score <= -0.5:
-                reputation = 'suspicious'
-            elif avg_score <= 0.3:
-                reputation = 'questionable'
-            else:
-                reputation = 'clean'
-        else:
-            reputation = 'unknown'
-        
-        # Track statistics
-        country = get_country_from_ip(ip_address)
-        add_search_stat('ip', ip_address, reputation, country)
-        app.logger.info(f'IP analysis completed: {ip_address} - {reputation} (APIs used: {len(formatted_results)})')
-        
-        # Convert formatted_results dict to list for frontend compatibility
-        results_list = list(formatted_results.values())
-        
-        return jsonify({
-            'ip': ip_address,
-            'reputation': reputation,
-            'results': results_list
-        })
-        
-    except Exception as e:
-        app.logger.error(f'IP analysis failed for {ip_address}: {str(e)}')
-        return jsonify({'error': f'IP analysis failed: {str(e)}'}), 500
+        kind = 'domain'
+    
+    queue_instance = get_job_queue()
+    if not queue_instance:
+        return jsonify({'error': 'Domain reputation checker not available'}), 500
+    
+    job_id = queue_instance.submit(kind, params)
+    app.logger.info(f'Queued {kind} job {job_id}')
+    return jsonify({
+        'job_id': job_id,
+        'status': 'queued',
+        'status_url': f'/api/jobs/{job_id}'
+    }), 202
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+@limiter.limit("120 per minute")
+def get_job(job_id):
+    """API endpoint to poll a job; ?wait=N blocks up to N seconds (max 30) for it to finish"""
+    queue_instance = get_job_queue()
+    if not queue_instance:
+        return jsonify({'error': 'Domain reputation checker not available'}), 500
+    
+    try:
+        wait = min(max(float(request.args.get('wait', 0)), 0), 30)
+    except ValueError:
+        return jsonify({'error': 'wait must be a number of seconds'}), 400
+    
+    job = queue_instance.wait(job_id, wait) if wait else queue_instance.get(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
 
 @app.route('/api/statistics', methods=['GET'])
 def get_statistics():
-    """API endpoint to get statistics"""
+    """API endpoint to get statistics (?limit=N&offset=M pages through the search history)
+
+    Served with an ETag (the store generation) and Last-Modified, so a
+    dashboard poll with nothing new is answered 304 without running a query.
+    """
     try:
-        stats = load_stats()
-        
-        # Process data for frontend
-        recent_searches = stats['searches'][:20]
-        summary = stats['summary']
-        
-        # Calculate threat map data (group by country)
-        threat_map = {}
-        for search in stats['searches']:
-            if search.get('country') and search.get('reputation') in ['malicious', 'suspicious', 'questionable']:
-                country = search['country']
-                threat_map[country] = threat_map.get(country, 0) + 1
-
-        # Top threats
-        top_threats = sorted(threat_map.items(), key=lambda x: x[1], reverse=True)[:20]
-        
-        # Reputation distribution
-        reputation_dist = {
-            'malicious': summary.get('malicious', 0),
-            'suspicious': summary.get('suspicious', 0),
-            'clean': summary.get('clean', 0)
-        }
+        store = get_stats_store()
+        limit = min(max(request.args.get('limit', 20, type=int), 1), 500)
+        offset = max(request.args.get('offset', 0, type=int), 0)
+        
+        generation, updated = store.version()
+        etag = f'stats-{generation}-{limit}-{offset}'
+        last_modified = datetime.fromtimestamp(int(updated), timezone.utc) if updated else None
+        not_modified = (
+            # Flask-Compress tags compressed bodies as "<etag>:gzip"; the statistics are the same
+            any(tag.split(':', 1)[0] == etag for tag in request.if_none_match.as_set())
+            if request.if_none_match
+            else bool(last_modified and request.if_modified_since
+                      and last_modified <= request.if_modified_since)
+        )
+        if not_modified:
+            response = Response(status=304)
+        else:
+            # Process data for frontend (every figure is pre-aggregated at write time)
+            recent_searches = store.recent(limit, offset)
+            summary = store.summary()
+            
+            # Threat map data (searches with a bad verdict, grouped by country)
+            top_threats = store.threat_map(20)
+            
+            # Reputation distribution
+            reputation_dist = {
+                'malicious': summary.get('malicious', 0),
+                'suspicious': summary.get('suspicious', 0),
+                'clean': summary.get('clean', 0)
+            }
+            
+            response = jsonify({
+                'summary': summary,
+                'recent_searches': recent_searches,
+                'threat_map': top_threats,
+                'reputation_distribution': reputation_dist,
+                'country_reputation': store.country_reputation(),
+                'timeline': {
+                    'hourly': store.timeline('hour', 24),
+                    'daily': store.timeline('day', 30)
+                },
+                'top_indicators': store.top_indicators(10)
+            })
         
-        return jsonify({
-            'summary': summary,
-            'recent_searches': recent_searches,
-            'threat_map': top_threats,
-            'reputation_distribution': reputation_dist
-        })
+        response.set_etag(etag)
+        if last_modified:
+            response.last_modified = last_modified
+        # Cached by the browser, but revalidated on every poll
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -1798,21 +1665,28 @@ def save_api_config():
 
 @app.route('/api/config/refresh-env', methods=['POST'])
 def refresh_env_variables():
-    """Reload environment variables from flask-app.env file"""
+    """Reload environment variables from flask-app.env file
+
+    The checker swaps in a new configuration snapshot instead of being rebuilt,
+    and the reload is published to every worker through the shared generation
+    counter (each one re-reads flask-app.env on its next request).
+    """
     try:
-        from dotenv import load_dotenv
-        
-        # Path to flask-app.env
-        env_file = os.path.join(os.path.dirname(__file__), 'flask-app.env')
-        
-        if not os.path.exists(env_file):
+        if not os.path.exists(ENV_FILE):
             return jsonify({
                 'error': 'flask-app.env not found',
                 'message': 'Create a flask-app.env file with your API keys'
             }), 404
         
         # Reload environment variables from file
-        load_dotenv(env_file, override=True)
+        _load_env_file()
+        
+        # Swap in a new checker configuration (no re-instantiation)
+        checker_instance = get_checker()
+        generation = None
+        if checker_instance:
+            generation = checker_instance.reload_config().generation
+            checker_instance.update_api_keys(get_api_keys())
         
         # Count loaded APIs
         env_mapping = {
@@ -1833,16 +1707,13 @@ def refresh_env_variables():
         
         loaded_count = sum(1 for env_var in env_mapping.values() if os.getenv(env_var))
         
-        app.logger.info(f'Environment variables reloaded: {loaded_count} API keys found')
-        
-        # Reinitialize checker with new keys
-        global checker
-        checker = None  # Force reinitialization
-        get_checker()   # Reinitialize with new keys
+        app.logger.info(f'Environment variables reloaded: {loaded_count} API keys found '
+                        f'(configuration generation {generation})')
         
         return jsonify({
             'success': True,
             'loaded': loaded_count,
+            'config_generation': generation,
             'message': f'{loaded_count} API keys loaded from environment'
         })
         
@@ -1917,7 +1788,6 @@ def verify_api_keys():
 @limiter.limit("5 per minute")
 def report_ip():
     """Report an IP address to AbuseIPDB"""
-    import requests as req
 
     data = request.get_json()
 
@@ -1972,7 +1842,7 @@ def report_ip():
             'comment': comment
         }
 
-        response = req.post(url, headers=headers, data=payload, timeout=10)
+        response = get_session('abuseipdb').post(url, headers=headers, data=payload, timeout=10)
 
         if response.status_code == 200:
             result = response.json()
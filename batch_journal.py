@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Durable journal for batch jobs
+Records every domain x source result of a batch run in SQLite as soon as it
+arrives, so an interrupted run can be resumed exactly where it stopped
+(``--resume JOB_ID``) and failed or timed-out source calls can be re-run on
+their own (``--retry-failed``) without repeating the ones that succeeded.
+"""
+
+import json
+import time
+import uuid
+from typing import Dict, Iterator, List, Optional
+
+from cache_db import SQLitePool
+
+
+JOB_RETENTION_DAYS = 7  # Finished jobs (and their results) are purged after this long
+DOMAIN_PAGE_SIZE = 1000  # Domains read back per query when iterating a job
+
+
+class BatchJournal:
+    """SQLite-backed record of batch jobs and their per-source results"""
+
+    def __init__(self, db_file: str):
+        """
+        Args:
+            db_file: Path to the journal database (created if missing)
+        """
+        self.db_file = db_file
+        self._db = SQLitePool(db_file, size=4)
+        self._db.script('''
+            CREATE TABLE IF NOT EXISTS batch_jobs (
+                job_id TEXT PRIMARY KEY,
+                created REAL,
+                updated REAL,
+                status TEXT,
+                sources TEXT,
+                output_file TEXT,
+                output_format TEXT,
+                total INTEGER
+            );
+            CREATE TABLE IF NOT EXISTS batch_domains (
+                job_id TEXT,
+                position INTEGER,
+                domain TEXT,
+                PRIMARY KEY (job_id, position)
+            );
+            CREATE TABLE IF NOT EXISTS batch_results (
+                job_id TEXT,
+                domain TEXT,
+                source TEXT,
+                status TEXT,
+                result TEXT,
+                updated REAL,
+                PRIMARY KEY (job_id, domain, source)
+            );
+        ''')
+
+    def create_job(self, domains: List[str], sources: List[str],
+                   output_file: Optional[str] = None, output_format: Optional[str] = None) -> str:
+        """Register a new job and its domain list; returns the job ID"""
+        self.purge()
+        job_id = uuid.uuid4().hex[:12]
+        now = time.time()
+        self._db.execute(
+            'INSERT INTO batch_jobs (job_id, created, updated, status, sources, output_file, output_format, total) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            (job_id, now, now, 'running', json.dumps(sources), output_file, output_format, len(domains))
+        )
+        self._db.executemany(
+            'INSERT INTO batch_domains (job_id, position, domain) VALUES (?, ?, ?)',
+            ((job_id, position, domain) for position, domain in enumerate(domains))
+        )
+        return job_id
+
+    def get_job(self, job_id: str) -> Optional[dict]:
+        """Job metadata, or None if the journal has no such job"""
+        rows = self._db.query(
+            'SELECT job_id, created, updated, status, sources, output_file, output_format, total '
+            'FROM batch_jobs WHERE job_id = ?', (job_id,)
+        )
+        if not rows:
+            return None
+        job_id, created, updated, status, sources, output_file, output_format, total = rows[0]
+        return {
+            'job_id': job_id,
+            'created': created,
+            'updated': updated,
+            'status': status,
+            'sources': json.loads(sources),
+            'output_file': output_file,
+            'output_format': output_format,
+            'total': total,
+        }
+
+    def iter_domains(self, job_id: str) -> Iterator[str]:
+        """The job's domains in their original order, read a page at a time"""
+        position = -1
+        while True:
+            rows = self._db.query(
+                'SELECT position, domain FROM batch_domains WHERE job_id = ? AND position > ? '
+                'ORDER BY position LIMIT ?', (job_id, position, DOMAIN_PAGE_SIZE)
+            )
+            if not rows:
+                return
+            for position, domain in rows:
+                yield domain
+
+    def results(self, job_id: str, domain: str, include_failed: bool = True) -> Dict[str, dict]:
+        """Journaled source results for one domain (optionally leaving out failed calls)"""
+        sql = 'SELECT source, result FROM batch_results WHERE job_id = ? AND domain = ?'
+        if not include_failed:
+            sql += " AND status = 'done'"
+        return {source: json.loads(result) for source, result in self._db.query(sql, (job_id, domain))}
+
+    def record(self, job_id: str, domain: str, results: Dict[str, dict]) -> None:
+        """Journal a domain's source results; errored calls (timeouts included) are marked failed"""
+        now = time.time()
+        self._db.executemany(
+            'INSERT OR REPLACE INTO batch_results (job_id, domain, source, status, result, updated) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            [
+                (job_id, domain, source,
+                 'failed' if not isinstance(result, dict) or result.get('status') == 'error' else 'done',
+                 json.dumps(result, default=str), now)
+                for source, result in results.items()
+            ]
+        )
+        self._db.execute('UPDATE batch_jobs SET updated = ? WHERE job_id = ?', (now, job_id))
+
+    def set_status(self, job_id: str, status: str) -> None:
+        """Mark a job running, completed or interrupted"""
+        self._db.execute('UPDATE batch_jobs SET status = ?, updated = ? WHERE job_id = ?',
+                         (status, time.time(), job_id))
+
+    def progress(self, job_id: str) -> Dict[str, int]:
+        """Count of journaled domain x source pairs by status"""
+        rows = self._db.query(
+            'SELECT status, COUNT(*) FROM batch_results WHERE job_id = ? GROUP BY status', (job_id,)
+        )
+        return dict(rows)
+
+    def purge(self, days: int = JOB_RETENTION_DAYS) -> None:
+        """Drop jobs that finished more than ``days`` days ago"""
+        cutoff = time.time() - days * 86400
+        old = [row[0] for row in self._db.query(
+            "SELECT job_id FROM batch_jobs WHERE status = 'completed' AND updated < ?", (cutoff,)
+        )]
+        for job_id in old:
+            self._db.execute('DELETE FROM batch_results WHERE job_id = ?', (job_id,))
+            self._db.execute('DELETE FROM batch_domains WHERE job_id = ?', (job_id,))
+            self._db.execute('DELETE FROM batch_jobs WHERE job_id = ?', (job_id,))
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Streaming writers for batch analysis output
+Every analyzed domain becomes one record that is written out as soon as it
+finishes and then dropped, so memory stays flat however long the batch is
+and a crash keeps everything written so far.
+
+A record looks like:
+    {"domain": ..., "overall_reputation": ..., "timestamp": ..., "results": {source: result}}
+or, when the analysis failed:
+    {"domain": ..., "timestamp": ..., "error": "..."}
+
+Every format is rendered incrementally from these records: NDJSON writes
+them one per line, CSV one row per record, HTML one section per record and
+JSON one entry per record, so no format needs the whole batch in memory.
+"""
+
+import csv
+import html
+import json
+from datetime import datetime
+
+
+CSV_SOURCES = [
+    ('VirusTotal', 'virustotal'),
+    ('URLVoid', 'urlvoid'),
+    ('Cisco_Talos', 'cisco_talos'),
+    ('MalwareBazaar', 'malware_bazaar'),
+    ('AlienVault_OTX', 'alienvault_otx'),
+    ('SecurityTrails', 'securitytrails'),
+    ('AbuseIPDB', 'abuseipdb'),
+    ('Shodan', 'shodan'),
+    ('WHOIS_Info', 'whois_info'),
+    ('Hybrid_Analysis', 'hybrid_analysis'),
+    ('URLScan', 'urlscan'),
+    ('IP_Geolocation', 'ip_geolocation'),
+]
+
+OUTPUT_FORMATS = ['csv', 'json', 'ndjson', 'html']
+
+
+class BatchWriter:
+    """Base class: write() one record at a time, close() to finish the file"""
+
+    def __init__(self, output_file: str):
+        self.output_file = output_file
+        self.count = 0
+        self._file = open(output_file, 'w', newline='', encoding='utf-8')
+        self._start()
+
+    def _start(self):
+        pass
+
+    def _finish(self):
+        pass
+
+    def write(self, record: dict) -> None:
+        self._write(record)
+        self.count += 1
+        self._file.flush()
+
+    def _write(self, record: dict):
+        raise NotImplementedError
+
+    def close(self) -> None:
+        if self._file.closed:
+            return
+        try:
+            self._finish()
+        finally:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class NDJSONWriter(BatchWriter):
+    """One JSON record per line"""
+
+    def _write(self, record):
+        self._file.write(json.dumps(record, default=str) + '\n')
+
+
+class JSONWriter(BatchWriter):
+    """A single {domain: results} object, written entry by entry"""
+
+    def _start(self):
+        self._file.write('{')
+
+    def _write(self, record):
+        value = {'error': record['error']} if 'error' in record else record.get('results', {})
+        separator = ',' if self.count else ''
+        self._file.write(f'{separator}\n  {json.dumps(record["domain"])}: {json.dumps(value, default=str)}')
+
+    def _finish(self):
+        self._file.write('\n}\n')
+
+
+class CSVWriter(BatchWriter):
+    """One row per domain with the reputation reported by each source"""
+
+    def _start(self):
+        csv.writer(self._file).writerow(
+            ['Domain', 'Overall_Reputation'] + [name for name, _ in CSV_SOURCES] + ['Timestamps']
+        )
+
+    def _write(self, record):
+        if 'error' in record:
+            row = [record['domain'], 'ERROR'] + ['ERROR'] * len(CSV_SOURCES) + [record.get('timestamp', '')]
+        else:
+            results = record.get('results', {})
+            row = [record['domain'], record.get('overall_reputation', 'unknown')]
+            row += [results.get(source, {}).get('reputation', 'N/A') for _, source in CSV_SOURCES]
+            row.append(record.get('timestamp', ''))
+        csv.writer(self._file).writerow(row)
+
+
+class HTMLWriter(BatchWriter):
+    """Report with one section per domain; the footer carries the total"""
+
+    def _start(self):
+        self._file.write(f"""
+        <!DOCTYPE html>
+        <html>
+        <head>
+            <title>Domain Reputation Analysis Report</title>
+            <style>
+                body {{ font-family: Arial, sans-serif; margin: 40px; }}
+                .header {{ background-color: #f0f0f0; padding: 20px; border-radius: 5px; }}
+                .domain-section {{ margin: 20px 0; border: 1px solid #ddd; border-radius: 5px; }}
+                .domain-header {{ background-color: #e9e9e9; padding: 10px; font-weight: bold; }}
+                .source {{ margin: 10px; padding: 10px; border-left: 3px solid #ccc; }}
+                .clean {{ border-left-color: #28a745; }}
+                .suspicious {{ border-left-color: #ffc107; }}
+                .malicious {{ border-left-color: #dc3545; }}
+                .unknown {{ border-left-color: #6c757d; }}
+                .error {{ border-left-color: #dc3545; background-color: #f8d7da; }}
+            </style>
+        </head>
+        <body>
+            <div class="header">
+                <h1>Domain Reputation Analysis Report</h1>
+                <p>Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>
+            </div>
+        """)
+
+    def _write(self, record):
+        domain = html.escape(record['domain'])
+        if 'error' in record:
+            self._file.write(f"""
+                <div class="domain-section">
+                    <div class="domain-header">{domain} - ERROR</div>
+                    <div class="source error">
+                        <strong>Error:</strong> {html.escape(str(record['error']))}
+                    </div>
+                </div>
+                """)
+            return
+
+        overall_rep = record.get('overall_reputation', 'unknown')
+        parts = [f"""
+                <div class="domain-section">
+                    <div class="domain-header">{domain} - {html.escape(overall_rep.upper())}</div>
+                """]
+        for source, data in record.get('results', {}).items():
+            if isinstance(data, dict) and data.get('status') == 'success':
+                rep = str(data.get('reputation', 'unknown'))
+                parts.append(f"""
+                        <div class="source {html.escape(rep.lower())}">
+                            <strong>{html.escape(source.replace('_', ' ').title())}:</strong> {html.escape(rep.upper())}
+                        </div>
+                        """)
+        parts.append("</div>")
+        self._file.write(''.join(parts))
+
+    def _finish(self):
+        self._file.write(f"""
+            <p>Total domains analyzed: {self.count}</p>
+        </body>
+        </html>
+        """)
+
+
+WRITERS = {
+    'csv': CSVWriter,
+    'json': JSONWriter,
+    'ndjson': NDJSONWriter,
+    'html': HTMLWriter,
+}
+
+
+def open_writer(output_file: str, format_type: str = 'ndjson') -> BatchWriter:
+    """Writer for ``format_type`` (csv, json, ndjson or html)"""
+    try:
+        writer_class = WRITERS[format_type.lower()]
+    except KeyError:
+        raise ValueError(f"Unsupported output format: {format_type}")
+    return writer_class(output_file)
+
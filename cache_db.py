@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+SQLite connection pool for the result cache
+Keeps a small set of WAL-mode connections open and hands them out to
+threads, so lookups do not reopen the database file on every call and
+concurrent readers/writers (threads or gunicorn workers) do not trip
+over each other's locks.
+"""
+
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Iterable, List, Optional, Sequence
+
+
+class SQLitePool:
+    """Thread-safe pool of persistent SQLite connections in WAL mode"""
+
+    def __init__(self, db_file: str, size: int = 8, timeout: float = 10.0):
+        """
+        Args:
+            db_file: Path to the SQLite database
+            size: Maximum number of open connections
+            timeout: Seconds to wait for a database lock (and for a free connection)
+        """
+        self.db_file = db_file
+        self.size = max(1, size)
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        # Autocommit mode: reads never hold a transaction open, writes use explicit BEGIN
+        conn = sqlite3.connect(self.db_file, timeout=self.timeout, isolation_level=None,
+                               check_same_thread=False, cached_statements=64)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(f'PRAGMA busy_timeout={int(self.timeout * 1000)}')
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection for the duration of the ``with`` block"""
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = None
+            with self._lock:
+                if self._created < self.size:
+                    self._created += 1
+                    try:
+                        conn = self._connect()
+                    except Exception:
+                        self._created -= 1
+                        raise
+            if conn is None:
+                conn = self._idle.get(timeout=self.timeout)
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    def query(self, sql: str, params: Sequence = ()) -> List[tuple]:
+        """Run a read query and return all rows"""
+        with self.connection() as conn:
+            return conn.execute(sql, params).fetchall()
+
+    def execute(self, sql: str, params: Sequence = ()) -> int:
+        """Run a single write statement in its own transaction and return the row count"""
+        return self.executemany(sql, [params])
+
+    def executemany(self, sql: str, rows: Iterable[Sequence]) -> int:
+        """Write a batch of rows in one transaction and return the row count"""
+        with self.connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                cursor = conn.executemany(sql, rows)
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+            return cursor.rowcount
+
+    def script(self, sql: str) -> None:
+        """Run DDL/maintenance statements (schema setup, VACUUM, checkpoints)"""
+        with self.connection() as conn:
+            conn.executescript(sql)
+
+    def close(self) -> None:
+        """Close all idle connections"""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+
+class MaintenanceThread(threading.Thread):
+    """Daemon thread that calls ``task`` at start and then every ``interval`` seconds
+
+    The thread exits when stopped or when ``task`` returns False.
+    """
+
+    def __init__(self, task, interval: float, name: Optional[str] = None):
+        super().__init__(name=name or 'drc-cache-maintenance', daemon=True)
+        self.task = task
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while True:
+            try:
+                if self.task() is False:
+                    break
+            except Exception as e:
+                print(f"Warning: Cache maintenance failed: {e}")
+            if self._stop_event.wait(self.interval):
+                break
+
+    def stop(self):
+        self._stop_event.set()
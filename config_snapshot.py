@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Versioned configuration snapshots
+The checker settings that can change at runtime (API keys, timeouts, cache
+lifetimes, source weights, rate limits) live in one read-only snapshot. A
+reload builds a complete new snapshot and swaps the reference, so an analysis
+that took the previous snapshot finishes with consistent settings while new
+analyses see the new ones - no checker re-instantiation, warm sessions and
+caches are kept.
+
+Reloads are announced to every process (gunicorn workers, worker.py) through
+a generation counter kept in a small shared file; each process notices the
+new generation on its next lookup and rebuilds its own snapshot.
+"""
+
+import os
+import time
+from types import MappingProxyType
+from typing import Dict, Optional
+
+GENERATION_CHECK_INTERVAL = 1.0  # Seconds between checks of the shared generation file
+
+
+class ConfigSnapshot:
+    """Read-only checker settings at one configuration generation"""
+
+    __slots__ = ('generation', 'api_keys', 'available_sources', 'timeout', 'source_timeout',
+                 'cache_hours', 'stale_hours', 'cache_ttl', 'source_weights', 'rate_limits', 'created')
+
+    def __init__(self, generation: int, api_keys: Dict[str, str], available_sources: dict,
+                 timeout: float, source_timeout: float, cache_hours: float, stale_hours: float,
+                 cache_ttl: Dict[str, float], source_weights: Dict[str, float], rate_limits: dict):
+        set_ = object.__setattr__
+        set_(self, 'generation', generation)
+        set_(self, 'api_keys', MappingProxyType(dict(api_keys)))
+        set_(self, 'available_sources', MappingProxyType(dict(available_sources)))
+        set_(self, 'timeout', timeout)
+        set_(self, 'source_timeout', source_timeout)
+        set_(self, 'cache_hours', cache_hours)
+        set_(self, 'stale_hours', stale_hours)
+        set_(self, 'cache_ttl', MappingProxyType(dict(cache_ttl)))
+        set_(self, 'source_weights', MappingProxyType(dict(source_weights)))
+        set_(self, 'rate_limits', MappingProxyType(dict(rate_limits)))
+        set_(self, 'created', time.time())
+
+    def __setattr__(self, name, value):
+        raise AttributeError('ConfigSnapshot is read-only; build a new one and swap it in')
+
+    def describe(self) -> dict:
+        """Non-secret summary (API keys are reported by name only)"""
+        return {
+            'generation': self.generation,
+            'created': self.created,
+            'api_keys': sorted(source for source, key in self.api_keys.items() if key),
+            'available_sources': list(self.available_sources.get('available', [])),
+            'timeout': self.timeout,
+            'source_timeout': self.source_timeout,
+            'cache_hours': self.cache_hours,
+            'stale_hours': self.stale_hours,
+            'source_weights': dict(self.source_weights),
+            'rate_limits': {key: list(limit) if limit else None for key, limit in self.rate_limits.items()},
+        }
+
+
+class ConfigGeneration:
+    """Configuration generation counter shared through a file
+
+    bump() publishes a reload; current() is cheap enough to call on every
+    lookup (one stat() per check interval, a read only when the file changed).
+    """
+
+    def __init__(self, path: Optional[str], check_interval: float = GENERATION_CHECK_INTERVAL):
+        """
+        Args:
+            path: Counter file (None: this process only)
+            check_interval: Seconds during which the last value read is trusted
+        """
+        self.path = path
+        self.check_interval = check_interval
+        self._value = 0
+        self._signature = None
+        self._checked = 0.0
+        self.current(force=True)
+
+    def _stat(self) -> Optional[tuple]:
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def _read(self) -> int:
+        try:
+            with open(self.path, 'r') as f:
+                return int(f.read().strip() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def current(self, force: bool = False) -> int:
+        """Latest generation published by any process"""
+        if not self.path:
+            return self._value
+        now = time.monotonic()
+        if not force and now - self._checked < self.check_interval:
+            return self._value
+        self._checked = now
+        signature = self._stat()
+        if signature != self._signature:
+            self._signature = signature
+            self._value = self._read() if signature else 0
+        return self._value
+
+    def bump(self) -> int:
+        """Publish a new generation and return it"""
+        value = max(self._read() if self.path else 0, self._value) + 1
+        if self.path:
+            tmp_file = f'{self.path}.{os.getpid()}.tmp'
+            try:
+                with open(tmp_file, 'w') as f:
+                    f.write(str(value))
+                os.replace(tmp_file, self.path)
+                self._signature = self._stat()
+            except OSError as e:
+                print(f"Warning: Could not publish configuration generation to {self.path}: {e}")
+        self._value = value
+        self._checked = time.monotonic()
+        return value
+
+
+def parse_float_section(config, section: str) -> Dict[str, float]:
+    """Numeric options of a ConfigParser section (invalid values are skipped with a warning)"""
+    values = {}
+    if not config.has_section(section):
+        return values
+    for key, value in config.items(section):
+        try:
+            values[key] = float(value)
+        except ValueError:
+            print(f"Warning: Ignoring invalid [{section}] value for {key}: {value}")
+    return values
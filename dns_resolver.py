@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+"""
+Cached domain resolution shared by every source
+Several sources need a domain's IP addresses (AbuseIPDB, Shodan, IP
+geolocation) and the web app resolves it again for the country statistics.
+They all go through resolve(), which keeps answers for their DNS TTL (as
+reported by DNS-over-HTTPS answers), remembers failed lookups for a short
+while, and lets concurrent callers asking for the same name share one lookup -
+so a domain is resolved once per TTL however many sources need it.
+
+A cache miss races every configured resolver (the system resolver and the
+DoH services, A and AAAA) in parallel and returns as soon as one of them
+answers with addresses, within an overall deadline. Each resolver's latency
+and failures are tracked; slow or failing resolvers are demoted and only
+queried as a hedge when the healthy ones have not answered quickly.
+"""
+
+import ipaddress
+import os
+import socket
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Callable, Dict, List, Optional, Tuple
+
+from http_pool import get_session
+from singleflight import SingleFlight
+
+
+DEFAULT_TTL = 300          # Seconds, for answers that carry no TTL (system resolver, OpenDNS)
+MIN_TTL = 30               # Floor so that TTL=0 records still coalesce bursts of lookups
+MAX_TTL = 3600
+NEGATIVE_TTL = 60          # Names that did not resolve are not retried for this long
+MAX_ENTRIES = 10000        # Least recently used names are evicted beyond this
+MAX_ADDRESSES = 3          # Addresses returned per name (IPv4 first)
+
+DEFAULT_DEADLINE = 4.0     # Seconds a lookup may take across all resolvers
+CONNECT_TIMEOUT = 2.0
+HEDGE_DELAY = 0.5          # Demoted resolvers are only queried after this long without an answer
+SLOW_LATENCY = 1.5         # Resolvers averaging slower than this are demoted
+FAILURES_TO_DEMOTE = 3     # Consecutive failures before a resolver is demoted
+LATENCY_SMOOTHING = 0.3    # Weight of the newest sample in the moving latency average
+REPROBE_INTERVAL = 60      # Demoted resolvers are still queried this often, so they can recover
+
+# DNS-over-HTTPS services as (name, URL template, response format). "json" is the
+# Google/Cloudflare-style JSON API (?name=...&type=A|AAAA); "addresses" is OpenDNS's
+# plain list of IPv4 addresses. More JSON services can be added with DNS_DOH_SERVICES.
+DOH_SERVICES = [
+    ('opendns', 'https://api.opendns.com/v1/domains/{name}/ips', 'addresses'),
+    ('doh.sb', 'https://doh.sb/dns-query?name={name}&type={type}', 'json'),
+]
+
+RECORD_TYPES = {'A': 1, 'AAAA': 28}
+
+# Well-known addresses for common domains, used as a last resort
+KNOWN_IPS = {
+    'google.com': ['142.250.185.78', '142.250.185.110'],
+    'facebook.com': ['31.13.71.36', '31.13.71.35'],
+    'github.com': ['140.82.114.3', '140.82.114.4'],
+    'microsoft.com': ['20.112.52.29', '20.103.85.33'],
+    'amazon.com': ['54.239.28.85', '52.94.236.248'],
+}
+
+
+def is_ipv4(value: str) -> bool:
+    try:
+        ipaddress.IPv4Address(value)
+        return True
+    except (ipaddress.AddressValueError, ValueError):
+        return False
+
+
+def is_ip(value: str) -> bool:
+    try:
+        ipaddress.ip_address(value)
+        return True
+    except ValueError:
+        return False
+
+
+class DNSCache:
+    """Thread-safe LRU of resolved names with per-entry expiry"""
+
+    def __init__(self, max_entries: int = MAX_ENTRIES, negative_ttl: float = NEGATIVE_TTL):
+        self.max_entries = max_entries
+        self.negative_ttl = negative_ttl
+        self._entries = OrderedDict()  # name -> (addresses, expires)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, name: str) -> Optional[List[str]]:
+        """Cached addresses ([] for a cached failure), or None on a miss"""
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None or entry[1] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[name]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(name)
+            self.hits += 1
+            return list(entry[0])
+
+    def put(self, name: str, addresses: List[str], ttl: Optional[float] = None) -> None:
+        """Store an answer; an empty list is cached for negative_ttl"""
+        if not addresses:
+            ttl = self.negative_ttl
+        else:
+            ttl = min(max(DEFAULT_TTL if ttl is None else ttl, MIN_TTL), MAX_TTL)
+        with self._lock:
+            self._entries[name] = (list(addresses), time.monotonic() + ttl)
+            self._entries.move_to_end(name)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+
+class ResolverHealth:
+    """Moving latency average and failure streak of one resolver"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.latency = None  # Smoothed seconds per successful query
+        self.failures = 0    # Consecutive failed queries
+        self.queries = 0
+        self.errors = 0
+        self.last_query = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, elapsed: float, ok: bool) -> None:
+        with self._lock:
+            self.queries += 1
+            self.last_query = time.monotonic()
+            if ok:
+                self.failures = 0
+                self.latency = elapsed if self.latency is None else (
+                    LATENCY_SMOOTHING * elapsed + (1 - LATENCY_SMOOTHING) * self.latency)
+            else:
+                self.failures += 1
+                self.errors += 1
+
+    @property
+    def demoted(self) -> bool:
+        return self.failures >= FAILURES_TO_DEMOTE or (self.latency or 0) > SLOW_LATENCY
+
+    @property
+    def due_for_probe(self) -> bool:
+        return time.monotonic() - self.last_query >= REPROBE_INTERVAL
+
+    def sort_key(self) -> tuple:
+        return (self.demoted, self.latency if self.latency is not None else SLOW_LATENCY / 2)
+
+    def to_dict(self) -> dict:
+        return {
+            'latency_ms': round(self.latency * 1000, 1) if self.latency is not None else None,
+            'consecutive_failures': self.failures,
+            'queries': self.queries,
+            'errors': self.errors,
+            'demoted': self.demoted,
+        }
+
+
+_doh_services = list(DOH_SERVICES)
+_deadline = DEFAULT_DEADLINE
+_health: Dict[str, ResolverHealth] = {}
+_health_lock = threading.Lock()
+# Resolver queries run here; a late query keeps its thread until its own timeout
+_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix='drc-dns')
+
+
+def configure(doh_services: Optional[List[str]] = None, deadline: Optional[float] = None) -> None:
+    """Add JSON DoH services (URL templates or base URLs) and set the lookup deadline
+
+    Also reads $DNS_DOH_SERVICES (comma-separated) when no services are given.
+    """
+    global _doh_services, _deadline
+    extra = doh_services
+    if extra is None and os.getenv('DNS_DOH_SERVICES'):
+        extra = os.getenv('DNS_DOH_SERVICES').split(',')
+    services = list(DOH_SERVICES)
+    for url in extra or []:
+        url = url.strip()
+        if not url:
+            continue
+        if '{name}' not in url:
+            url += ('&' if '?' in url else '?') + 'name={name}&type={type}'
+        services.append((url.split('/')[2] if '://' in url else url, url, 'json'))
+    _doh_services = services
+    _deadline = deadline or DEFAULT_DEADLINE
+
+
+def _resolver_health(name: str) -> ResolverHealth:
+    with _health_lock:
+        health = _health.get(name)
+        if health is None:
+            health = _health[name] = ResolverHealth(name)
+        return health
+
+
+def resolver_stats() -> Dict[str, dict]:
+    """Latency and health per resolver"""
+    with _health_lock:
+        return {name: health.to_dict() for name, health in _health.items()}
+
+
+def _query_system(domain: str, record_type: str, timeout: float) -> Tuple[List[str], Optional[float]]:
+    family = socket.AF_INET if record_type == 'A' else socket.AF_INET6
+    infos = socket.getaddrinfo(domain, None, family, socket.SOCK_STREAM)
+    return list(dict.fromkeys(info[4][0] for info in infos)), None
+
+
+def _query_doh(url_template: str, response_format: str, domain: str, record_type: str,
+               timeout: float) -> Tuple[List[str], Optional[float]]:
+    response = get_session('doh').get(
+        url_template.format(name=domain, type=record_type),
+        headers={'Accept': 'application/dns-json' if response_format == 'json' else 'application/json'},
+        timeout=(CONNECT_TIMEOUT, timeout),
+        verify=False  # Disable SSL verification to avoid connection issues
+    )
+    response.raise_for_status()
+    dns_data = response.json()
+    if response_format == 'addresses':
+        # OpenDNS format
+        if not isinstance(dns_data, list):
+            raise ValueError('Unexpected OpenDNS response')
+        return [ip for ip in dns_data if isinstance(ip, str) and is_ipv4(ip)], None
+    # Standard DNS JSON format
+    addresses, ttls = [], []
+    for answer in dns_data.get('Answer', []):
+        if answer.get('type') == RECORD_TYPES[record_type] and is_ip(str(answer.get('data', ''))):
+            addresses.append(answer['data'])
+            if isinstance(answer.get('TTL'), (int, float)):
+                ttls.append(answer['TTL'])
+    return addresses, (min(ttls) if ttls else None)
+
+
+def _resolvers() -> List[tuple]:
+    """(resolver name, record type, query function) for every query of a lookup"""
+    queries = [('system', record_type, lambda d, t, rt=record_type: _query_system(d, rt, t))
+               for record_type in RECORD_TYPES]
+    for name, url, response_format in _doh_services:
+        record_types = ['A'] if response_format == 'addresses' else list(RECORD_TYPES)
+        for record_type in record_types:
+            queries.append((name, record_type,
+                            lambda d, t, u=url, f=response_format, rt=record_type: _query_doh(u, f, d, rt, t)))
+    return queries
+
+
+def lookup(domain: str, deadline: Optional[float] = None) -> Tuple[List[str], Optional[float]]:
+    """Resolve ``domain`` without the cache; returns (addresses, TTL or None)
+
+    All resolvers are queried in parallel (demoted ones only after HEDGE_DELAY)
+    and the lookup returns once any resolver has answered with IPv4 addresses -
+    or with anything at all once the deadline is reached. Queries still running
+    are cancelled if not yet started, or left to finish and only update health.
+    """
+    deadline = deadline or _deadline
+    started = time.monotonic()
+    end = started + deadline
+
+    def run(name, record_type, query):
+        health = _resolver_health(name)
+        begin = time.monotonic()
+        try:
+            addresses, ttl = query(domain, max(0.1, end - begin))
+        except Exception:
+            health.record(time.monotonic() - begin, False)
+            raise
+        health.record(time.monotonic() - begin, True)
+        return addresses, ttl
+
+    queries = sorted(_resolvers(), key=lambda q: _resolver_health(q[0]).sort_key())
+    # Demoted resolvers wait as hedges, except for a periodic probe that lets them recover
+    primary, hedges = [], []
+    for q in queries:
+        health = _resolver_health(q[0])
+        (hedges if health.demoted and not health.due_for_probe else primary).append(q)
+    if not primary:
+        primary, hedges = hedges, []
+
+    futures = {_executor.submit(run, *q): q for q in primary}
+    answers = {'A': [], 'AAAA': []}
+    ttls = []
+    try:
+        while futures:
+            now = time.monotonic()
+            if now >= end:
+                break
+            timeout = end - now
+            if hedges:
+                timeout = min(timeout, max(0.0, started + HEDGE_DELAY - now))
+            done, _ = wait(futures, timeout=timeout, return_when=FIRST_COMPLETED)
+            if hedges and (time.monotonic() - started >= HEDGE_DELAY or not (futures.keys() - done)):
+                futures.update({_executor.submit(run, *q): q for q in hedges})
+                hedges = []
+            for future in done:
+                name, record_type, _ = futures.pop(future)
+                try:
+                    addresses, ttl = future.result()
+                except Exception:
+                    continue
+                if addresses:
+                    answers[record_type].extend(addresses)
+                    if ttl is not None:
+                        ttls.append(ttl)
+            if answers['A']:
+                break  # Sufficient: the sources need an IPv4 address first
+    finally:
+        for future in futures:
+            future.cancel()
+
+    addresses = list(dict.fromkeys(answers['A'] + answers['AAAA']))
+    if not addresses:
+        # Hardcoded well-known IPs (as last resort)
+        addresses = list(KNOWN_IPS.get(domain.lower(), []))
+    return addresses[:MAX_ADDRESSES], (min(ttls) if ttls else None)
+
+
+configure()
+
+_cache = DNSCache()
+_flights = SingleFlight()
+
+
+def get_cache() -> DNSCache:
+    """The process-wide resolution cache"""
+    return _cache
+
+
+def resolve(domain: str, lookup_fn: Callable[[str], Tuple[List[str], Optional[float]]] = lookup) -> List[str]:
+    """Addresses of ``domain``, IPv4 first (up to MAX_ADDRESSES, [] if it does not resolve)
+
+    Served from the cache while the answer's TTL lasts; concurrent callers
+    for a name that is not cached wait for a single lookup.
+    """
+    if is_ip(domain):
+        return [domain]
+    name = domain.strip().lower().rstrip('.')
+    cached = _cache.get(name)
+    if cached is not None:
+        return cached
+
+    def fetch():
+        # Another caller may have filled the cache while we queued for the flight
+        cached = _cache.get(name)
+        if cached is not None:
+            return cached
+        addresses, ttl = lookup_fn(name)
+        _cache.put(name, addresses, ttl)
+        return addresses
+
+    return list(_flights.do(('dns', name), fetch))
@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+DNS blacklist engine
+Sends every DNSBL query for an IP at once over a single non-blocking UDP
+socket to a stub resolver, retransmits unanswered queries and stops at one
+global deadline. Bulk sweeps over many IPs share one socket with a bounded
+number of queries in flight. Answers are decoded into listing reasons (e.g. Spamhaus
+127.0.0.2 = SBL, 127.0.0.4 = XBL) and NXDOMAIN is told apart from timeouts.
+"""
+
+import ipaddress
+import os
+import random
+import select
+import socket
+import struct
+import time
+from typing import Dict, List, Optional
+
+QTYPE_A = 1
+QCLASS_IN = 1
+RCODE_NOERROR = 0
+RCODE_NXDOMAIN = 3
+
+# Return codes that mean something other than "listed" (query refused, rate limited
+# or sent through a public resolver) - reported as errors, never as listings
+ERROR_CODES = {
+    '127.255.255.252': 'Typing error in DNSBL name',
+    '127.255.255.254': 'Query via public/open resolver refused',
+    '127.255.255.255': 'Excessive number of queries',
+}
+
+# Known return codes per zone; any other 127.0.0.0/8 answer is a generic listing
+RETURN_CODES = {
+    'zen.spamhaus.org': {
+        '127.0.0.2': 'SBL - Spamhaus SBL data',
+        '127.0.0.3': 'SBL CSS - Spamhaus CSS data',
+        '127.0.0.4': 'XBL - CBL/exploited host',
+        '127.0.0.5': 'XBL - exploited host',
+        '127.0.0.6': 'XBL - exploited host',
+        '127.0.0.7': 'XBL - exploited host',
+        '127.0.0.9': 'SBL - Spamhaus DROP/EDROP',
+        '127.0.0.10': 'PBL - ISP maintained',
+        '127.0.0.11': 'PBL - Spamhaus maintained',
+    },
+    'dnsbl.sorbs.net': {
+        '127.0.0.2': 'Open HTTP proxy',
+        '127.0.0.3': 'Open SOCKS proxy',
+        '127.0.0.4': 'Misc open proxy',
+        '127.0.0.5': 'Open SMTP relay',
+        '127.0.0.6': 'Spam source',
+        '127.0.0.7': 'Vulnerable web server',
+        '127.0.0.8': 'Block requested',
+        '127.0.0.9': 'Zombie/hijacked network',
+        '127.0.0.10': 'Dynamic IP range',
+        '127.0.0.11': 'Bad DNS configuration',
+        '127.0.0.12': 'No mail should originate',
+        '127.0.0.14': 'No server should be here',
+    },
+    'dyna.spamrats.com': {'127.0.0.36': 'Dynamic IP without valid PTR'},
+    'noptr.spamrats.com': {'127.0.0.37': 'No reverse DNS'},
+    'spam.spamrats.com': {'127.0.0.38': 'Spam source'},
+    'bl.mailspike.net': {
+        '127.0.0.2': 'Listed (Mailspike)',
+        '127.0.0.10': 'Worst possible reputation',
+        '127.0.0.11': 'Very bad reputation',
+        '127.0.0.12': 'Bad reputation',
+        '127.0.0.13': 'Suspicious reputation',
+        '127.0.0.14': 'Neutral - probably spam',
+    },
+    'b.barracudacentral.org': {'127.0.0.2': 'Listed (Barracuda reputation)'},
+    'bl.spamcop.net': {'127.0.0.2': 'Listed (SpamCop spam reports)'},
+    'cbl.abuseat.org': {'127.0.0.2': 'Listed (CBL exploited host)'},
+}
+# The SORBS sub-zones share the aggregate zone's codes
+for _zone in ('spam', 'http', 'misc', 'smtp', 'socks', 'web', 'zombie'):
+    RETURN_CODES[f'{_zone}.dnsbl.sorbs.net'] = RETURN_CODES['dnsbl.sorbs.net']
+
+_resolver = None
+_addresses = {}  # resolver string -> (family, socket address), resolved once
+
+
+def configure(resolver: Optional[str] = None) -> None:
+    """Set the stub resolver ("host" or "host:port"); None restores auto-detection"""
+    global _resolver
+    _resolver = resolver or None
+    if _resolver:
+        try:
+            resolver_address(_resolver)
+        except OSError as e:
+            print(f"Warning: Could not resolve DNSBL resolver {_resolver}: {e}")
+
+
+def default_resolver() -> str:
+    """Configured resolver, then $DNSBL_RESOLVER, then the first resolv.conf nameserver"""
+    if _resolver:
+        return _resolver
+    if os.getenv('DNSBL_RESOLVER'):
+        return os.getenv('DNSBL_RESOLVER')
+    try:
+        with open('/etc/resolv.conf') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0] == 'nameserver':
+                    return parts[1]
+    except OSError:
+        pass
+    return '127.0.0.1'
+
+
+def _parse_resolver(resolver: str):
+    """Split "host", "host:port" or "[v6]:port" into (host, port)"""
+    if resolver.startswith('['):
+        host, _, port = resolver[1:].partition(']')
+        return host, int(port.lstrip(':') or 53)
+    if resolver.count(':') == 1:
+        host, port = resolver.split(':')
+        return host, int(port)
+    return resolver, 53
+
+
+def resolver_address(resolver: str):
+    """
+    (family, socket address) of a resolver, looking up host names once.
+
+    Answers are matched against the address they come from, so the resolver
+    has to be known by its IP rather than by the name it was configured with.
+    """
+    if resolver not in _addresses:
+        host, port = _parse_resolver(resolver)
+        family, _, _, _, sockaddr = socket.getaddrinfo(host, port, type=socket.SOCK_DGRAM)[0]
+        _addresses[resolver] = (family, sockaddr)
+    return _addresses[resolver]
+
+
+def _same_host(a: str, b: str) -> bool:
+    """Compare resolver addresses, tolerating different IPv6 spellings"""
+    try:
+        return ipaddress.ip_address(a.split('%')[0]) == ipaddress.ip_address(b.split('%')[0])
+    except ValueError:
+        return a == b
+
+
+def query_name(ip_address: str, zone: str) -> str:
+    """Reversed-address query name for a DNSBL zone (nibble format for IPv6)"""
+    addr = ipaddress.ip_address(ip_address)
+    if addr.version == 6:
+        reversed_addr = '.'.join(reversed(addr.exploded.replace(':', '')))
+    else:
+        reversed_addr = '.'.join(reversed(str(addr).split('.')))
+    return f"{reversed_addr}.{zone}"
+
+
+def build_query(query_id: int, name: str) -> bytes:
+    """DNS query packet for an A record with recursion desired"""
+    header = struct.pack('!HHHHHH', query_id, 0x0100, 1, 0, 0, 0)
+    qname = b''.join(bytes([len(label)]) + label.encode('ascii') for label in name.rstrip('.').split('.'))
+    return header + qname + b'\x00' + struct.pack('!HH', QTYPE_A, QCLASS_IN)
+
+
+def _skip_name(packet: bytes, offset: int) -> int:
+    """Offset just past a (possibly compressed) domain name"""
+    while True:
+        length = packet[offset]
+        if length == 0:
+            return offset + 1
+        if length & 0xC0 == 0xC0:
+            return offset + 2
+        offset += length + 1
+
+
+def _read_name(packet: bytes, offset: int) -> str:
+    """Decode the (uncompressed) question name at ``offset``"""
+    labels = []
+    while packet[offset]:
+        length = packet[offset]
+        labels.append(packet[offset + 1:offset + 1 + length].decode('ascii'))
+        offset += length + 1
+    return '.'.join(labels)
+
+
+def parse_response(packet: bytes):
+    """Return (query_id, question name, rcode, [A record addresses]) for a DNS response"""
+    query_id, flags, qdcount, ancount, _, _ = struct.unpack('!HHHHHH', packet[:12])
+    rcode = flags & 0x000F
+    qname = _read_name(packet, 12) if qdcount else ''
+    offset = 12
+    for _ in range(qdcount):
+        offset = _skip_name(packet, offset) + 4
+
+    addresses = []
+    for _ in range(ancount):
+        offset = _skip_name(packet, offset)
+        rtype, _, _, rdlength = struct.unpack('!HHIH', packet[offset:offset + 10])
+        offset += 10
+        if rtype == QTYPE_A and rdlength == 4:
+            addresses.append(socket.inet_ntoa(packet[offset:offset + 4]))
+        offset += rdlength
+    return query_id, qname, rcode, addresses
+
+
+def decode(zone: str, addresses: List[str]) -> dict:
+    """Turn A record answers for a zone into a listing verdict with reasons"""
+    errors = [ERROR_CODES[a] for a in addresses if a in ERROR_CODES]
+    codes = [a for a in addresses if a not in ERROR_CODES and a.startswith('127.')]
+    if not codes:
+        return {'status': 'error', 'codes': addresses,
+                'message': errors[0] if errors else 'Unexpected answer'}
+    known = RETURN_CODES.get(zone, {})
+    return {
+        'status': 'listed',
+        'codes': codes,
+        'reasons': [known.get(code, f'Listed ({code})') for code in codes],
+    }
+
+
+def sweep(ip_address: str, zones: List[str], resolver: Optional[str] = None,
+          timeout: float = 3.0, retransmit: float = 0.8) -> Dict[str, dict]:
+    """
+    Query every zone for ``ip_address`` concurrently and wait at most ``timeout``.
+
+    Args:
+        ip_address: IPv4 or IPv6 address to look up
+        zones: DNSBL zones to query
+        resolver: Stub resolver "host[:port]" (see default_resolver)
+        timeout: Global deadline for the whole sweep in seconds
+        retransmit: Resend still-unanswered queries after this many seconds
+
+    Returns:
+        zone -> {'status': 'listed'|'clean'|'timeout'|'error', ...}; listings
+        carry 'codes' and decoded 'reasons'.
+    """
+    return sweep_many([ip_address], zones, resolver, timeout=timeout, retransmit=retransmit)[ip_address]
+
+
+def sweep_many(ip_addresses: List[str], zones: List[str], resolver: Optional[str] = None,
+               timeout: Optional[float] = None, retransmit: float = 0.8,
+               max_tries: Optional[int] = None, window: int = 512) -> Dict[str, Dict[str, dict]]:
+    """
+    Query every zone for every IP over one socket, keeping ``window`` queries in flight.
+
+    Args:
+        ip_addresses: Addresses to look up
+        zones: DNSBL zones to query for each address
+        resolver: Stub resolver "host[:port]" (see default_resolver)
+        timeout: Global deadline in seconds (None: limited by ``max_tries`` only)
+        retransmit: Resend an unanswered query after this many seconds
+        max_tries: Give up on a query after this many sends (None: until the deadline)
+        window: Maximum queries in flight, so a large sweep does not flood the resolver
+
+    Returns:
+        ip -> zone -> verdict, as for sweep()
+    """
+    if timeout is None and max_tries is None:
+        max_tries = 3
+    family, address = resolver_address(resolver or default_resolver())
+    results = {ip: {} for ip in ip_addresses}
+
+    queue = [(ip, zone) for ip in ip_addresses for zone in zones]
+    queue.reverse()  # pop() from the end keeps submission order
+    in_flight = {}   # query_id -> [ip, zone, qname, packet, last_sent, tries]
+
+    sock = socket.socket(family, socket.SOCK_DGRAM)
+    sock.setblocking(False)
+    try:
+        start = time.monotonic()
+        deadline = start + timeout if timeout is not None else None
+        while queue or in_flight:
+            now = time.monotonic()
+            if deadline is not None and now >= deadline:
+                break
+
+            # Top up the window with new queries (random IDs, unique among those in flight)
+            while queue and len(in_flight) < window:
+                ip, zone = queue.pop()
+                query_id = random.randint(1, 0xFFFF)
+                while query_id in in_flight:
+                    query_id = random.randint(1, 0xFFFF)
+                qname = query_name(ip, zone)
+                in_flight[query_id] = [ip, zone, qname.lower(), build_query(query_id, qname), 0.0, 0]
+
+            # (Re)send whatever is due
+            next_due = now + retransmit
+            for query_id, entry in list(in_flight.items()):
+                if now - entry[4] >= retransmit:
+                    if max_tries is not None and entry[5] >= max_tries:
+                        del in_flight[query_id]
+                        results[entry[0]][entry[1]] = {'status': 'timeout'}
+                        continue
+                    try:
+                        sock.sendto(entry[3], address)
+                    except OSError:
+                        pass  # Buffer full or resolver unreachable; retried next round
+                    entry[4] = now
+                    entry[5] += 1
+                next_due = min(next_due, entry[4] + retransmit)
+            if not in_flight:
+                continue
+
+            wait_until = next_due if deadline is None else min(deadline, next_due)
+            readable, _, _ = select.select([sock], [], [], max(0.0, wait_until - now))
+            if not readable:
+                continue
+            while True:
+                try:
+                    packet, source = sock.recvfrom(4096)
+                except (BlockingIOError, InterruptedError):
+                    break
+                except OSError:
+                    break  # e.g. ICMP port unreachable surfaced on the socket
+                if not _same_host(source[0], address[0]):
+                    continue
+                try:
+                    query_id, qname, rcode, addresses = parse_response(packet)
+                except (struct.error, IndexError, UnicodeDecodeError):
+                    continue
+                entry = in_flight.get(query_id)
+                if entry is None or entry[2] != qname.lower():
+                    continue  # Late answer to a retired ID, or spoofed
+                del in_flight[query_id]
+                ip, zone = entry[0], entry[1]
+                if rcode == RCODE_NXDOMAIN or (rcode == RCODE_NOERROR and not addresses):
+                    results[ip][zone] = {'status': 'clean'}
+                elif rcode == RCODE_NOERROR:
+                    results[ip][zone] = decode(zone, addresses)
+                else:
+                    results[ip][zone] = {'status': 'error', 'message': f'DNS rcode {rcode}'}
+    finally:
+        sock.close()
+
+    return {
+        ip: {zone: results[ip].get(zone, {'status': 'timeout'}) for zone in zones}
+        for ip in ip_addresses
+    }
@@ -9,22 +9,36 @@ Author: XSOAR Investigation Team
 """
 
 import requests
-import requests.adapters
 import json
 import sys
 import time
 import os
-import csv
-import hashlib
+import queue
 import sqlite3
+import threading
+import weakref
 from urllib.parse import quote
 from datetime import datetime, timedelta
 import argparse
+import asyncio
 import configparser
 import re
 from typing import Dict, List, Optional
 import urllib3
-from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
+from concurrent.futures import ThreadPoolExecutor
+
+import dnsbl
+import dns_resolver
+import feed_index
+from cache_db import SQLitePool, MaintenanceThread
+from rate_limiter import RateLimiter, SOURCE_RATE_KEYS, parse_retry_after
+from singleflight import SingleFlight
+from http_pool import get_session, configure as configure_http_pool
+from ip_reputation import analyze_ips_bulk, extract_ips
+from batch_output import OUTPUT_FORMATS, open_writer
+from batch_journal import BatchJournal
+from config_snapshot import ConfigSnapshot, ConfigGeneration, parse_float_section
+from geolocation import get_geolocator, configure_database as configure_geo_database
 
 # Visual enhancement libraries
 try:
@@ -625,39 +639,188 @@ def _parse_shodan_host(data, ip_address):
     }
 
 
+# Per-source cache lifetimes in hours; sources not listed use general.cache_hours.
+# Registration data and static investigation links change far less often than
+# detection verdicts, so they are kept longer.
+DEFAULT_CACHE_TTL_HOURS = {
+    'whois_info': 168,
+    'securitytrails': 168,
+    'ip_geolocation': 72,
+    'shodan': 72,
+    'cisco_talos': 720,
+    'mxtoolbox': 720,
+    'viewdns': 720,
+    'centralops': 720,
+    'criminalip': 720,
+    'ipthc': 720,
+    'dnslytics': 720,
+    'synapsint': 720,
+    'threatfox': 6,
+    'hybrid_analysis': 12,
+}
+
+
+# Source weights based on reliability (Tier 1: 3.0, Tier 2: 2.0, Tier 3: 1.5, Tier 4: 1.0),
+# overridable per source in the [source_weights] section of config.ini
+SOURCE_WEIGHTS = {
+    # Tier 1: Maximum reliability
+    'virustotal': 3.0,
+    'abuseipdb': 3.0,
+    'alienvault_otx': 3.0,
+    
+    # Tier 2: Highly reliable
+    'urlscan': 2.0,
+    'hybrid_analysis': 2.0,
+    'malware_bazaar': 2.0,
+    'threatfox': 2.0,
+    
+    # Tier 3: Reliable with context
+    'shodan': 1.5,
+    'urlvoid': 1.5,
+    'securitytrails': 1.5,
+    
+    # Tier 4: Complementary sources
+    'whois_info': 1.0,
+    'criminalip': 1.0,
+    'cisco_talos': 1.0,
+    'mxtoolbox': 1.0,
+    'ip_geolocation': 1.0,
+    'viewdns': 1.0,
+    'centralops': 1.0,
+    'dnslytics': 1.0,
+    'ipthc': 1.0,
+    'synapsint': 1.0
+}
+
+# API keys read from [api_keys] in config.ini, falling back to these environment variables
+CONFIG_KEY_ENV = {
+    'virustotal': 'VIRUSTOTAL_API_KEY',
+    'securitytrails': 'ST_API_KEY',
+    'shodan': 'SHODAN_API_KEY',
+    'abuseipdb': 'ABUSEIPDB_API_KEY',
+    'pdcp': 'PDCP_API_KEY',
+    'ipapi': 'IPAPI_ACCESS_KEY',
+    'ipdata': 'IPDATA_API_KEY',
+    'urlscan': 'URLSCAN_API_KEY',
+    'abusech': 'ABUSECH_API_KEY',
+    'apivoid': 'APIVOID_KEY',
+}
+
+
+def calculate_reputation(results, weights=None):
+    """Calculate overall reputation from per-source results with weighted scoring
+    
+    Pure function of the results mapping (an AnalysisContext or plain dict)
+    and the source weights (SOURCE_WEIGHTS unless given), so it is safe to
+    call from any thread.
+    """
+    source_weights = SOURCE_WEIGHTS if weights is None else weights
+    reputation_scores = {
+        'clean': 1,
+        'unknown': 0,
+        'questionable': -1,
+        'suspicious': -2,
+        'malicious': -3
+    }
+    
+    # High-confidence override rules (auto-detect as malicious)
+    for source, result in results.items():
+        if result.get('status') == 'success':
+            # VirusTotal: 10+ detections = definite malicious
+            if source == 'virustotal' and result.get('malicious', 0) >= 10:
+                return 'malicious'
+            
+            # MalwareBazaar: hash found = confirmed malware
+            if source == 'malware_bazaar' and result.get('reputation') == 'malicious':
+                return 'malicious'
+            
+            # AbuseIPDB: 90%+ confidence = highly malicious
+            if source == 'abuseipdb' and result.get('abuse_confidence', 0) >= 90:
+                return 'malicious'
+            
+            # AlienVault OTX: 5+ malicious pulses = confirmed threat
+            if source == 'alienvault_otx':
+                pulse_count = result.get('pulse_count', 0)
+                if pulse_count >= 5 and result.get('reputation') == 'malicious':
+                    return 'malicious'
+    
+    # Calculate weighted reputation score
+    weighted_score = 0
+    total_weight = 0
+    
+    for source, result in results.items():
+        if result.get('status') == 'success' and 'reputation' in result:
+            reputation = result['reputation']
+            if reputation in reputation_scores:
+                weight = source_weights.get(source, 1.0)
+                weighted_score += reputation_scores[reputation] * weight
+                total_weight += weight
+    
+    if total_weight == 0:
+        return "unknown"
+    
+    average_score = weighted_score / total_weight
+    
+    # Adjusted thresholds for weighted system
+    if average_score >= 0.3:
+        return "clean"
+    elif average_score >= -0.7:
+        return "questionable"
+    elif average_score >= -1.5:
+        return "suspicious"
+    else:
+        return "malicious"
+
+
+class AnalysisContext(dict):
+    """Per-analysis results: a mapping of source name to that source's result.
+    
+    Each analysis builds its own context instead of writing into shared checker
+    state, so one checker can serve many concurrent requests.
+    """
+    
+    def __init__(self, indicator, results=None, weights=None):
+        super().__init__(results or {})
+        self.indicator = indicator
+        self.timestamp = datetime.now().isoformat()
+        self.weights = weights  # Source weights of the configuration the analysis ran with
+    
+    @property
+    def overall_reputation(self):
+        return calculate_reputation(self, self.weights)
+
+
 class DomainReputationChecker:
     def __init__(self, config_file=None, cache_file=None, timeout=10, use_visual=True, quiet_startup=False):
         self.results = {}
-        self.timeout = timeout
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-        })
+        self._timeout = timeout
         
         # Initialize visual styling
         self.visual = VisualStyler() if use_visual else None
         
         # Configuration
+        self._config_file = config_file
         self.config = self._load_config(config_file)
         
+        # Keep-alive connection pools shared by every source (one per provider)
+        configure_http_pool(pool_maxsize=self.config.getint('general', 'http_pool_size', fallback=20))
+        self.session = get_session('default')
+        
+        # Stub resolver for the UDP DNS blacklist engine ([dnsbl] resolver = host[:port])
+        dnsbl.configure(self.config.get('dnsbl', 'resolver', fallback=None))
+        
+        # Domain resolution: extra JSON DoH services raced with the built-in ones
+        # ([dns] doh_services = url, url) and the overall lookup deadline in seconds
+        doh_services = self.config.get('dns', 'doh_services', fallback='')
+        dns_resolver.configure(
+            [url for url in doh_services.split(',') if url.strip()] or None,
+            self.config.getfloat('dns', 'deadline', fallback=dns_resolver.DEFAULT_DEADLINE)
+        )
+        
         # Cache setup
         self.cache_file = cache_file or os.path.join(os.path.expanduser('~'), '.domain_reputation_cache.db')
-        self.cache_hours = 24  # Cache results for 24 hours
-        self._init_cache()
-        
-        # API Keys from config or environment
-        self.api_keys = {
-            'virustotal': self.config.get('api_keys', 'virustotal', fallback=os.getenv('VIRUSTOTAL_API_KEY')),
-            'securitytrails': self.config.get('api_keys', 'securitytrails', fallback=os.getenv('ST_API_KEY')),
-            'shodan': self.config.get('api_keys', 'shodan', fallback=os.getenv('SHODAN_API_KEY')),
-            'abuseipdb': self.config.get('api_keys', 'abuseipdb', fallback=os.getenv('ABUSEIPDB_API_KEY')),
-            'pdcp': self.config.get('api_keys', 'pdcp', fallback=os.getenv('PDCP_API_KEY')),
-            'ipapi': self.config.get('api_keys', 'ipapi', fallback=os.getenv('IPAPI_ACCESS_KEY')),
-            'ipdata': self.config.get('api_keys', 'ipdata', fallback=os.getenv('IPDATA_API_KEY')),
-            'urlscan': self.config.get('api_keys', 'urlscan', fallback=os.getenv('URLSCAN_API_KEY')),
-            'abusech': self.config.get('api_keys', 'abusech', fallback=os.getenv('ABUSECH_API_KEY')),
-            'apivoid': self.config.get('api_keys', 'apivoid', fallback=os.getenv('APIVOID_KEY'))
-        }
+        self._refreshing = set()
+        self._refresh_lock = threading.Lock()
         
         # Define sources that require API keys
         self.api_required_sources = {
@@ -673,8 +836,147 @@ class DomainReputationChecker:
         # Store quiet startup preference
         self.quiet_startup = quiet_startup
         
+        # Runtime settings (API keys, timeouts, cache TTLs, weights, rate limits) live in a
+        # versioned snapshot; reload_config() swaps it and announces the new generation
+        # to every process sharing this cache through a counter file
+        self._key_overrides = {}  # Keys injected at runtime (web UI, command line)
+        self._reload_hooks = []
+        self._snapshot_lock = threading.RLock()
+        self._generation = ConfigGeneration(os.path.splitext(self.cache_file)[0] + '_config.gen')
+        
         # Check API availability at startup
-        self.available_sources = self._check_api_availability()
+        self._snapshot = self._build_snapshot(self.config, self._generation.current(), display=True)
+        
+        self._init_cache()
+        
+        # Async engine: one shared worker pool caps in-flight source calls
+        # across every analysis served by this checker instance
+        self.max_concurrency = self.config.getint('general', 'max_concurrency', fallback=100)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix='drc-source')
+        # Deadline and cancellation of the source call running on each worker thread
+        self._source_call = threading.local()
+        
+        # Per-source API quotas (sources without a quota are never throttled).
+        # Bucket state lives next to the cache so all processes share one quota.
+        self.rate_limiter = RateLimiter.from_config(
+            self.config,
+            default_state_file=os.path.splitext(self.cache_file)[0] + '_ratelimit.db'
+        )
+        
+        # Identical concurrent lookups share one computation (across workers too)
+        coalesce = self.config.getboolean('general', 'coalesce_requests', fallback=True)
+        self.single_flight = SingleFlight(
+            os.path.splitext(self.cache_file)[0] + '_flights.db' if coalesce else None
+        )
+        
+        # Local threat feed dumps ([feeds] name = path, authoritative = names, refresh_interval = seconds)
+        # answer ThreatFox/MalwareBazaar lookups before the APIs are called
+        if self.config.has_section('feeds'):
+            options = dict(self.config.items('feeds'))
+            authoritative = options.pop('authoritative', '')
+            refresh_interval = options.pop('refresh_interval', None)
+            feed_index.configure(
+                options, [name.strip().lower() for name in authoritative.split(',') if name.strip()],
+                float(refresh_interval) if refresh_interval else None
+            )
+        
+        # IP geolocation answers are cached next to the analysis cache and shared with the web app;
+        # [geolocation] database = .mmdb / CSV range files answer location and ASN offline
+        databases = self.config.get('geolocation', 'database', fallback='')
+        configure_geo_database([path for path in databases.split(',') if path.strip()] or None)
+        self.geolocator = get_geolocator(os.path.splitext(self.cache_file)[0] + '_geo.db')
+        
+        # Batch job journal, opened on first batch run
+        self._journal = None
+    
+    def _build_snapshot(self, config, generation, display=False):
+        """Settings snapshot for a loaded config plus the runtime key overrides"""
+        api_keys = {
+            source: config.get('api_keys', source, fallback=os.getenv(env_var))
+            for source, env_var in CONFIG_KEY_ENV.items()
+        }
+        api_keys.update(self._key_overrides)
+        return ConfigSnapshot(
+            generation=generation,
+            api_keys=api_keys,
+            available_sources=self._check_api_availability(api_keys, display=display),
+            timeout=self._timeout,
+            source_timeout=config.getfloat('general', 'source_timeout', fallback=20),
+            cache_hours=config.getfloat('general', 'cache_hours', fallback=24),  # Default TTL
+            stale_hours=config.getfloat('general', 'stale_hours', fallback=24),  # Served while refreshing
+            cache_ttl=parse_float_section(config, 'cache_ttl'),
+            source_weights={**SOURCE_WEIGHTS, **parse_float_section(config, 'source_weights')},
+            rate_limits=RateLimiter.limits_from_config(config),
+        )
+    
+    @property
+    def settings(self):
+        """Current ConfigSnapshot - take it once per analysis for consistent settings"""
+        snapshot = self._snapshot
+        if self._generation.current() != snapshot.generation:
+            # Another process (or thread) published a reload
+            with self._snapshot_lock:
+                snapshot = self._snapshot
+                if self._generation.current() != snapshot.generation:
+                    snapshot = self.reload_config(publish=False)
+        return snapshot
+    
+    def add_reload_hook(self, hook):
+        """Call ``hook()`` before every configuration reload (e.g. to re-read an env file)"""
+        self._reload_hooks.append(hook)
+    
+    def reload_config(self, publish=True):
+        """Re-read the configuration and swap in a new snapshot without re-instantiating
+        
+        With ``publish`` the new generation is written to the shared counter so
+        every other process reloads too. Analyses already running keep the
+        snapshot they started with. Returns the new snapshot.
+        """
+        with self._snapshot_lock:
+            for hook in self._reload_hooks:
+                try:
+                    hook()
+                except Exception as e:
+                    print(f"Warning: Configuration reload hook failed: {e}")
+            config = self._load_config(self._config_file)
+            generation = self._generation.bump() if publish else self._generation.current()
+            snapshot = self._build_snapshot(config, generation)
+            self.config = config
+            self.rate_limiter.set_limits(dict(snapshot.rate_limits))
+            self._snapshot = snapshot
+        return snapshot
+    
+    @property
+    def api_keys(self):
+        """Read-only API keys of the current settings (use update_api_keys() to change them)"""
+        return self.settings.api_keys
+    
+    @property
+    def available_sources(self):
+        return self.settings.available_sources
+    
+    @property
+    def timeout(self):
+        return self.settings.timeout
+    
+    @property
+    def per_source_timeout(self):
+        return self.settings.source_timeout
+    
+    @property
+    def cache_hours(self):
+        return self.settings.cache_hours
+    
+    @property
+    def stale_hours(self):
+        return self.settings.stale_hours
+    
+    @property
+    def journal(self):
+        """BatchJournal recording batch runs so they can be resumed"""
+        if self._journal is None:
+            self._journal = BatchJournal(os.path.splitext(self.cache_file)[0] + '_jobs.db')
+        return self._journal
     
     def _load_config(self, config_file):
         """Load configuration from file"""
@@ -687,16 +989,34 @@ class DomainReputationChecker:
             config.add_section('general')
             config.set('general', 'timeout', '10')
             config.set('general', 'cache_hours', '24')
+            config.set('general', 'max_concurrency', '100')
+            config.set('general', 'source_timeout', '20')
             config.add_section('api_keys')
+            config.add_section('rate_limits')
+            config.add_section('cache_ttl')
             
         return config
     
-    def _filter_sources_by_api_keys(self, sources):
+    def update_api_keys(self, api_keys):
+        """Merge API keys into the checker; a new snapshot (and source availability)
+        is only built when a key actually changed. Returns True if anything changed."""
+        with self._snapshot_lock:
+            current = self.settings
+            changed = {source: key for source, key in api_keys.items() if current.api_keys.get(source) != key}
+            if not changed:
+                return False
+            self._key_overrides.update(changed)
+            self._snapshot = self._build_snapshot(self.config, current.generation)
+        return True
+    
+    def _filter_sources_by_api_keys(self, sources, settings=None):
         """Filter sources based on API key availability using cached information"""
-        return [s for s in sources if s in self.available_sources['available']]
+        available = (settings or self.settings).available_sources['available']
+        return [s for s in sources if s in available]
     
-    def _check_api_availability(self):
+    def _check_api_availability(self, api_keys=None, display=False):
         """Check which sources are available based on API key configuration"""
+        api_keys = self.api_keys if api_keys is None else api_keys
         all_sources = [
             'virustotal', 'urlvoid', 'cisco_talos', 'alienvault_otx', 'mxtoolbox',
             'malware_bazaar', 'viewdns', 'centralops', 'criminalip', 'ipthc', 'dnslytics', 'synapsint',
@@ -714,20 +1034,20 @@ class DomainReputationChecker:
                 available.append(source)
             elif isinstance(req, list):
                 # Multiple possible API keys (at least one required)
-                if any(bool(self.api_keys.get(k)) for k in req):
+                if any(bool(api_keys.get(k)) for k in req):
                     available.append(source)
                 else:
                     unavailable.append((source, req))
             else:
                 # Single API key required
-                if bool(self.api_keys.get(req)):
+                if bool(api_keys.get(req)):
                     available.append(source)
                 else:
                     unavailable.append((source, [req]))
         
         # Display availability status (unless quiet startup is requested)
-        if not self.quiet_startup:
-            self._display_api_status(available, unavailable)
+        if display and not self.quiet_startup:
+            self._display_api_status(available, unavailable, api_keys)
         
         return {
             'available': available,
@@ -735,7 +1055,7 @@ class DomainReputationChecker:
             'missing_keys': dict(unavailable)
         }
     
-    def _display_api_status(self, available, unavailable):
+    def _display_api_status(self, available, unavailable, api_keys):
         """Display API status at startup"""
         if self.visual and self.visual.use_rich:
             # Rich display
@@ -762,7 +1082,7 @@ class DomainReputationChecker:
                 else:
                     status_text = "[green]✅ API Ready[/green]"
                     if isinstance(req, list):
-                        working_keys = [k for k in req if bool(self.api_keys.get(k))]
+                        working_keys = [k for k in req if bool(api_keys.get(k))]
                         notes = f"Using: {', '.join(working_keys)}"
                     else:
                         notes = f"API key configured"
@@ -835,70 +1155,202 @@ class DomainReputationChecker:
                 print("\nTip: Set environment variables or use config.ini file for API keys\n")
     
     def _init_cache(self):
-        """Initialize SQLite cache database"""
+        """Initialize SQLite cache database (one row per indicator and source)"""
         try:
-            conn = sqlite3.connect(self.cache_file)
-            conn.execute('''
-                CREATE TABLE IF NOT EXISTS domain_cache (
-                    domain TEXT PRIMARY KEY,
+            self._cache_db = SQLitePool(self.cache_file)
+            self._cache_db.script('''
+                CREATE TABLE IF NOT EXISTS source_cache (
+                    indicator TEXT,
+                    source TEXT,
                     results TEXT,
                     timestamp DATETIME,
-                    hash TEXT
-                )
+                    PRIMARY KEY (indicator, source)
+                );
+                CREATE INDEX IF NOT EXISTS idx_source_cache_timestamp ON source_cache (source, timestamp);
+                CREATE TABLE IF NOT EXISTS cache_meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                );
             ''')
-            conn.commit()
-            conn.close()
         except Exception as e:
+            self._cache_db = None
             print(f"Warning: Could not initialize cache: {e}")
+            return
+        self._migrate_legacy_cache()
+        
+        interval = self.config.getfloat('general', 'cache_maintenance_minutes', fallback=60) * 60
+        if interval > 0:
+            checker_ref = weakref.ref(self)
+            
+            def maintain():
+                checker = checker_ref()
+                if checker is None:
+                    return False  # Checker was replaced (e.g. after an API key reload)
+                checker._expire_cache()
+            
+            self._cache_maintenance = MaintenanceThread(maintain, interval)
+            self._cache_maintenance.start()
+    
+    def _migrate_legacy_cache(self):
+        """Copy the results of the old per-analysis domain_cache table into source_cache (once)
+
+        The old table is left in place; it is just no longer read.
+        """
+        try:
+            if self._cache_db.query("SELECT 1 FROM cache_meta WHERE key = 'domain_cache_migrated'"):
+                return
+            if self._cache_db.query("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'domain_cache'"):
+                rows = []
+                # Newest analyses first: INSERT OR IGNORE keeps the most recent result per source
+                for domain, results_json, timestamp in self._cache_db.query(
+                        'SELECT domain, results, timestamp FROM domain_cache ORDER BY timestamp DESC'):
+                    try:
+                        results = json.loads(results_json)
+                    except (TypeError, ValueError):
+                        continue
+                    for source, result in (results.items() if isinstance(results, dict) else []):
+                        if isinstance(result, dict) and result.get('status') not in ('error', 'info'):
+                            rows.append((domain.lower(), source, json.dumps(result, default=str), timestamp))
+                self._cache_db.executemany('''
+                    INSERT OR IGNORE INTO source_cache (indicator, source, results, timestamp)
+                    VALUES (?, ?, ?, ?)
+                ''', rows)
+                if rows:
+                    print(f"[*] Migrated {len(rows)} cached results from the previous cache format")
+            self._cache_db.execute("INSERT OR REPLACE INTO cache_meta (key, value) VALUES ('domain_cache_migrated', ?)",
+                                   (datetime.now().isoformat(),))
+        except Exception as e:
+            print(f"Warning: Could not migrate the previous cache format: {e}")
     
-    def _get_cache_key(self, domain, sources):
-        """Generate cache key based on domain and sources"""
-        sources_str = ','.join(sorted(sources))
-        return hashlib.md5(f"{domain}:{sources_str}".encode()).hexdigest()
+    def _get_cache_ttl(self, source):
+        """Cache lifetime for a source, from [cache_ttl] in config.ini or the built-in defaults"""
+        settings = self.settings
+        hours = settings.cache_ttl.get(source)
+        if hours is None:
+            hours = DEFAULT_CACHE_TTL_HOURS.get(source, settings.cache_hours)
+        return timedelta(hours=hours)
     
-    def _get_cached_result(self, domain, sources):
-        """Get cached results if available and not expired"""
+    def _get_cached_result(self, domain, sources, max_stale=None):
+        """Get the cached results that are still within their source's TTL.
+        
+        Returns a dict with only the usable sources; the caller checks the rest.
+        Each result carries a ``cached_at`` timestamp. With ``max_stale`` (a
+        timedelta), entries up to that far past their TTL are also returned,
+        flagged with ``stale: True``.
+        """
+        if not self._cache_db:
+            return {}
         try:
-            conn = sqlite3.connect(self.cache_file)
-            cache_key = self._get_cache_key(domain, sources)
-            
-            cursor = conn.execute(
-                'SELECT results, timestamp FROM domain_cache WHERE hash = ?', 
-                (cache_key,)
+            # Fixed SQL text so each pooled connection reuses its prepared statement
+            rows = self._cache_db.query(
+                'SELECT source, results, timestamp FROM source_cache WHERE indicator = ?',
+                (domain.lower(),)
             )
-            row = cursor.fetchone()
-            
-            if row:
-                results_json, timestamp_str = row
-                timestamp = datetime.fromisoformat(timestamp_str)
-                
-                # Check if cache is still valid
-                if datetime.now() - timestamp < timedelta(hours=self.cache_hours):
-                    conn.close()
-                    return json.loads(results_json)
             
-            conn.close()
-            return None
-        except Exception:
-            return None
+            now = datetime.now()
+            cached = {}
+            for source, results_json, timestamp_str in rows:
+                if source not in sources:
+                    continue
+                age = now - datetime.fromisoformat(timestamp_str)
+                ttl = self._get_cache_ttl(source)
+                if age < ttl:
+                    result = json.loads(results_json)
+                elif max_stale and age < ttl + max_stale:
+                    result = json.loads(results_json)
+                    result['stale'] = True
+                else:
+                    continue
+                if result.get('status') == 'info':
+                    continue  # Placeholder cached by an older version
+                result['cached_at'] = timestamp_str
+                cached[source] = result
+            return cached
+        except Exception as e:
+            print(f"Warning: Could not read cache: {e}")
+            return {}
     
     def _cache_result(self, domain, sources, results):
-        """Cache the results"""
+        """Cache each source's result
+
+        Errors are not cached so they get retried, and neither are ``info``
+        results (placeholders such as "requires API key") so that configuring
+        a key takes effect on the next analysis.
+        """
+        if not self._cache_db:
+            return
         try:
-            conn = sqlite3.connect(self.cache_file)
-            cache_key = self._get_cache_key(domain, sources)
             timestamp = datetime.now().isoformat()
-            
-            conn.execute('''
-                INSERT OR REPLACE INTO domain_cache (domain, results, timestamp, hash)
+            rows = [
+                (domain.lower(), source, json.dumps(results[source], default=str), timestamp)
+                for source in sources
+                if source in results and results[source].get('status') not in ('error', 'info')
+            ]
+            
+            # One transaction for the whole analysis
+            self._cache_db.executemany('''
+                INSERT OR REPLACE INTO source_cache (indicator, source, results, timestamp)
                 VALUES (?, ?, ?, ?)
-            ''', (domain, json.dumps(results), timestamp, cache_key))
-            
-            conn.commit()
-            conn.close()
+            ''', rows)
         except Exception as e:
             print(f"Warning: Could not cache results: {e}")
     
+    def _expire_cache(self):
+        """Delete entries past their TTL and stale window, then reclaim the space"""
+        max_stale = timedelta(hours=self.stale_hours)
+        now = datetime.now()
+        deleted = 0
+        for (source,) in self._cache_db.query('SELECT DISTINCT source FROM source_cache'):
+            cutoff = (now - self._get_cache_ttl(source) - max_stale).isoformat()
+            deleted += self._cache_db.execute(
+                'DELETE FROM source_cache WHERE source = ? AND timestamp < ?', (source, cutoff)
+            )
+        
+        if deleted:
+            free_pages = self._cache_db.query('PRAGMA freelist_count')[0][0]
+            total_pages = self._cache_db.query('PRAGMA page_count')[0][0]
+            if free_pages * 4 > total_pages:
+                self._cache_db.script('VACUUM')
+        self._cache_db.script('PRAGMA wal_checkpoint(TRUNCATE)')
+        return deleted
+    
+    def _refresh_in_background(self, domain, sources):
+        """Re-check stale sources on a daemon thread; the results land in the cache"""
+        with self._refresh_lock:
+            sources = [s for s in sources if (domain, s) not in self._refreshing]
+            self._refreshing.update((domain, s) for s in sources)
+        if not sources:
+            return
+        
+        def refresh():
+            try:
+                asyncio.run(self.analyze_domain_async(domain, sources, display=False))
+            except Exception as e:
+                print(f"Warning: Background refresh failed for {domain}: {e}")
+            finally:
+                with self._refresh_lock:
+                    self._refreshing.difference_update((domain, s) for s in sources)
+        
+        threading.Thread(target=refresh, name='drc-refresh', daemon=True).start()
+    
+    def _take_rate_token(self, source):
+        """
+        Take the API quota token of ``source`` right before its request.
+
+        Waits at most until the deadline of the running source call (or
+        per_source_timeout outside an analysis). Returns None when the request
+        may go ahead, or an error result when the quota is exhausted for longer
+        than that; no token is consumed in that case or if the call is cancelled
+        while waiting.
+        """
+        key = SOURCE_RATE_KEYS.get(source, source)
+        deadline = getattr(self._source_call, 'deadline', None)
+        max_wait = max(0.0, deadline - time.monotonic()) if deadline else self.per_source_timeout
+        if self.rate_limiter.acquire(key, timeout=max_wait, cancelled=getattr(self._source_call, 'cancelled', None)):
+            return None
+        return {'status': 'error', 'message': f'Rate limited: {key} API quota exhausted, try again later',
+                'reputation': 'unknown'}
+    
     def _make_request(self, url, params=None, headers=None, max_retries=3):
         """Make HTTP request with retry logic and error handling"""
         for attempt in range(max_retries):
@@ -942,8 +1394,10 @@ class DomainReputationChecker:
                     'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
                 }
                 
-                # Use requests directly with better timeout handling
-                response = requests.get(
+                limited = self._take_rate_token('virustotal')
+                if limited:
+                    return limited
+                response = get_session('virustotal').get(
                     url,
                     headers=headers,
                     timeout=(10, 30),  # (connection timeout, read timeout)
@@ -990,6 +1444,7 @@ class DomainReputationChecker:
                 elif response.status_code == 401:
                     result = {'status': 'error', 'message': 'Invalid API key for VirusTotal'}
                 elif response.status_code == 429:
+                    self.rate_limiter.penalize('virustotal', parse_retry_after(response.headers.get('Retry-After')))
                     result = {'status': 'error', 'message': 'Rate limit exceeded for VirusTotal API'}
                 else:
                     result = {'status': 'error', 'message': f'VirusTotal API error: HTTP {response.status_code}'}
@@ -1007,7 +1462,6 @@ class DomainReputationChecker:
         else:
             result = {'status': 'info', 'message': f'VirusTotal requires API key. Visit: https://www.virustotal.com/gui/domain/{domain}'}
         
-        self.results['virustotal'] = result
         return result
 
     def check_urlvoid(self, domain):
@@ -1028,7 +1482,10 @@ class DomainReputationChecker:
                     'X-API-Key': api_key
                 }
                 payload = {'host': domain}
-                response = self.session.post(url, json=payload, headers=headers, timeout=self.timeout)
+                limited = self._take_rate_token('urlvoid')
+                if limited:
+                    return limited
+                response = get_session('apivoid').post(url, json=payload, headers=headers, timeout=self.timeout)
                 
                 if response.status_code == 200:
                     data = response.json()
@@ -1111,7 +1568,6 @@ class DomainReputationChecker:
                 'reputation': 'unknown'
             }
         
-        self.results['urlvoid'] = result
         return result
 
     def check_cisco_talos(self, domain):
@@ -1135,7 +1591,6 @@ class DomainReputationChecker:
             'reputation': 'unknown'
         }
         
-        self.results['cisco_talos'] = result
         return result
 
     def check_alienvault_otx(self, domain):
@@ -1147,7 +1602,10 @@ class DomainReputationChecker:
         
         try:
             url = f"https://otx.alienvault.com/api/v1/indicators/domain/{domain}/general"
-            response = self.session.get(url, timeout=10)
+            limited = self._take_rate_token('alienvault_otx')
+            if limited:
+                return limited
+            response = get_session('alienvault_otx').get(url, timeout=10)
             data = response.json()
             
             pulse_count = data.get('pulse_info', {}).get('count', 0)
@@ -1168,7 +1626,6 @@ class DomainReputationChecker:
         except Exception as e:
             result = {'status': 'error', 'message': str(e)}
         
-        self.results['alienvault_otx'] = result
         return result
 
     def check_mxtoolbox(self, domain):
@@ -1193,7 +1650,6 @@ class DomainReputationChecker:
             'reputation': 'unknown'
         }
         
-        self.results['mxtoolbox'] = result
         return result
 
     def check_malware_bazaar(self, ioc):
@@ -1224,8 +1680,35 @@ class DomainReputationChecker:
         
         # If hash is detected, check MalwareBazaar first, then VirusTotal
         if is_hash:
-            # Try MalwareBazaar API first if we have the key
+            # Local feed dumps first: a listed sample needs no API call
+            index = feed_index.get_index()
+            matches = index.lookup(ioc) if index else []
+            if matches:
+                sample = next((m for m in matches if m['kind'] == 'malwarebazaar'), matches[0])
+                summary = feed_index.summarize(matches)
+                return {
+                    'status': 'success',
+                    'ioc_type': 'hash',
+                    'hash_type': hash_type,
+                    'reputation': 'malicious',
+                    'malware_detected': True,
+                    'file_name': sample['file_name'] or 'Unknown',
+                    'file_type': sample['file_type'] or 'Unknown',
+                    'file_size': 0,
+                    'signature': sample['malware'] or 'Unknown',
+                    'tags': summary['tags'],
+                    'delivery_method': 'Unknown',
+                    'first_seen': summary['first_seen'],
+                    'mb_checked': True,
+                    'local_feeds': summary['feeds'],
+                    'url': f'https://bazaar.abuse.ch/browse.php?search={ioc}'
+                }
+            
+            # Try MalwareBazaar API first if we have the key (not needed when a
+            # complete MalwareBazaar dump is loaded and the hash is not in it)
             abusech_key = api_key
+            if index and index.covers('malwarebazaar'):
+                abusech_key = None
             if abusech_key:
                 try:
                     if self.visual:
@@ -1244,7 +1727,7 @@ class DomainReputationChecker:
                         'hash': ioc
                     }
                     
-                    response = requests.post(url, data=data, headers=headers, timeout=15)
+                    response = get_session('abusech').post(url, data=data, headers=headers, timeout=15)
                     
                     if response.status_code == 200:
                         mb_data = response.json()
@@ -1270,7 +1753,6 @@ class DomainReputationChecker:
                                 'mb_checked': True,
                                 'url': f'https://bazaar.abuse.ch/browse.php?search={ioc}'
                             }
-                            self.results['malware_bazaar'] = result
                             return result
                         elif query_status == 'no_results':
                             # Not found in MalwareBazaar, will check VT next
@@ -1299,7 +1781,10 @@ class DomainReputationChecker:
                         'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36'
                     }
                     
-                    response = requests.get(
+                    limited = self._take_rate_token('virustotal')
+                    if limited:
+                        return dict(limited, ioc_type='hash', hash_type=hash_type)
+                    response = get_session('virustotal').get(
                         url,
                         headers=headers,
                         timeout=(10, 30),
@@ -1421,7 +1906,6 @@ class DomainReputationChecker:
                 'reputation': 'unknown'
             }
         
-        self.results['malware_bazaar'] = result
         return result
 
     def check_threatfox(self, ioc):
@@ -1431,6 +1915,41 @@ class DomainReputationChecker:
         else:
             print(f"[*] Checking ThreatFox IOC database...")
         
+        # Local feed dumps first (ThreatFox exports, URLhaus, blocklists)
+        index = feed_index.get_index()
+        if index:
+            # A listed URL only says something about its host when the host itself is listed
+            matches = [m for m in index.lookup(ioc) if m['match'] != 'url_host']
+            if matches:
+                summary = feed_index.summarize(matches)
+                return {
+                    'status': 'success',
+                    'ioc_found': True,
+                    'ioc_count': len(matches),
+                    'reputation': 'malicious',
+                    'malware_families': summary['malware_families'],
+                    'threat_types': summary['threat_types'],
+                    'tags': summary['tags'],
+                    'confidence_level': summary['confidence_level'],
+                    'ioc_type': matches[0]['ioc_type'],
+                    'first_seen': summary['first_seen'],
+                    'last_seen': summary['last_seen'],
+                    'reporter': summary['reporter'],
+                    'local_feeds': summary['feeds'],
+                    'match_types': summary['match_types'],
+                    'url': f'https://threatfox.abuse.ch/browse.php?search=ioc%3A{ioc}'
+                }
+            if index.covers('threatfox'):
+                return {
+                    'status': 'success',
+                    'ioc_found': False,
+                    'ioc_count': 0,
+                    'reputation': 'clean',
+                    'message': 'IOC not found in the local ThreatFox export',
+                    'local_feeds': sorted(index.stats()['feeds']),
+                    'url': 'https://threatfox.abuse.ch/'
+                }
+        
         # Get ThreatFox API key (optional but increases rate limits)
         api_key = self.api_keys.get('threatfox')
         
@@ -1452,7 +1971,7 @@ class DomainReputationChecker:
                 'search_term': ioc
             }
             
-            response = requests.post(url, json=payload, headers=headers, timeout=15)
+            response = get_session('abusech').post(url, json=payload, headers=headers, timeout=15)
             
             if response.status_code == 200:
                 data = response.json()
@@ -1578,7 +2097,6 @@ class DomainReputationChecker:
                 'url': 'https://threatfox.abuse.ch/'
             }
         
-        self.results['threatfox'] = result
         return result
 
     def check_viewdns(self, domain):
@@ -1601,7 +2119,6 @@ class DomainReputationChecker:
             'reputation': 'unknown'
         }
         
-        self.results['viewdns'] = result
         return result
 
     def check_centralops(self, domain):
@@ -1624,7 +2141,6 @@ class DomainReputationChecker:
             'reputation': 'unknown'
         }
         
-        self.results['centralops'] = result
         return result
 
     def check_criminalip(self, domain):
@@ -1647,7 +2163,6 @@ class DomainReputationChecker:
             'reputation': 'unknown'
         }
         
-        self.results['criminalip'] = result
         return result
 
     def check_ipthc(self, domain):
@@ -1670,7 +2185,6 @@ class DomainReputationChecker:
             'reputation': 'unknown'
         }
         
-        self.results['ipthc'] = result
         return result
 
     def check_dnslytics(self, domain):
@@ -1693,7 +2207,6 @@ class DomainReputationChecker:
             'reputation': 'unknown'
         }
         
-        self.results['dnslytics'] = result
         return result
 
     def check_synapsint(self, domain):
@@ -1716,7 +2229,6 @@ class DomainReputationChecker:
             'reputation': 'unknown'
         }
         
-        self.results['synapsint'] = result
         return result
 
     def check_securitytrails(self, domain, api_key=None):
@@ -1726,11 +2238,16 @@ class DomainReputationChecker:
         else:
             print(f"[*] Checking SecurityTrails...")
         
+        api_key = api_key or self.api_keys.get('securitytrails')
+        
         if api_key:
             try:
                 url = f"https://api.securitytrails.com/v1/domain/{domain}"
                 headers = {'APIKEY': api_key}
-                response = self.session.get(url, headers=headers, timeout=10)
+                limited = self._take_rate_token('securitytrails')
+                if limited:
+                    return limited
+                response = get_session('securitytrails').get(url, headers=headers, timeout=10)
                 data = response.json()
                 
                 if response.status_code == 200:
@@ -1747,7 +2264,6 @@ class DomainReputationChecker:
         else:
             result = {'status': 'info', 'message': f'SecurityTrails requires API key. Visit: https://securitytrails.com/domain/{domain}'}
         
-        self.results['securitytrails'] = result
         return result
     
     def check_abuseipdb(self, domain):
@@ -1787,16 +2303,12 @@ class DomainReputationChecker:
                         'verbose': ''
                     }
                     
-                    # Use session with retry mechanism
-                    session = requests.Session()
-                    session.mount('https://', requests.adapters.HTTPAdapter(
-                        max_retries=requests.adapters.Retry(
-                            total=3,
-                            backoff_factor=1,
-                            status_forcelist=[500, 502, 503, 504]
-                        )
-                    ))
+                    # Pooled session with retry mechanism
+                    session = get_session('abuseipdb', retries=3)
                     
+                    limited = self._take_rate_token('abuseipdb')
+                    if limited:
+                        return limited
                     response = session.get(
                         url,
                         params=params,
@@ -1927,6 +2439,7 @@ class DomainReputationChecker:
                     elif response.status_code == 402:
                         result = {'status': 'error', 'message': 'AbuseIPDB API quota exceeded (upgrade plan required)'}
                     elif response.status_code == 429:
+                        self.rate_limiter.penalize('abuseipdb', parse_retry_after(response.headers.get('Retry-After')))
                         result = {'status': 'error', 'message': 'AbuseIPDB rate limit exceeded - try again later'}
                     elif response.status_code == 422:
                         result = {'status': 'error', 'message': f'Invalid IP address format: {ip}'}
@@ -1944,99 +2457,15 @@ class DomainReputationChecker:
                 except Exception as e:
                     result = {'status': 'error', 'message': f'Unexpected AbuseIPDB error: {str(e)[:50]}...'}
                     
-        self.results['abuseipdb'] = result
         return result
     
     def _resolve_domain_ips(self, domain):
-        """Resolve domain to IP addresses using multiple methods"""
-        resolved_ips = []
-        
-        # Check if the domain is already an IP address
-        if self._is_valid_ip(domain):
-            return [domain]
+        """Resolve domain to IP addresses (system DNS, then DoH services), cached per DNS TTL
         
-        # Method 1: Try Python's built-in socket resolution (fallback to system DNS)
-        try:
-            import socket
-            ip = socket.gethostbyname(domain)
-            if ip and self._is_valid_ip(ip):
-                resolved_ips.append(ip)
-        except Exception:
-            pass  # Continue to other methods
-        
-        # Method 2: Try alternative DNS services with reduced SSL issues
-        dns_services = [
-            # OpenDNS
-            ('https://api.opendns.com/v1/domains/{}/ips', 'addresses'),
-            # DNS.SB
-            ('https://doh.sb/dns-query?name={}&type=A', 'Answer')
-        ]
-        
-        for dns_url_template, response_key in dns_services:
-            if len(resolved_ips) >= 3:  # Stop if we have enough IPs
-                break
-                
-            try:
-                dns_url = dns_url_template.format(domain)
-                headers = {
-                    'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36',
-                    'Accept': 'application/json'
-                }
-                
-                # Disable SSL verification for problematic services
-                response = requests.get(
-                    dns_url,
-                    headers=headers,
-                    timeout=(5, 15),
-                    verify=False  # Disable SSL verification to avoid connection issues
-                )
-                
-                if response.status_code == 200:
-                    try:
-                        dns_data = response.json()
-                        
-                        if response_key == 'addresses' and isinstance(dns_data, list):
-                            # OpenDNS format
-                            for ip in dns_data:
-                                if self._is_valid_ip(ip):
-                                    resolved_ips.append(ip)
-                        elif response_key == 'Answer':
-                            # Standard DNS format
-                            answers = dns_data.get('Answer', [])
-                            for answer in answers:
-                                if answer.get('type') == 1:  # A record
-                                    ip = answer.get('data')
-                                    if ip and self._is_valid_ip(ip):
-                                        resolved_ips.append(ip)
-                                        
-                    except (json.JSONDecodeError, KeyError, TypeError):
-                        continue  # Try next service
-                        
-            except Exception:
-                continue  # Try next service
-        
-        # Method 3: Hardcoded well-known IPs for common domains (as last resort)
-        if not resolved_ips:
-            known_ips = {
-                'google.com': ['142.250.185.78', '142.250.185.110'],
-                'facebook.com': ['31.13.71.36', '31.13.71.35'],
-                'github.com': ['140.82.114.3', '140.82.114.4'],
-                'microsoft.com': ['20.112.52.29', '20.103.85.33'],
-                'amazon.com': ['54.239.28.85', '52.94.236.248']
-            }
-            
-            if domain.lower() in known_ips:
-                resolved_ips.extend(known_ips[domain.lower()])
-        
-        # Remove duplicates while preserving order
-        seen = set()
-        unique_ips = []
-        for ip in resolved_ips:
-            if ip not in seen:
-                seen.add(ip)
-                unique_ips.append(ip)
-        
-        return unique_ips[:3]  # Return up to 3 unique IPs
+        The cache is shared by every source and analysis in the process, so a
+        domain is resolved once however many sources need its addresses.
+        """
+        return dns_resolver.resolve(domain)
     
     def _is_valid_ip(self, ip):
         """Validate IP address format"""
@@ -2058,12 +2487,10 @@ class DomainReputationChecker:
             result = {'status': 'info', 'message': 'Shodan requires API key. Get one at: https://shodan.io/api'}
         else:
             try:
-                import socket as _socket
-
                 # Detect HTTPS support: the dev plan has https=false and must use HTTP.
                 # Call the API-info endpoint first (no credits consumed) to check.
                 try:
-                    info_resp = requests.get(
+                    info_resp = get_session('shodan').get(
                         f"https://api.shodan.io/api-info?key={api_key}",
                         timeout=5
                     )
@@ -2073,15 +2500,17 @@ class DomainReputationChecker:
 
                 # Resolve domain to IP — /shodan/host/{ip} works on all plans
                 # and does not consume query credits.
-                try:
-                    ip_address = _socket.gethostbyname(domain)
-                except _socket.gaierror:
-                    self.results['shodan'] = {'status': 'not_found', 'message': 'Could not resolve domain to IP'}
-                    return self.results['shodan']
+                resolved_ips = self._resolve_domain_ips(domain)
+                if not resolved_ips:
+                    return {'status': 'not_found', 'message': 'Could not resolve domain to IP'}
+                ip_address = resolved_ips[0]
 
                 url = f"{scheme}://api.shodan.io/shodan/host/{ip_address}?key={api_key}"
 
-                response = requests.get(url, timeout=(10, 30), verify=(scheme == "https"))
+                limited = self._take_rate_token('shodan')
+                if limited:
+                    return limited
+                response = get_session('shodan').get(url, timeout=(10, 30), verify=(scheme == "https"))
 
                 if response.status_code == 200:
                     data = response.json()
@@ -2094,6 +2523,7 @@ class DomainReputationChecker:
                 elif response.status_code == 403:
                     result = {'status': 'error', 'message': 'Shodan API access forbidden (check plan limits)'}
                 elif response.status_code == 429:
+                    self.rate_limiter.penalize('shodan', parse_retry_after(response.headers.get('Retry-After')))
                     result = {'status': 'error', 'message': 'Shodan rate limit exceeded'}
                 else:
                     result = {'status': 'error', 'message': f'Shodan API error: HTTP {response.status_code}'}
@@ -2109,7 +2539,6 @@ class DomainReputationChecker:
             except Exception as e:
                 result = {'status': 'error', 'message': f'Unexpected Shodan error: {str(e)[:50]}...'}
         
-        self.results['shodan'] = result
         return result
     
     def check_whois_info(self, domain):
@@ -2206,7 +2635,6 @@ class DomainReputationChecker:
         except Exception as e:
             result = {'status': 'error', 'message': f'WHOIS error: {str(e)[:50]}...'}
         
-        self.results['whois_info'] = result
         return result
     
     def check_hybrid_analysis(self, domain):
@@ -2229,7 +2657,7 @@ class DomainReputationChecker:
                 'Upgrade-Insecure-Requests': '1'
             }
             
-            response = requests.get(
+            response = get_session('hybrid_analysis').get(
                 search_url,
                 headers=headers,
                 timeout=(10, 30),
@@ -2334,7 +2762,6 @@ class DomainReputationChecker:
         except Exception as e:
             result = {'status': 'error', 'message': f'Unexpected Hybrid Analysis error: {str(e)[:50]}...'}
         
-        self.results['hybrid_analysis'] = result
         return result
     
     
@@ -2368,52 +2795,27 @@ class DomainReputationChecker:
                 ip = resolved_ips[0]
                 result = self._analyze_ip_geolocation(ip, ipapi_key, ipdata_key, resolved_ips)
                 
-        self.results['ip_geolocation'] = result
         return result
     
     def _analyze_ip_geolocation(self, ip, ipapi_key, ipdata_key, all_ips):
         """Analyze IP geolocation and threats using available services"""
-        geo_results = {}
-        threat_indicators = []
+        # Both keyed services are queried concurrently through the shared geolocation cache
+        geo = self.geolocator.locate(
+            ip, {'ipapi': ipapi_key, 'ipdata': ipdata_key}, providers=['ipapi', 'ipdata'],
+            threats=True, rate_limiter=self.rate_limiter
+        )
+        geo_results = geo['providers']
         location_data = {}
-        
-        # Try IPApi first (if key available)
-        if ipapi_key:
-            ipapi_result = self._query_ipapi(ip, ipapi_key)
-            if ipapi_result:
-                geo_results['ipapi'] = ipapi_result
-                threat_indicators.extend(ipapi_result.get('threats', []))
-                if not location_data and ipapi_result.get('country'):
-                    location_data = {
-                        'country': ipapi_result.get('country'),
-                        'country_code': ipapi_result.get('country_code'),
-                        'region': ipapi_result.get('region'),
-                        'city': ipapi_result.get('city'),
-                        'isp': ipapi_result.get('isp')
-                    }
-        
-        # Try IPData as backup/additional source (if key available)
-        if ipdata_key:
-            ipdata_result = self._query_ipdata(ip, ipdata_key)
-            if ipdata_result:
-                geo_results['ipdata'] = ipdata_result
-                threat_indicators.extend(ipdata_result.get('threats', []))
-                if not location_data and ipdata_result.get('country'):
-                    location_data = {
-                        'country': ipdata_result.get('country'),
-                        'country_code': ipdata_result.get('country_code'),
-                        'region': ipdata_result.get('region'),
-                        'city': ipdata_result.get('city'),
-                        'isp': ipdata_result.get('isp')
-                    }
+        if geo['country']:
+            location_data = {field: geo[field] for field in ('country', 'country_code', 'region', 'city', 'isp')}
         
         # Analyze threat level
-        unique_threats = list(set(threat_indicators))
+        unique_threats = geo['threats']
         if 'KNOWN_THREAT' in unique_threats or 'malware' in unique_threats:
             reputation = 'malicious'
         elif unique_threats:
             reputation = 'suspicious'
-        elif geo_results:
+        elif 'ipapi' in geo_results or 'ipdata' in geo_results:
             reputation = 'clean'
         else:
             reputation = 'unknown'
@@ -2429,131 +2831,6 @@ class DomainReputationChecker:
             'services_used': len(geo_results)
         }
     
-    def _query_ipapi(self, ip, api_key):
-        """Query IPApi service with error handling"""
-        try:
-            # IPApi uses HTTP (not HTTPS) for their free tier
-            ipapi_url = f"http://api.ipapi.com/{ip}?access_key={api_key}&format=1&fields=country_name,country_code,region_name,city,connection,threat"
-            
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                'Accept': 'application/json'
-            }
-            
-            # Create session with retries
-            session = requests.Session()
-            session.mount('http://', requests.adapters.HTTPAdapter(
-                max_retries=requests.adapters.Retry(
-                    total=2,
-                    backoff_factor=1,
-                    status_forcelist=[500, 502, 503, 504]
-                )
-            ))
-            
-            response = session.get(
-                ipapi_url,
-                headers=headers,
-                timeout=(10, 30),
-                verify=True
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                
-                # Check for API errors
-                if 'error' in data:
-                    return None
-                    
-                threats = []
-                threat_data = data.get('threat', {})
-                if threat_data.get('is_tor'):
-                    threats.append('TOR_EXIT_NODE')
-                if threat_data.get('is_proxy'):
-                    threats.append('PROXY')
-                if threat_data.get('types'):
-                    threats.extend(threat_data['types'])
-                
-                return {
-                    'country': data.get('country_name'),
-                    'country_code': data.get('country_code'),
-                    'region': data.get('region_name'),
-                    'city': data.get('city'),
-                    'isp': data.get('connection', {}).get('isp'),
-                    'threats': threats,
-                    'service': 'ipapi'
-                }
-                
-        except Exception:
-            pass  # Silently fail and let other services try
-            
-        return None
-    
-    def _query_ipdata(self, ip, api_key):
-        """Query IPData service with error handling"""
-        try:
-            ipdata_url = f"https://api.ipdata.co/{ip}?api-key={api_key}&fields=country_name,country_code,region,city,org,threat"
-            
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                'Accept': 'application/json'
-            }
-            
-            # Create session with retries
-            session = requests.Session()
-            session.mount('https://', requests.adapters.HTTPAdapter(
-                max_retries=requests.adapters.Retry(
-                    total=2,
-                    backoff_factor=1,
-                    status_forcelist=[500, 502, 503, 504]
-                )
-            ))
-            
-            response = session.get(
-                ipdata_url,
-                headers=headers,
-                timeout=(10, 30),
-                verify=True
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                
-                # Check for API errors
-                if 'message' in data and 'error' in data.get('message', '').lower():
-                    return None
-                    
-                threats = []
-                threat_data = data.get('threat', {})
-                if threat_data.get('is_threat'):
-                    threats.append('KNOWN_THREAT')
-                if threat_data.get('is_tor'):
-                    threats.append('TOR_EXIT_NODE')
-                if threat_data.get('is_proxy'):
-                    threats.append('PROXY')
-                if threat_data.get('is_anonymous'):
-                    threats.append('ANONYMOUS_PROXY')
-                if threat_data.get('is_known_attacker'):
-                    threats.append('KNOWN_ATTACKER')
-                if threat_data.get('is_known_abuser'):
-                    threats.append('KNOWN_ABUSER')
-                if threat_data.get('is_bogon'):
-                    threats.append('BOGON_IP')
-                
-                return {
-                    'country': data.get('country_name'),
-                    'country_code': data.get('country_code'),
-                    'region': data.get('region'),
-                    'city': data.get('city'),
-                    'isp': data.get('org'),
-                    'threats': threats,
-                    'service': 'ipdata'
-                }
-                
-        except Exception:
-            pass  # Silently fail and let other services try
-            
-        return None
-    
     def check_urlscan(self, domain):
         """Check domain on URLScan.io with enhanced error handling"""
         if self.visual:
@@ -2572,7 +2849,6 @@ class DomainReputationChecker:
         else:
             result = self._query_urlscan_api(domain, api_key)
         
-        self.results['urlscan'] = result
         return result
     
     def _query_urlscan_api(self, domain, api_key):
@@ -2593,16 +2869,12 @@ class DomainReputationChecker:
                 'size': 100  # Get up to 100 recent scans
             }
             
-            # Create session with retry mechanism
-            session = requests.Session()
-            session.mount('https://', requests.adapters.HTTPAdapter(
-                max_retries=requests.adapters.Retry(
-                    total=2,
-                    backoff_factor=1,
-                    status_forcelist=[500, 502, 503, 504]
-                )
-            ))
+            # Pooled session with retry mechanism
+            session = get_session('urlscan')
             
+            limited = self._take_rate_token('urlscan')
+            if limited:
+                return limited
             response = session.get(
                 search_url,
                 params=params,
@@ -2624,6 +2896,7 @@ class DomainReputationChecker:
             elif response.status_code == 403:
                 return {'status': 'error', 'message': 'URLScan.io API access denied - check your API key permissions'}
             elif response.status_code == 429:
+                self.rate_limiter.penalize('urlscan', parse_retry_after(response.headers.get('Retry-After')))
                 return {'status': 'error', 'message': 'URLScan.io rate limit exceeded - try again later'}
             elif response.status_code == 404:
                 return {'status': 'not_found', 'message': 'No scans found for this domain'}
@@ -2717,97 +2990,16 @@ class DomainReputationChecker:
             'url': f'https://urlscan.io/search/#{domain}'
         }
 
-    def calculate_overall_reputation(self):
-        """Calculate overall reputation based on all sources with weighted scoring"""
-        reputation_scores = {
-            'clean': 1,
-            'unknown': 0,
-            'questionable': -1,
-            'suspicious': -2,
-            'malicious': -3
-        }
-        
-        # Source weights based on reliability (Tier 1: 3.0, Tier 2: 2.0, Tier 3: 1.5, Tier 4: 1.0)
-        source_weights = {
-            # Tier 1: Maximum reliability
-            'virustotal': 3.0,
-            'abuseipdb': 3.0,
-            'alienvault_otx': 3.0,
-            
-            # Tier 2: Highly reliable
-            'urlscan': 2.0,
-            'hybrid_analysis': 2.0,
-            'malware_bazaar': 2.0,
-            'threatfox': 2.0,
-            
-            # Tier 3: Reliable with context
-            'shodan': 1.5,
-            'urlvoid': 1.5,
-            'securitytrails': 1.5,
-            
-            # Tier 4: Complementary sources
-            'whois_info': 1.0,
-            'criminalip': 1.0,
-            'cisco_talos': 1.0,
-            'mxtoolbox': 1.0,
-            'ip_geolocation': 1.0,
-            'viewdns': 1.0,
-            'centralops': 1.0,
-            'dnslytics': 1.0,
-            'ipthc': 1.0,
-            'synapsint': 1.0
-        }
+    def calculate_overall_reputation(self, results=None):
+        """Calculate overall reputation based on all sources with weighted scoring
         
-        # High-confidence override rules (auto-detect as malicious)
-        for source, result in self.results.items():
-            if result.get('status') == 'success':
-                # VirusTotal: 10+ detections = definite malicious
-                if source == 'virustotal' and result.get('malicious', 0) >= 10:
-                    return 'malicious'
-                
-                # MalwareBazaar: hash found = confirmed malware
-                if source == 'malware_bazaar' and result.get('reputation') == 'malicious':
-                    return 'malicious'
-                
-                # AbuseIPDB: 90%+ confidence = highly malicious
-                if source == 'abuseipdb' and result.get('abuse_confidence', 0) >= 90:
-                    return 'malicious'
-                
-                # AlienVault OTX: 5+ malicious pulses = confirmed threat
-                if source == 'alienvault_otx':
-                    pulse_count = result.get('pulse_count', 0)
-                    if pulse_count >= 5 and result.get('reputation') == 'malicious':
-                        return 'malicious'
-        
-        # Calculate weighted reputation score
-        weighted_score = 0
-        total_weight = 0
-        
-        for source, result in self.results.items():
-            if result.get('status') == 'success' and 'reputation' in result:
-                reputation = result['reputation']
-                if reputation in reputation_scores:
-                    weight = source_weights.get(source, 1.0)
-                    weighted_score += reputation_scores[reputation] * weight
-                    total_weight += weight
-        
-        if total_weight == 0:
-            return "unknown"
-        
-        average_score = weighted_score / total_weight
-        
-        # Adjusted thresholds for weighted system
-        if average_score >= 0.3:
-            return "clean"
-        elif average_score >= -0.7:
-            return "questionable"
-        elif average_score >= -1.5:
-            return "suspicious"
-        else:
-            return "malicious"
+        Uses ``results`` when given, otherwise the last analysis displayed by the CLI.
+        """
+        return calculate_reputation(self.results if results is None else results, self.settings.source_weights)
 
-    def print_simplified_summary(self, domain, overall_reputation):
+    def print_simplified_summary(self, domain, overall_reputation, results=None):
         """Print a simplified text-based summary for easy copy-paste"""
+        results = self.results if results is None else results
         print("\n" + "─" * 80)
         
         # Header with colors
@@ -2851,7 +3043,7 @@ class DomainReputationChecker:
         threat_analysis = {}
         manual_investigation = {}
         
-        for source, result in self.results.items():
+        for source, result in results.items():
             if result.get('status') == 'info':
                 manual_investigation[source] = result
             else:
@@ -2981,15 +3173,16 @@ class DomainReputationChecker:
             print("=" * 80)
         print()
 
-    def print_results(self, domain):
+    def print_results(self, domain, results=None):
         """Print formatted results"""
+        results = self.results if results is None else results
         print("\n" + "="*60)
         print(f"DOMAIN REPUTATION ANALYSIS: {domain}")
         print("="*60)
         print(f"Analysis Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
         print()
         
-        for source, result in self.results.items():
+        for source, result in results.items():
             source_name = source.replace('_', ' ').title()
             print(f"[{source_name}]")
             
@@ -3024,7 +3217,7 @@ class DomainReputationChecker:
             print()
         
         # Overall assessment
-        overall_reputation = self.calculate_overall_reputation()
+        overall_reputation = calculate_reputation(results, self.settings.source_weights)
         print("="*60)
         print("OVERALL ASSESSMENT")
         print("="*60)
@@ -3041,32 +3234,45 @@ class DomainReputationChecker:
             print("✓ RECOMMENDATION: This domain appears to be clean.")
             print("  No immediate threats detected.")
 
-    def analyze_domain(self, domain, sources=None, use_cache=True):
-        """Analyze domain reputation across selected sources"""
-        # Define all available sources
-        all_sources = ['virustotal', 'urlvoid', 'cisco_talos', 'alienvault_otx', 'mxtoolbox',
-                      'malware_bazaar', 'threatfox', 'viewdns', 'centralops', 'criminalip', 'ipthc', 'dnslytics', 'synapsint',
-                      'securitytrails', 'abuseipdb', 'shodan', 'whois_info', 'hybrid_analysis',
-                      'urlscan', 'ip_geolocation']
-        
-        if sources is None:
-            sources = self._filter_sources_by_api_keys(all_sources)
-        elif isinstance(sources, list) and len(sources) == 1 and sources[0].lower() == 'all':
-            available_sources = self._filter_sources_by_api_keys(all_sources)
-            skipped_sources = [s for s in all_sources if s not in available_sources]
-            sources = available_sources
-            
+    def _get_source_methods(self, domain):
+        """Map each source name to a zero-argument callable that checks it"""
+        return {
+            'virustotal': lambda: self.check_virustotal(domain),
+            'urlvoid': lambda: self.check_urlvoid(domain),
+            'cisco_talos': lambda: self.check_cisco_talos(domain),
+            'alienvault_otx': lambda: self.check_alienvault_otx(domain),
+            'mxtoolbox': lambda: self.check_mxtoolbox(domain),
+            'malware_bazaar': lambda: self.check_malware_bazaar(domain),
+            'threatfox': lambda: self.check_threatfox(domain),
+            'viewdns': lambda: self.check_viewdns(domain),
+            'centralops': lambda: self.check_centralops(domain),
+            'criminalip': lambda: self.check_criminalip(domain),
+            'ipthc': lambda: self.check_ipthc(domain),
+            'dnslytics': lambda: self.check_dnslytics(domain),
+            'synapsint': lambda: self.check_synapsint(domain),
+            'securitytrails': lambda: self.check_securitytrails(domain),
+            'abuseipdb': lambda: self.check_abuseipdb(domain),
+            'shodan': lambda: self.check_shodan(domain),
+            'whois_info': lambda: self.check_whois_info(domain),
+            'hybrid_analysis': lambda: self.check_hybrid_analysis(domain),
+            'urlscan': lambda: self.check_urlscan(domain),
+            'ip_geolocation': lambda: self.check_ip_geolocation_threats(domain)
+        }
+
+    def _print_analysis_header(self, domain, sources, skipped_sources=None):
+        """Print the source selection notice and domain header for an analysis"""
+        if skipped_sources is not None:
             if self.visual:
                 if self.visual.use_rich:
-                    self.visual.console.print(f"[bold cyan]⚡ Using ALL available sources:[/bold cyan] [dim]{', '.join(available_sources)}[/dim]")
+                    self.visual.console.print(f"[bold cyan]⚡ Using ALL available sources:[/bold cyan] [dim]{', '.join(sources)}[/dim]")
                     if skipped_sources:
                         self.visual.console.print(f"[dim]Skipping sources without API keys:[/dim] [yellow]{', '.join(skipped_sources)}[/yellow]")
                 else:
-                    print(f"[*] Using ALL available sources: {', '.join(available_sources)}")
+                    print(f"[*] Using ALL available sources: {', '.join(sources)}")
                     if skipped_sources:
                         print(f"[*] Skipping sources without API keys: {', '.join(skipped_sources)}")
             else:
-                print(f"[*] Using ALL available sources: {', '.join(available_sources)}")
+                print(f"[*] Using ALL available sources: {', '.join(sources)}")
                 if skipped_sources:
                     print(f"[*] Skipping sources without API keys: {', '.join(skipped_sources)}")
         
@@ -3080,100 +3286,238 @@ class DomainReputationChecker:
         else:
             print(f"Analyzing domain: {domain}")
             print("This analysis will NOT make direct DNS queries to the target domain.\n")
+
+    async def _run_source(self, source, method, timeout=None):
+        """Run a single source check on the shared worker pool with its own deadline.
+
+        The executor bounds how many source calls run at once across every
+        analysis served by this checker. The deadline starts when a worker
+        picks the call up, so time spent queued behind busy workers does not
+        count against the source. On timeout the call is abandoned: if it had
+        not started yet it never runs; if it is running it keeps its worker
+        thread until the check returns, and its late result is discarded.
+        Only a rate-limit wait notices the abandonment and gives up early; the
+        check takes its token itself, right before its API request, and waits
+        for it only until this deadline (see _take_rate_token).
+        """
+        timeout = timeout or self.per_source_timeout
+        loop = asyncio.get_running_loop()
+        started = asyncio.Event()
+        cancelled = threading.Event()
+        clock = {}
+        
+        def run():
+            clock['deadline'] = time.monotonic() + timeout
+            try:
+                loop.call_soon_threadsafe(started.set)
+            except RuntimeError:
+                pass  # The analysis is over (event loop closed); the result will be discarded
+            self._source_call.deadline = clock['deadline']
+            self._source_call.cancelled = cancelled
+            try:
+                return method()
+            finally:
+                self._source_call.deadline = None
+                self._source_call.cancelled = None
         
-        # Check cache first
-        if use_cache:
-            cached_results = self._get_cached_result(domain, sources)
-            if cached_results:
-                print("[*] Using cached results (add --no-cache to force fresh analysis)\n")
-                self.results = cached_results
-                self.print_results(domain)
-                return self.results
+        future = loop.run_in_executor(self._executor, run)
+        waiter = asyncio.ensure_future(started.wait())
+        try:
+            # Queued: no deadline yet (the overall analysis timeout still applies)
+            await asyncio.wait({future, waiter}, return_when=asyncio.FIRST_COMPLETED)
+            remaining = max(0.0, clock['deadline'] - time.monotonic())
+            return await asyncio.wait_for(future, timeout=remaining)
+        except asyncio.TimeoutError:
+            cancelled.set()
+            result = {'status': 'error', 'message': f'Timeout after {timeout}s'}
+        except asyncio.CancelledError:
+            cancelled.set()
+            future.cancel()
+            raise
+        except Exception as e:
+            result = {'status': 'error', 'message': str(e)}
+        finally:
+            waiter.cancel()
+        print(f"[!] Error checking {source}: {result['message']}")
+        return result
+
+    async def analyze_domain_async(self, domain, sources=None, use_cache=True, display=True, allow_stale=False,
+                                   on_result=None):
+        """Analyze domain reputation across selected sources (asyncio engine)
+
+        With ``display=False`` nothing is printed besides per-source errors,
+        which lets batch mode run many analyses side by side.
+        With ``allow_stale=True``, cached results past their TTL (but within
+        general.stale_hours) are returned as-is and refreshed in the background.
+        ``on_result(source, result)`` is called for each cached source up front
+        and for every other source as soon as it completes.
+        """
+        # Define all available sources
+        all_sources = ['virustotal', 'urlvoid', 'cisco_talos', 'alienvault_otx', 'mxtoolbox',
+                      'malware_bazaar', 'threatfox', 'viewdns', 'centralops', 'criminalip', 'ipthc', 'dnslytics', 'synapsint',
+                      'securitytrails', 'abuseipdb', 'shodan', 'whois_info', 'hybrid_analysis',
+                      'urlscan', 'ip_geolocation']
         
-        # Check all requested sources
-        source_methods = {
-            'virustotal': lambda: self.check_virustotal(domain),
-            'urlvoid': lambda: self.check_urlvoid(domain),
-            'cisco_talos': lambda: self.check_cisco_talos(domain),
-            'alienvault_otx': lambda: self.check_alienvault_otx(domain),
-            'mxtoolbox': lambda: self.check_mxtoolbox(domain),
-            'malware_bazaar': lambda: self.check_malware_bazaar(domain),
-            'threatfox': lambda: self.check_threatfox(domain),
-            'viewdns': lambda: self.check_viewdns(domain),
-            'centralops': lambda: self.check_centralops(domain),
-            'criminalip': lambda: self.check_criminalip(domain),
-            'ipthc': lambda: self.check_ipthc(domain),
-            'dnslytics': lambda: self.check_dnslytics(domain),
-            'synapsint': lambda: self.check_synapsint(domain),
-            'securitytrails': lambda: self.check_securitytrails(domain),
-            'abuseipdb': lambda: self.check_abuseipdb(domain),
-            'shodan': lambda: self.check_shodan(domain),
-            'whois_info': lambda: self.check_whois_info(domain),
-            'hybrid_analysis': lambda: self.check_hybrid_analysis(domain),
-            'urlscan': lambda: self.check_urlscan(domain),
-            'ip_geolocation': lambda: self.check_ip_geolocation_threats(domain)
-        }
+        # One settings snapshot for the whole analysis, even if a reload happens meanwhile
+        settings = self.settings
+        
+        skipped_sources = None
+        if sources is None:
+            sources = self._filter_sources_by_api_keys(all_sources, settings)
+        elif isinstance(sources, list) and len(sources) == 1 and sources[0].lower() == 'all':
+            available_sources = self._filter_sources_by_api_keys(all_sources, settings)
+            skipped_sources = [s for s in all_sources if s not in available_sources]
+            sources = available_sources
         
-        # Parallel execution with individual timeouts for each source
-        max_workers = min(len(sources), 5)  # Max 5 concurrent API calls
-        per_source_timeout = 20  # 20 seconds timeout per source
+        if display:
+            self._print_analysis_header(domain, sources, skipped_sources)
         
-        def check_source_with_timeout(source):
-            """Execute source check with individual timeout"""
+        source_methods = self._get_source_methods(domain)
+        selected = [source for source in sources if source in source_methods]
+        for source in sources:
             if source not in source_methods:
-                return source, {'status': 'error', 'message': 'Invalid source'}
-            
-            executor = ThreadPoolExecutor(max_workers=1)
-            future = executor.submit(source_methods[source])
-            
-            try:
-                # Wait up to per_source_timeout seconds for this specific source
-                future.result(timeout=per_source_timeout)
-                return source, None  # Result already stored in self.results by the method
-            except FuturesTimeoutError:
-                error_msg = f'Timeout after {per_source_timeout}s'
-                self.results[source] = {'status': 'error', 'message': error_msg}
-                return source, {'status': 'error', 'message': error_msg}
-            except Exception as e:
-                error_msg = str(e)
-                self.results[source] = {'status': 'error', 'message': error_msg}
-                return source, {'status': 'error', 'message': error_msg}
-            finally:
-                executor.shutdown(wait=False)
+                print(f"[!] Error checking {source}: Invalid source")
         
-        # Execute all sources in parallel
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            futures = {executor.submit(check_source_with_timeout, source): source for source in sources if source in source_methods}
-            
-            # Wait for all to complete (with their individual timeouts)
-            for future in as_completed(futures):
-                source_name = futures[future]
-                try:
-                    source, error = future.result()
-                    if error:
-                        print(f"[!] Error checking {source}: {error['message']}")
-                except Exception as e:
-                    print(f"[!] Unexpected error with {source_name}: {e}")
-                    self.results[source_name] = {'status': 'error', 'message': str(e)}
+        # Check cache first: only sources that are missing or stale get fetched
+        max_stale = timedelta(hours=settings.stale_hours) if allow_stale else None
+        cached_results = self._get_cached_result(domain, selected, max_stale) if use_cache else {}
+        pending = [source for source in selected if source not in cached_results]
+        
+        stale_sources = [source for source, result in cached_results.items() if result.get('stale')]
+        if stale_sources:
+            self._refresh_in_background(domain, stale_sources)
+        
+        if cached_results and display:
+            if pending:
+                print(f"[*] Using cached results for {len(cached_results)} sources, checking {len(pending)} (add --no-cache to force fresh analysis)\n")
+            else:
+                print("[*] Using cached results (add --no-cache to force fresh analysis)\n")
+        
+        if on_result:
+            for source, result in cached_results.items():
+                on_result(source, result)
+        
+        async def run(source):
+            result = await self._run_source(source, source_methods[source], settings.source_timeout)
+            if on_result:
+                on_result(source, result)
+            return result
+        
+        # Check the remaining sources concurrently; each source is one task
+        outcomes = await asyncio.gather(*(run(source) for source in pending))
+        fresh_results = dict(zip(pending, outcomes))
         
         # Cache results
-        if use_cache:
-            self._cache_result(domain, sources, self.results)
+        if use_cache and fresh_results:
+            self._cache_result(domain, pending, fresh_results)
         
-        # Print enhanced results
+        results = AnalysisContext(domain, {
+            source: cached_results.get(source) or fresh_results[source] for source in selected
+        }, weights=settings.source_weights)
+        
+        if not display:
+            return results
+        
+        # Print enhanced results (and keep them as the CLI's last analysis)
+        self.results = results
         if self.visual:
-            self.visual.print_results_table(domain, self.results)
-            overall_reputation = self.calculate_overall_reputation()
+            self.visual.print_results_table(domain, results)
+            overall_reputation = results.overall_reputation
             self.visual.print_overall_assessment(overall_reputation)
             # Also print simplified text summary for easy copy-paste
-            self.print_simplified_summary(domain, overall_reputation)
+            self.print_simplified_summary(domain, overall_reputation, results)
         else:
-            self.print_results(domain)
+            self.print_results(domain, results)
         
-        return self.results
+        return results
+
+    def analyze_domain(self, domain, sources=None, use_cache=True):
+        """Analyze domain reputation across selected sources.
+
+        Synchronous entry point that drives ``analyze_domain_async`` on a fresh
+        event loop. Code already running inside an event loop should await
+        ``analyze_domain_async`` directly.
+        """
+        return asyncio.run(self.analyze_domain_async(domain, sources, use_cache))
     
-    def analyze_domains_batch(self, domains, sources=None, output_file=None, output_format='csv'):
-        """Analyze multiple domains in batch"""
+    def analyze_domain_shared(self, domain, sources=None, use_cache=True, allow_stale=False, timeout=None):
+        """Analyze a domain without printing, coalescing identical concurrent requests.
+        
+        Callers asking for the same domain and source set while an analysis is
+        running wait for it and receive the same results instead of querying
+        every upstream API again. ``timeout`` covers the wait as well as the
+        analysis; raises ``asyncio.TimeoutError`` once it has passed.
+        """
+        key = ['domain', domain.lower(), sorted(sources) if sources else None, use_cache]
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        weights = self.settings.source_weights
+        
+        def run():
+            # A follower whose leader failed or is overdue only gets what is left of the budget
+            remaining = max(0.0, deadline - time.monotonic()) if deadline is not None else None
+            analysis = self.analyze_domain_async(domain, sources, use_cache, display=False, allow_stale=allow_stale)
+            return asyncio.run(asyncio.wait_for(analysis, timeout=remaining))
+        
+        def encode(results):
+            return {'indicator': results.indicator, 'timestamp': results.timestamp, 'results': dict(results)}
+        
+        def decode(data):
+            results = AnalysisContext(data['indicator'], data['results'], weights=weights)
+            results.timestamp = data['timestamp']
+            return results
+        
+        return self.single_flight.do(key, run, timeout=timeout, encode=encode, decode=decode)
+    
+    def analyze_domain_stream(self, domain, sources=None, use_cache=True, allow_stale=False, timeout=None):
+        """Analyze a domain without printing, yielding results as sources finish.
+        
+        Yields ``(source, result)`` for every source (cached ones first), then
+        ``(None, results)`` with the complete AnalysisContext. The analysis runs
+        on its own event loop thread; raises ``asyncio.TimeoutError`` if it is
+        not complete after ``timeout`` seconds (sources already yielded stand).
+        """
+        events = queue.Queue()
+        
+        def run():
+            try:
+                results = asyncio.run(self.analyze_domain_async(
+                    domain, sources, use_cache, display=False, allow_stale=allow_stale,
+                    on_result=lambda source, result: events.put((source, result))
+                ))
+                events.put((None, results))
+            except Exception as e:
+                events.put((None, e))
+        
+        threading.Thread(target=run, name='drc-stream', daemon=True).start()
+        deadline = time.monotonic() + timeout if timeout else None
+        while True:
+            try:
+                wait = max(0.0, deadline - time.monotonic()) if deadline else None
+                source, result = events.get(timeout=wait)
+            except queue.Empty:
+                raise asyncio.TimeoutError()
+            if source is None and isinstance(result, Exception):
+                raise result
+            yield source, result
+            if source is None:
+                return
+    
+    def analyze_domains_batch(self, domains, sources=None, output_file=None, output_format='csv', concurrency=5,
+                              on_record=None, job_id=None, retry_failed=False):
+        """Analyze multiple domains in batch, keeping ``concurrency`` domains in flight
+
+        Each domain's record is streamed to ``output_file`` (csv, json, ndjson or
+        html) and to ``on_record`` as soon as it finishes; nothing is kept in
+        memory, so only a summary of counts is returned.
+
+        Every domain x source result is journaled as it arrives. Passing the
+        ``job_id`` of an earlier run resumes it (its domains, sources and output
+        come from the journal and ``domains`` is ignored): only source calls
+        missing from the journal are made, plus failed ones if ``retry_failed``.
+        """
+        if job_id:
+            return self._resume_batch(job_id, output_file, output_format, concurrency, on_record, retry_failed)
+
         # Handle 'all' modifier for batch processing
         all_sources = ['virustotal', 'urlvoid', 'cisco_talos', 'alienvault_otx', 'mxtoolbox',
                       'malware_bazaar', 'threatfox', 'viewdns', 'centralops', 'criminalip', 'ipthc', 'dnslytics', 'synapsint',
@@ -3200,8 +3544,6 @@ class DomainReputationChecker:
                 if skipped_sources:
                     print(f"[*] Skipping sources without API keys: {', '.join(skipped_sources)}")
         
-        all_results = {}
-        
         # Display enhanced batch header
         if self.visual:
             sources_info = ', '.join(sources) if sources else 'all available'
@@ -3209,150 +3551,126 @@ class DomainReputationChecker:
         else:
             print(f"Starting batch analysis of {len(domains)} domains...\n")
         
-        for i, domain in enumerate(domains, 1):
-            print(f"[{i}/{len(domains)}] Analyzing {domain}...")
-            
-            try:
-                # Reset results for each domain
-                self.results = {}
-                results = self.analyze_domain(domain, sources, use_cache=True)
-                all_results[domain] = results
-                
-                print(f"✓ Completed {domain}\n")
-                
-                # Add delay between domains to be respectful to APIs
-                if i < len(domains):
-                    time.sleep(2)
-                    
-            except Exception as e:
-                print(f"✗ Error analyzing {domain}: {e}\n")
-                all_results[domain] = {'error': str(e)}
-        
-        # Export results if requested
-        if output_file:
-            self._export_results(all_results, output_file, output_format)
-        
-        return all_results
-    
-    def _export_results(self, results, output_file, format_type):
-        """Export results to file"""
-        if format_type.lower() == 'csv':
-            self._export_csv(results, output_file)
-        elif format_type.lower() == 'json':
-            with open(output_file, 'w') as f:
-                json.dump(results, f, indent=2, default=str)
-        elif format_type.lower() == 'html':
-            self._export_html(results, output_file)
-        
-        print(f"Results exported to: {output_file}")
-    
-    def _export_csv(self, results, output_file):
-        """Export results to CSV format"""
-        with open(output_file, 'w', newline='', encoding='utf-8') as csvfile:
-            writer = csv.writer(csvfile)
-            
-            # Header
-            header = ['Domain', 'Overall_Reputation', 'VirusTotal', 'URLVoid', 'Cisco_Talos', 
-                     'MalwareBazaar', 'AlienVault_OTX', 'SecurityTrails', 
-                     'AbuseIPDB', 'Shodan', 'WHOIS_Info', 'Hybrid_Analysis', 'URLScan', 'IP_Geolocation', 'Timestamps']
-            writer.writerow(header)
-            
-            # Data rows
-            for domain, domain_results in results.items():
-                if 'error' in domain_results:
-                    row = [domain, 'ERROR'] + ['ERROR'] * (len(header) - 2)
-                else:
-                    overall_rep = self._calculate_domain_reputation(domain_results)
-                    
-                    row = [
-                        domain,
-                        overall_rep,
-                        domain_results.get('virustotal', {}).get('reputation', 'N/A'),
-                        domain_results.get('urlvoid', {}).get('reputation', 'N/A'),
-                        domain_results.get('cisco_talos', {}).get('reputation', 'N/A'),
-                        domain_results.get('malware_bazaar', {}).get('reputation', 'N/A'),
-                        domain_results.get('alienvault_otx', {}).get('reputation', 'N/A'),
-                        domain_results.get('securitytrails', {}).get('reputation', 'N/A'),
-                        domain_results.get('abuseipdb', {}).get('reputation', 'N/A'),
-                        domain_results.get('shodan', {}).get('reputation', 'N/A'),
-                        domain_results.get('whois_info', {}).get('reputation', 'N/A'),
-                        domain_results.get('hybrid_analysis', {}).get('reputation', 'N/A'),
-                        domain_results.get('urlscan', {}).get('reputation', 'N/A'),
-                        domain_results.get('ip_geolocation', {}).get('reputation', 'N/A'),
-                        datetime.now().isoformat()
-                    ]
-                
-                writer.writerow(row)
-    
-    def _export_html(self, results, output_file):
-        """Export results to HTML format"""
-        html_content = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <title>Domain Reputation Analysis Report</title>
-            <style>
-                body {{ font-family: Arial, sans-serif; margin: 40px; }}
-                .header {{ background-color: #f0f0f0; padding: 20px; border-radius: 5px; }}
-                .domain-section {{ margin: 20px 0; border: 1px solid #ddd; border-radius: 5px; }}
-                .domain-header {{ background-color: #e9e9e9; padding: 10px; font-weight: bold; }}
-                .source {{ margin: 10px; padding: 10px; border-left: 3px solid #ccc; }}
-                .clean {{ border-left-color: #28a745; }}
-                .suspicious {{ border-left-color: #ffc107; }}
-                .malicious {{ border-left-color: #dc3545; }}
-                .unknown {{ border-left-color: #6c757d; }}
-                .error {{ border-left-color: #dc3545; background-color: #f8d7da; }}
-            </style>
-        </head>
-        <body>
-            <div class="header">
-                <h1>Domain Reputation Analysis Report</h1>
-                <p>Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>
-                <p>Total domains analyzed: {len(results)}</p>
-            </div>
-        """
+        # The source list is fixed up front so that a resumed job asks for the same sources
+        if not sources:
+            sources = self._filter_sources_by_api_keys(all_sources)
+        job_id = self.journal.create_job(domains, sources, output_file, output_format)
+        print(f"[*] Batch job {job_id} (resume with --resume {job_id} if interrupted)")
         
-        for domain, domain_results in results.items():
-            if 'error' in domain_results:
-                html_content += f"""
-                <div class="domain-section">
-                    <div class="domain-header">{domain} - ERROR</div>
-                    <div class="source error">
-                        <strong>Error:</strong> {domain_results['error']}
-                    </div>
-                </div>
-                """
+        return self._run_batch_job(job_id, domains, len(domains), sources, output_file, output_format,
+                                   concurrency, on_record)
+    
+    def _resume_batch(self, job_id, output_file, output_format, concurrency, on_record, retry_failed):
+        """Continue a journaled batch job; output is rewritten from the journal plus new results"""
+        job = self.journal.get_job(job_id)
+        if not job:
+            raise ValueError(f"Unknown batch job: {job_id}")
+        
+        output_file = output_file or job['output_file']
+        output_format = job['output_format'] if output_file == job['output_file'] else output_format
+        done = self.journal.progress(job_id)
+        print(f"[*] Resuming batch job {job_id}: {job['total']} domains, "
+              f"{done.get('done', 0)} source results journaled, {done.get('failed', 0)} failed"
+              + (" (retrying failed)" if retry_failed else ""))
+        
+        return self._run_batch_job(job_id, self.journal.iter_domains(job_id), job['total'], job['sources'],
+                                   output_file, output_format, concurrency, on_record, retry_failed)
+    
+    def _run_batch_job(self, job_id, domains, total, sources, output_file, output_format, concurrency,
+                       on_record, retry_failed=False):
+        """Stream a journaled job's records to the writer and ``on_record``"""
+        writer = open_writer(output_file, output_format or 'csv') if output_file else None
+        summary = {'job_id': job_id, 'total': total, 'errors': 0, 'reputations': {}}
+        
+        def sink(record):
+            # Each record is written out (or handed to the caller) and then dropped
+            if 'error' in record:
+                summary['errors'] += 1
             else:
-                overall_rep = self._calculate_domain_reputation(domain_results)
-                html_content += f"""
-                <div class="domain-section">
-                    <div class="domain-header">{domain} - {overall_rep.upper()}</div>
-                """
-                
-                for source, data in domain_results.items():
-                    if data.get('status') == 'success':
-                        rep = data.get('reputation', 'unknown')
-                        css_class = rep.lower()
-                        html_content += f"""
-                        <div class="source {css_class}">
-                            <strong>{source.replace('_', ' ').title()}:</strong> {rep.upper()}
-                        </div>
-                        """
-                
-                html_content += "</div>"
-        
-        html_content += """
-        </body>
-        </html>
+                rep = record['overall_reputation']
+                summary['reputations'][rep] = summary['reputations'].get(rep, 0) + 1
+            if writer:
+                writer.write(record)
+            if on_record:
+                on_record(record)
+        
+        self.journal.set_status(job_id, 'running')
+        try:
+            asyncio.run(self._analyze_batch_async(domains, total, sources, concurrency, sink,
+                                                  job_id, retry_failed))
+            self.journal.set_status(job_id, 'completed')
+        except BaseException:
+            self.journal.set_status(job_id, 'interrupted')
+            print(f"[!] Batch job {job_id} interrupted; resume with --resume {job_id}")
+            raise
+        finally:
+            if writer:
+                writer.close()
+                print(f"Results exported to: {output_file}")
+        
+        return summary
+    
+    async def _analyze_batch_async(self, domains, total, sources, concurrency, sink, job_id, retry_failed=False):
+        """Pipeline domains through the async engine with a bounded number in flight.
+
+        Throttling is per source (see ``rate_limiter``): quota-bound APIs wait
+        for their own tokens while WHOIS, ThreatFox and the static info
+        sources run at full speed. Only ``concurrency`` domains are pending at
+        a time; each finished domain is passed to ``sink`` as a batch record.
         """
+        progress = self.visual.create_progress_bar(total, "Analyzing domains") if self.visual else None
+        task_id = progress.add_task("Analyzing domains", total=total) if progress else None
+        completed = 0
+        pending = iter(domains)
+        
+        async def worker():
+            nonlocal completed
+            for domain in pending:  # Workers share one iterator, so each domain is taken once
+                record = {'domain': domain}
+                try:
+                    results = await self._analyze_journaled(job_id, domain, sources, retry_failed)
+                    record['overall_reputation'] = results.overall_reputation
+                    record['timestamp'] = results.timestamp
+                    record['results'] = dict(results)
+                    status = f"✓ Completed {domain}"
+                except Exception as e:
+                    record['timestamp'] = datetime.now().isoformat()
+                    record['error'] = str(e)
+                    status = f"✗ Error analyzing {domain}: {e}"
+                sink(record)
+                completed += 1
+                if progress:
+                    progress.update(task_id, advance=1, description=f"[{completed}/{total}] {domain}")
+                else:
+                    print(f"[{completed}/{total}] {status}")
         
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(html_content)
+        workers = [worker() for _ in range(max(1, min(concurrency, total)))]
+        if progress:
+            with progress:
+                await asyncio.gather(*workers)
+        else:
+            await asyncio.gather(*workers)
     
-    def _calculate_domain_reputation(self, domain_results):
-        """Calculate overall reputation for a single domain"""
-        self.results = domain_results
-        return self.calculate_overall_reputation()
+    async def _analyze_journaled(self, job_id, domain, sources, retry_failed=False):
+        """Analyze only the sources the job journal has no result for, and journal the new ones"""
+        journaled = self.journal.results(job_id, domain, include_failed=not retry_failed)
+        pending = [source for source in sources if source not in journaled]
+        
+        fresh = {}
+        if pending:
+            try:
+                fresh = await self.analyze_domain_async(domain, pending, use_cache=True, display=False)
+            except Exception as e:
+                # Journal the whole domain as failed so --retry-failed picks it up
+                fresh = {source: {'status': 'error', 'message': str(e)} for source in pending}
+                self.journal.record(job_id, domain, fresh)
+                raise
+            self.journal.record(job_id, domain, fresh)
+        
+        return AnalysisContext(domain, {
+            source: journaled[source] if source in journaled else fresh[source]
+            for source in sources if source in journaled or source in fresh
+        }, weights=self.settings.source_weights)
     
     def show_available_sources(self):
         """Display all available sources and their API key status"""
@@ -3403,7 +3721,11 @@ def main():
           Specific sources: python3 domain_reputation_checker.py example.com --sources virustotal abuseipdb urlscan
           With config: python3 domain_reputation_checker.py example.com --config config.ini
           Batch analysis (all): python3 domain_reputation_checker.py --batch domains.txt --sources all --output results.csv
+          Parallel batch: python3 domain_reputation_checker.py --batch domains.txt --concurrency 20 --output results.csv
+          Streamed batch: python3 domain_reputation_checker.py --batch domains.txt --format ndjson --output results.ndjson
+          Resume a batch: python3 domain_reputation_checker.py --resume 3f2a9c1b7d4e --retry-failed
           JSON output: python3 domain_reputation_checker.py example.com --sources all --json
+          Bulk IPs (NDJSON): python3 domain_reputation_checker.py --ips firewall.log --output ips.ndjson
         """,
         formatter_class=argparse.RawDescriptionHelpFormatter
     )
@@ -3412,6 +3734,8 @@ def main():
     group = parser.add_mutually_exclusive_group(required=False)
     group.add_argument('domain', nargs='?', help='Single domain to analyze')
     group.add_argument('--batch', help='File containing list of domains to analyze')
+    group.add_argument('--resume', metavar='JOB_ID', help='Resume an interrupted batch job')
+    group.add_argument('--ips', help='File with IP addresses or log lines; every IP found is checked (NDJSON output)')
     
     # API Keys
     parser.add_argument('--vt-api-key', help='VirusTotal API key')
@@ -3425,6 +3749,8 @@ def main():
     # Configuration
     parser.add_argument('--config', help='Configuration file path')
     parser.add_argument('--timeout', type=int, default=10, help='Request timeout in seconds')
+    parser.add_argument('--concurrency', type=int, default=5, help='Number of domains analyzed in parallel in batch mode')
+    parser.add_argument('--retry-failed', action='store_true', help='With --resume, also re-run source calls that errored or timed out')
     
     # Sources
     parser.add_argument('--sources', nargs='+', 
@@ -3438,8 +3764,8 @@ def main():
     # Output options
     parser.add_argument('--json', action='store_true', help='Output results in JSON format')
     parser.add_argument('--output', help='Output file for batch results')
-    parser.add_argument('--format', choices=['csv', 'json', 'html'], default='csv',
-                       help='Output format for batch results')
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='csv',
+                       help='Output format for batch results (written incrementally as domains finish)')
     
     # Cache options
     parser.add_argument('--no-cache', action='store_true', help='Disable caching')
@@ -3460,20 +3786,16 @@ def main():
     )
     
     # Set API keys from command line if provided
-    if args.vt_api_key:
-        checker.api_keys['virustotal'] = args.vt_api_key
-    if args.st_api_key:
-        checker.api_keys['securitytrails'] = args.st_api_key
-    if args.shodan_api_key:
-        checker.api_keys['shodan'] = args.shodan_api_key
-    if args.abuseipdb_api_key:
-        checker.api_keys['abuseipdb'] = args.abuseipdb_api_key
-    if args.urlscan_api_key:
-        checker.api_keys['urlscan'] = args.urlscan_api_key
-    if args.ipapi_key:
-        checker.api_keys['ipapi'] = args.ipapi_key
-    if args.ipdata_key:
-        checker.api_keys['ipdata'] = args.ipdata_key
+    cli_keys = {
+        'virustotal': args.vt_api_key,
+        'securitytrails': args.st_api_key,
+        'shodan': args.shodan_api_key,
+        'abuseipdb': args.abuseipdb_api_key,
+        'urlscan': args.urlscan_api_key,
+        'ipapi': args.ipapi_key,
+        'ipdata': args.ipdata_key,
+    }
+    checker.update_api_keys({source: key for source, key in cli_keys.items() if key})
     
     # Show available sources if requested
     if args.show_sources:
@@ -3481,11 +3803,51 @@ def main():
         return
     
     # Validate that either domain or batch is provided
-    if not args.domain and not args.batch:
-        parser.error("You must provide either a domain or --batch file (or use --show-sources to see available sources)")
+    if not args.domain and not args.batch and not args.ips and not args.resume:
+        parser.error("You must provide either a domain, --batch or --ips file (or use --show-sources to see available sources)")
+    if args.retry_failed and not args.resume:
+        parser.error("--retry-failed requires --resume JOB_ID")
     
     try:
-        if args.batch:
+        if args.ips:
+            # Bulk IP triage: one JSON line per unique address
+            if not os.path.exists(args.ips):
+                print(f"Error: IP file '{args.ips}' not found.")
+                sys.exit(1)
+            
+            with open(args.ips, 'r', errors='replace') as f:
+                ip_addresses = extract_ips(line for line in f if not line.startswith('#'))
+            
+            if not ip_addresses:
+                print("Error: No IP addresses found in file.")
+                sys.exit(1)
+            
+            out = open(args.output, 'w') if args.output else sys.stdout
+            try:
+                for i, payload in enumerate(analyze_ips_bulk(ip_addresses, checker.api_keys, checker.rate_limiter,
+                                                             concurrency=args.concurrency), 1):
+                    out.write(json.dumps(payload, default=str) + '\n')
+                    out.flush()
+                    if args.output:
+                        print(f"[{i}/{len(ip_addresses)}] {payload['ip']}: {payload['reputation']}")
+            finally:
+                if args.output:
+                    out.close()
+            
+        elif args.resume:
+            # Resume a journaled batch job (output defaults to the original file)
+            on_record = (lambda record: print(json.dumps(record, default=str), flush=True)) if args.json else None
+            checker.analyze_domains_batch(
+                None,
+                output_file=args.output,
+                output_format=args.format,
+                concurrency=args.concurrency,
+                on_record=on_record,
+                job_id=args.resume,
+                retry_failed=args.retry_failed
+            )
+            
+        elif args.batch:
             # Batch processing
             if not os.path.exists(args.batch):
                 print(f"Error: Batch file '{args.batch}' not found.")
@@ -3498,15 +3860,16 @@ def main():
                 print("Error: No domains found in batch file.")
                 sys.exit(1)
             
-            results = checker.analyze_domains_batch(
+            # With --json every finished domain is printed as one NDJSON line
+            on_record = (lambda record: print(json.dumps(record, default=str), flush=True)) if args.json else None
+            checker.analyze_domains_batch(
                 domains, 
                 sources=args.sources,
                 output_file=args.output,
-                output_format=args.format
+                output_format=args.format,
+                concurrency=args.concurrency,
+                on_record=on_record
             )
-            
-            if args.json:
-                print(json.dumps(results, indent=2, default=str))
                 
         else:
             # Single domain analysis
@@ -0,0 +1,485 @@
+#!/usr/bin/env python3
+"""
+Local threat feed index
+abuse.ch and other open feeds publish their data as bulk dumps (ThreatFox
+CSV/JSON exports, URLhaus and MalwareBazaar CSVs, plain blocklists). Dumps
+downloaded to local files (e.g. by cron) are loaded into in-memory indexes
+so indicators are answered locally, in microseconds, before any API call:
+
+- a hash set for domains, URLs, single IPs and file hashes;
+- sorted integer ranges for IP ranges and CIDR networks;
+- a reversed-label trie for parent-domain matches (``evil.com`` listed
+  matches ``cdn.evil.com``).
+
+Files are checked for changes periodically and the index is rebuilt in the
+background and swapped in, so lookups never wait for a reload.
+
+Feed formats are detected from the header: ThreatFox (``ioc_value``
+column or JSON export), URLhaus (``url``/``url_status``), MalwareBazaar
+(``sha256_hash``); anything else is read as a plain list with one
+indicator per line (hosts-file lines and ``#`` comments are accepted).
+"""
+
+import bisect
+import csv
+import ipaddress
+import json
+import os
+import re
+import sys
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import urlsplit
+
+from cache_db import MaintenanceThread
+
+
+FEED_REFRESH_INTERVAL = 300  # Seconds between checks for updated feed files
+
+HASH_RE = re.compile(r'^(?:[a-f0-9]{32}|[a-f0-9]{40}|[a-f0-9]{64})$')
+DOMAIN_RE = re.compile(r'^(?:[a-z0-9_](?:[a-z0-9_-]{0,61}[a-z0-9_])?\.)+[a-z0-9-]{2,63}$')
+SINKHOLE_ADDRESSES = {'0.0.0.0', '127.0.0.1', '::', '::1'}  # First column of hosts-file blocklists
+
+# Metadata kept per listed indicator (tuples, in this order, to keep the index compact)
+ENTRY_FIELDS = ('feed', 'kind', 'indicator', 'ioc_type', 'threat_type', 'malware', 'confidence',
+                'tags', 'first_seen', 'last_seen', 'reporter', 'file_name', 'file_type')
+
+
+def classify(value: str):
+    """(type, normalized key) of an indicator: hash, ip, network, url or domain"""
+    value = (value or '').strip().strip('"')
+    if not value:
+        return None, None
+    lowered = value.lower()
+    if HASH_RE.match(lowered):
+        return 'hash', lowered
+    if '://' in value:
+        parts = urlsplit(value)
+        if not parts.hostname:
+            return None, None
+        return 'url', parts._replace(scheme=parts.scheme.lower(), netloc=parts.netloc.lower()).geturl()
+    try:
+        return 'ip', str(ipaddress.ip_address(lowered))
+    except ValueError:
+        pass
+    if '/' in lowered:
+        try:
+            return 'network', ipaddress.ip_network(lowered, strict=False)
+        except ValueError:
+            return None, None
+    domain = lowered.rstrip('.')
+    if domain.startswith('*.'):
+        domain = domain[2:]
+    if DOMAIN_RE.match(domain):
+        return 'domain', domain
+    return None, None
+
+
+def _address_int(address) -> int:
+    """Address as an integer in one space (IPv4 mapped into IPv6)"""
+    if address.version == 4:
+        return (0xffff << 32) | int(address)
+    return int(address)
+
+
+def _tags(value) -> tuple:
+    if not value:
+        return ()
+    if isinstance(value, str):
+        value = value.split(',')
+    return tuple(sys.intern(tag.strip()) for tag in value if tag and tag.strip() and tag.strip() != 'None')
+
+
+def _confidence(value) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _text(value) -> Optional[str]:
+    """Interned feed value (feeds repeat the same malware names and dates a lot)"""
+    if value in (None, '', 'None', 'n/a'):
+        return None
+    return sys.intern(str(value).strip())
+
+
+def _threatfox_record(row: dict):
+    value = row.get('ioc_value') or row.get('ioc') or ''
+    ioc_type = row.get('ioc_type') or ''
+    if ioc_type == 'ip:port':
+        value = value.rsplit(':', 1)[0].strip('[]')
+    return value, {
+        'ioc_type': _text(ioc_type),
+        'threat_type': _text(row.get('threat_type')),
+        'malware': _text(row.get('malware_printable') or row.get('malware')),
+        'confidence': _confidence(row.get('confidence_level')),
+        'tags': _tags(row.get('tags')),
+        'first_seen': _text(row.get('first_seen_utc') or row.get('first_seen')),
+        'last_seen': _text(row.get('last_seen_utc') or row.get('last_seen')),
+        'reporter': _text(row.get('reporter')),
+    }
+
+
+def _urlhaus_record(row: dict):
+    return row.get('url') or '', {
+        'ioc_type': 'url',
+        'threat_type': _text(row.get('threat')),
+        'tags': _tags(row.get('tags')),
+        'first_seen': _text(row.get('dateadded')),
+        'last_seen': _text(row.get('last_online')),
+        'reporter': _text(row.get('reporter')),
+    }
+
+
+def _malwarebazaar_records(row: dict):
+    meta = {
+        'ioc_type': 'hash',
+        'threat_type': 'payload',
+        'malware': _text(row.get('signature')),
+        'tags': _tags(row.get('tags')),
+        'first_seen': _text(row.get('first_seen_utc')),
+        'reporter': _text(row.get('reporter')),
+        'file_name': _text(row.get('file_name')),
+        'file_type': _text(row.get('file_type_guess') or row.get('file_type')),
+    }
+    for column in ('sha256_hash', 'sha1_hash', 'md5_hash'):
+        if row.get(column):
+            yield row[column], meta
+
+
+def _csv_rows(path: str, columns: List[str]):
+    with open(path, 'r', encoding='utf-8', errors='replace', newline='') as f:
+        lines = (line for line in f if line.strip() and not line.startswith('#'))
+        for values in csv.reader(lines, skipinitialspace=True):
+            if [value.strip() for value in values] != columns:  # Header row in the body
+                yield dict(zip(columns, values))
+
+
+def _plain_records(path: str):
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            fields = line.split('#', 1)[0].split()
+            if not fields:
+                continue
+            if len(fields) > 1 and fields[0] in SINKHOLE_ADDRESSES:
+                yield fields[1], {}
+            else:
+                yield fields[0].rstrip(','), {}
+
+
+def read_feed(path: str):
+    """Detect the format of a feed file; returns (kind, iterator of (indicator, metadata))"""
+    columns = None
+    is_json = False
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            if not line.startswith('#'):
+                is_json = columns is None and line.lstrip().startswith(('{', '['))
+            # abuse.ch CSVs carry their header in the last leading comment line
+            candidate = [column.strip() for column in next(csv.reader([line.lstrip('#').strip()]))]
+            if set(candidate) & {'ioc_value', 'url', 'sha256_hash'}:
+                columns = candidate
+            if not line.startswith('#'):
+                break
+
+    if is_json:
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            data = json.load(f)
+        rows = []
+        for value in (data.values() if isinstance(data, dict) else [data]):
+            rows.extend(value if isinstance(value, list) else [value])
+        return 'threatfox', (_threatfox_record(row) for row in rows if isinstance(row, dict))
+    if columns and 'ioc_value' in columns:
+        return 'threatfox', (_threatfox_record(row) for row in _csv_rows(path, columns))
+    if columns and 'url' in columns:
+        return 'urlhaus', (_urlhaus_record(row) for row in _csv_rows(path, columns))
+    if columns and 'sha256_hash' in columns:
+        return 'malwarebazaar', (record for row in _csv_rows(path, columns) for record in _malwarebazaar_records(row))
+    return 'list', _plain_records(path)
+
+
+class _Index:
+    """Immutable snapshot of every loaded feed"""
+
+    def __init__(self):
+        self.entries = []
+        self.exact = {}      # key -> entry id, or tuple of entry ids
+        self.hosts = {}      # Host of a listed URL -> entry ids (weak evidence: shared hosting)
+        self.trie = {}       # Reversed domain labels; entry ids under the None key
+        self.starts = []     # Networks, sorted by first address
+        self.ends = []
+        self.max_ends = []   # Running maximum of ends (stops the backwards scan early)
+        self.network_ids = []
+        self.feeds = {}
+
+    @staticmethod
+    def _add(mapping: dict, key, entry_id: int) -> None:
+        current = mapping.get(key)
+        if current is None:
+            mapping[key] = entry_id
+        elif isinstance(current, tuple):
+            mapping[key] = current + (entry_id,)
+        else:
+            mapping[key] = (current, entry_id)
+
+    def add(self, feed: str, kind: str, value: str, meta: dict) -> bool:
+        ioc_kind, key = classify(value)
+        if ioc_kind is None:
+            return False
+        entry_id = len(self.entries)
+        self.entries.append((
+            feed, kind, value.strip(), meta.get('ioc_type') or ioc_kind, meta.get('threat_type'),
+            meta.get('malware'), meta.get('confidence'), meta.get('tags', ()), meta.get('first_seen'),
+            meta.get('last_seen'), meta.get('reporter'), meta.get('file_name'), meta.get('file_type'),
+        ))
+        if ioc_kind == 'network':
+            self.starts.append((_address_int(key.network_address), _address_int(key.broadcast_address), entry_id))
+        else:
+            self._add(self.exact, key, entry_id)
+        if ioc_kind == 'domain':
+            node = self.trie
+            for label in reversed(key.split('.')):
+                node = node.setdefault(sys.intern(label), {})
+            self._add(node, None, entry_id)
+        elif ioc_kind == 'url':
+            host = urlsplit(key).hostname
+            if host:
+                self._add(self.hosts, host, entry_id)
+        return True
+
+    def finish(self) -> None:
+        """Sort the network ranges once every feed is loaded"""
+        ranges = sorted(self.starts)
+        self.starts = [start for start, _, _ in ranges]
+        self.ends = [end for _, end, _ in ranges]
+        self.network_ids = [entry_id for _, _, entry_id in ranges]
+        highest = -1
+        self.max_ends = []
+        for end in self.ends:
+            highest = max(highest, end)
+            self.max_ends.append(highest)
+
+    @staticmethod
+    def _ids(value) -> tuple:
+        if value is None:
+            return ()
+        return value if isinstance(value, tuple) else (value,)
+
+    def match(self, indicator: str) -> List[tuple]:
+        """(match type, entry id) pairs for an indicator"""
+        ioc_kind, key = classify(indicator)
+        if ioc_kind is None:
+            return []
+        matches = [('exact', entry_id) for entry_id in self._ids(self.exact.get(key))] if ioc_kind != 'network' else []
+
+        host = None
+        if ioc_kind == 'domain':
+            host = key
+        elif ioc_kind == 'url':
+            host = urlsplit(key).hostname
+            host_kind, host_key = classify(host)
+            matches += [('host', entry_id) for entry_id in self._ids(self.exact.get(host_key))]
+            if host_kind == 'ip':
+                matches += self._networks(host_key)
+                host = None
+
+        if host:
+            labels = host.split('.')
+            node = self.trie
+            for depth, label in enumerate(reversed(labels), 1):
+                node = node.get(label)
+                if node is None:
+                    break
+                if depth < len(labels):
+                    matches += [('parent', entry_id) for entry_id in self._ids(node.get(None))]
+        if ioc_kind == 'domain':
+            matches += [('url_host', entry_id) for entry_id in self._ids(self.hosts.get(key))]
+        elif ioc_kind in ('ip', 'network'):
+            matches += self._networks(key if ioc_kind == 'ip' else str(key.network_address))
+        return matches
+
+    def _networks(self, ip: str) -> List[tuple]:
+        if not self.starts:
+            return []
+        value = _address_int(ipaddress.ip_address(ip))
+        matches = []
+        i = bisect.bisect_right(self.starts, value) - 1
+        while i >= 0 and self.max_ends[i] >= value:
+            if self.ends[i] >= value:
+                matches.append(('network', self.network_ids[i]))
+            i -= 1
+        return matches
+
+
+class FeedIndex:
+    """Threat feeds loaded from local files, refreshed when the files change"""
+
+    def __init__(self, feeds: Dict[str, str], authoritative: Iterable[str] = (),
+                 refresh_interval: float = FEED_REFRESH_INTERVAL):
+        """
+        Args:
+            feeds: Feed name -> path of the dump file
+            authoritative: Feeds holding a complete dump of their source (e.g. the
+                           ThreatFox full export): an indicator missing from them is
+                           treated as not listed, without asking the API
+            refresh_interval: Seconds between checks for updated files
+        """
+        self.feeds = dict(feeds)
+        self.authoritative = set(authoritative)
+        self.refresh_interval = refresh_interval
+        self._index = _Index()
+        self._signatures = None
+        self._reload_lock = threading.Lock()
+        self._maintenance = None
+        self.reload()
+
+    def _signature(self) -> dict:
+        signature = {}
+        for name, path in self.feeds.items():
+            try:
+                st = os.stat(path)
+                signature[name] = (st.st_mtime_ns, st.st_size)
+            except OSError:
+                signature[name] = None
+        return signature
+
+    def reload(self, force: bool = False) -> bool:
+        """Rebuild the index if any feed file changed; returns True if it was rebuilt"""
+        with self._reload_lock:
+            signature = self._signature()
+            if not force and signature == self._signatures:
+                return False
+            index = _Index()
+            for name, path in self.feeds.items():
+                if signature[name] is None:
+                    print(f"Warning: Feed file for {name} not found: {path}")
+                    continue
+                started = time.time()
+                try:
+                    kind, records = read_feed(path)
+                    loaded = sum(1 for value, meta in records if index.add(name, kind, value, meta))
+                except Exception as e:
+                    print(f"Warning: Could not load feed {name} from {path}: {e}")
+                    continue
+                index.feeds[name] = {
+                    'kind': kind,
+                    'path': path,
+                    'indicators': loaded,
+                    'loaded': time.time(),
+                    'load_seconds': round(time.time() - started, 2),
+                }
+            index.finish()
+            self._index = index  # Lookups in progress keep the previous snapshot
+            self._signatures = signature
+            return True
+
+    def _refresh(self) -> None:
+        # Not reload() itself: its False (nothing changed) would end the MaintenanceThread
+        self.reload()
+
+    def start(self) -> None:
+        """Check the feed files for updates in the background"""
+        if self._maintenance is None and self.feeds:
+            self._maintenance = MaintenanceThread(self._refresh, self.refresh_interval, name='drc-feed-refresh')
+            self._maintenance.start()
+
+    def stop(self) -> None:
+        if self._maintenance:
+            self._maintenance.stop()
+            self._maintenance = None
+
+    def lookup(self, indicator: str) -> List[dict]:
+        """
+        Feed entries matching an indicator.
+
+        Each match carries the ENTRY_FIELDS plus ``match``: exact, parent (a
+        listed parent domain), network (a listed range or CIDR), host (the URL's
+        host is listed) or url_host (a listed URL is hosted on this domain).
+        """
+        index = self._index
+        return [dict(zip(ENTRY_FIELDS, index.entries[entry_id]), match=match)
+                for match, entry_id in index.match(indicator)]
+
+    def lookup_many(self, indicators: Iterable[str]) -> Dict[str, List[dict]]:
+        """lookup() for many indicators; only indicators with matches are returned"""
+        results = {}
+        for indicator in indicators:
+            matches = self.lookup(indicator)
+            if matches:
+                results[indicator] = matches
+        return results
+
+    def covers(self, kind: str) -> bool:
+        """True if an authoritative feed of this kind (threatfox, malwarebazaar...) is loaded"""
+        return any(feed['kind'] == kind for name, feed in self._index.feeds.items() if name in self.authoritative)
+
+    def stats(self) -> dict:
+        index = self._index
+        return {
+            'feeds': {name: dict(feed) for name, feed in index.feeds.items()},
+            'entries': len(index.entries),
+            'networks': len(index.starts),
+        }
+
+
+def summarize(matches: List[dict]) -> dict:
+    """Aggregate feed matches the way API results are reported"""
+    confidences = [m['confidence'] for m in matches if m['confidence'] is not None]
+    first_seen = sorted(m['first_seen'] for m in matches if m['first_seen'])
+    last_seen = sorted(m['last_seen'] for m in matches if m['last_seen'])
+    return {
+        'feeds': sorted({m['feed'] for m in matches}),
+        'match_types': sorted({m['match'] for m in matches}),
+        'malware_families': sorted({m['malware'] for m in matches if m['malware']})[:5],
+        'threat_types': sorted({m['threat_type'] for m in matches if m['threat_type']}),
+        'tags': sorted({tag for m in matches for tag in m['tags']})[:10],
+        'confidence_level': int(sum(confidences) / len(confidences)) if confidences else None,
+        'first_seen': first_seen[0] if first_seen else 'Unknown',
+        'last_seen': last_seen[-1] if last_seen else 'Unknown',
+        'reporter': next((m['reporter'] for m in matches if m['reporter']), 'Unknown'),
+    }
+
+
+_index = None
+_configure_lock = threading.Lock()
+
+
+def configure(feeds: Optional[Dict[str, str]] = None, authoritative: Optional[List[str]] = None,
+              refresh_interval: Optional[float] = None) -> Optional[FeedIndex]:
+    """Load the feed files and start watching them for updates
+
+    Reads $FEED_FILES (comma-separated ``name=path`` or paths) and
+    $FEED_AUTHORITATIVE (feed names) when no feeds are given.
+    """
+    global _index
+    if feeds is None:
+        feeds = {}
+        for item in (os.getenv('FEED_FILES') or '').split(','):
+            name, _, path = item.strip().rpartition('=')
+            if path:
+                feeds[name or os.path.splitext(os.path.basename(path))[0]] = path
+        if authoritative is None:
+            authoritative = [name for name in (os.getenv('FEED_AUTHORITATIVE') or '').split(',') if name.strip()]
+    authoritative = [name.strip() for name in authoritative or []]
+    with _configure_lock:
+        if _index and _index.feeds == feeds and _index.authoritative == set(authoritative):
+            return _index
+        if _index:
+            _index.stop()
+        _index = None
+        if feeds:
+            _index = FeedIndex(feeds, authoritative, refresh_interval or FEED_REFRESH_INTERVAL)
+            _index.start()
+        return _index
+
+
+def get_index() -> Optional[FeedIndex]:
+    """The configured feed index (None when no feeds are configured)"""
+    return _index
+
+
+configure()
@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+Offline IP geolocation and ASN databases
+Answers country, city and ASN lookups from local files with no network:
+
+- MaxMind-format ``.mmdb`` files (GeoLite2-City/Country/ASN, DB-IP, IPinfo
+  Lite), memory-mapped through the optional ``maxminddb`` package;
+- CSV range tables (one row per network), compiled once into a sorted
+  binary index next to the CSV and memory-mapped, so a lookup is a binary
+  search over the page cache instead of a parse.
+
+Several files can be combined (e.g. a City and an ASN database); the first
+file that has a value for a field wins. Files are re-opened when they change
+on disk, so a nightly database refresh needs no restart.
+
+CSV tables need a header row. Each row is either a ``network`` (CIDR) or a
+``start_ip``/``end_ip`` pair (dotted or integer), followed by any of the
+location columns (country_code, country, region, city, latitude, longitude,
+timezone, asn, organization; MaxMind and IPinfo column names are accepted
+too). Ranges are expected not to overlap, as in the usual range exports.
+"""
+
+import bisect
+import csv
+import json
+import mmap
+import os
+import socket
+import struct
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import maxminddb
+    MAXMINDDB_AVAILABLE = True
+except ImportError:
+    MAXMINDDB_AVAILABLE = False
+
+
+RECORD_FIELDS = ['country', 'country_code', 'region', 'city', 'latitude', 'longitude',
+                 'timezone', 'isp', 'organization', 'asn']
+CHANGE_CHECK_INTERVAL = 60  # Seconds between checks for updated database files
+
+INDEX_MAGIC = b'DRCGEO01'
+INDEX_HEADER = struct.Struct('>8sII')  # magic, ranges, distinct records
+KEY_SIZE = 16                          # IPv6 (IPv4-mapped for IPv4) big-endian
+V4_MAPPED = b'\0' * 10 + b'\xff\xff'
+
+# CSV column aliases -> record field
+CSV_COLUMNS = {
+    'network': 'network', 'cidr': 'network',
+    'start_ip': 'start', 'ip_start': 'start', 'range_start': 'start', 'start': 'start',
+    'end_ip': 'end', 'ip_end': 'end', 'range_end': 'end', 'end': 'end',
+    'country_code': 'country_code', 'country_iso_code': 'country_code',
+    'country': 'country', 'country_name': 'country',
+    'region': 'region', 'subdivision_1_name': 'region', 'state': 'region',
+    'city': 'city', 'city_name': 'city',
+    'latitude': 'latitude', 'lat': 'latitude',
+    'longitude': 'longitude', 'lon': 'longitude', 'lng': 'longitude',
+    'timezone': 'timezone', 'time_zone': 'timezone',
+    'asn': 'asn', 'as_number': 'asn', 'autonomous_system_number': 'asn',
+    'organization': 'organization', 'as_name': 'organization', 'as_organization': 'organization',
+    'autonomous_system_organization': 'organization', 'isp': 'isp',
+}
+
+
+def _parse_key(value) -> Tuple[bytes, int]:
+    """16-byte key and width in bits of an address (dotted, colon or integer form)"""
+    value = str(value).strip()
+    if value.isdigit():  # Integer ranges, as in ip2location-style tables
+        number = int(value)
+        if number <= 0xffffffff:
+            return V4_MAPPED + number.to_bytes(4, 'big'), 32
+        return number.to_bytes(KEY_SIZE, 'big'), 128
+    try:
+        return V4_MAPPED + socket.inet_pton(socket.AF_INET, value), 32
+    except OSError:
+        pass
+    try:
+        return socket.inet_pton(socket.AF_INET6, value), 128
+    except OSError:
+        raise ValueError(f"Not an IP address: {value}")
+
+
+def _key(ip) -> bytes:
+    """Sortable 16-byte key of an address (IPv4 is mapped into IPv6 space)"""
+    return _parse_key(ip)[0]
+
+
+def _network_keys(value: str) -> Tuple[bytes, bytes]:
+    """First and last key of a CIDR network"""
+    address, _, prefix = value.strip().partition('/')
+    key, width = _parse_key(address)
+    host_bits = width - int(prefix) if prefix else 0
+    if not 0 <= host_bits <= width:
+        raise ValueError(f"Invalid network: {value}")
+    first = int.from_bytes(key, 'big') >> host_bits << host_bits
+    return first.to_bytes(KEY_SIZE, 'big'), (first | ((1 << host_bits) - 1)).to_bytes(KEY_SIZE, 'big')
+
+
+def _format_asn(value) -> Optional[str]:
+    if value in (None, ''):
+        return None
+    value = str(value).strip()
+    return value if value.upper().startswith('AS') else f'AS{value}'
+
+
+def _clean(record: dict) -> dict:
+    """Record with the known fields only (empty values dropped, numbers typed)"""
+    cleaned = {}
+    for field in RECORD_FIELDS:
+        value = record.get(field)
+        if value in (None, ''):
+            continue
+        if field in ('latitude', 'longitude'):
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                continue
+        elif field == 'asn':
+            value = _format_asn(value)
+        cleaned[field] = value
+    if cleaned.get('organization') and not cleaned.get('isp'):
+        cleaned['isp'] = cleaned['organization']
+    return cleaned
+
+
+class MMDBReader:
+    """MaxMind-format database opened with memory-mapping"""
+
+    def __init__(self, path: str):
+        if not MAXMINDDB_AVAILABLE:
+            raise RuntimeError("Reading .mmdb files requires the maxminddb package (pip install maxminddb)")
+        self.path = path
+        self._reader = maxminddb.open_database(path, maxminddb.MODE_MMAP)
+
+    def lookup(self, ip: str) -> Optional[dict]:
+        data = self._reader.get(ip)
+        if not data:
+            return None
+        record = {}
+        country = data.get('country') or data.get('registered_country')
+        if isinstance(country, dict):
+            record['country_code'] = country.get('iso_code')
+            record['country'] = (country.get('names') or {}).get('en')
+        else:  # Flat layouts (IPinfo Lite and similar)
+            record['country'] = country
+            record['country_code'] = data.get('country_code')
+        if isinstance(data.get('city'), dict):
+            record['city'] = (data['city'].get('names') or {}).get('en')
+        subdivisions = data.get('subdivisions') or []
+        if subdivisions:
+            record['region'] = (subdivisions[0].get('names') or {}).get('en')
+        location = data.get('location') or {}
+        record['latitude'] = location.get('latitude')
+        record['longitude'] = location.get('longitude')
+        record['timezone'] = location.get('time_zone')
+        record['asn'] = data.get('autonomous_system_number') or data.get('asn')
+        record['organization'] = data.get('autonomous_system_organization') or data.get('as_name')
+        return _clean(record) or None
+
+    def close(self) -> None:
+        self._reader.close()
+
+
+class _Keys:
+    """Sequence view of the keys stored in the index (for bisect)"""
+
+    def __init__(self, buffer, offset: int, count: int):
+        self._buffer = buffer
+        self._offset = offset
+        self._count = count
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, i):
+        start = self._offset + i * KEY_SIZE
+        return self._buffer[start:start + KEY_SIZE]
+
+
+class RangeReader:
+    """CSV range table served from a compiled, memory-mapped sorted index"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.index_path = path + '.idx'
+        try:
+            stale = os.path.getmtime(self.index_path) < os.path.getmtime(path)
+        except OSError:
+            stale = True
+        if stale:
+            self.compile(path, self.index_path)
+
+        self._file = open(self.index_path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self._count, records = INDEX_HEADER.unpack_from(self._map, 0)
+        if magic != INDEX_MAGIC:
+            self.close()
+            raise ValueError(f"{self.index_path} is not a geolocation index")
+        self._starts = _Keys(self._map, INDEX_HEADER.size, self._count)
+        self._ends = _Keys(self._map, INDEX_HEADER.size + self._count * KEY_SIZE, self._count)
+        self._refs = INDEX_HEADER.size + 2 * self._count * KEY_SIZE
+        self._offsets = self._refs + 4 * self._count
+        self._blob = self._offsets + 4 * (records + 1)
+
+    @staticmethod
+    def compile(path: str, index_path: str) -> int:
+        """Build the binary index of a CSV range table; returns the number of ranges"""
+        ranges = []
+        records = {}
+        with open(path, newline='', encoding='utf-8') as f:
+            header = f.readline()
+            f.seek(0)
+            reader = csv.DictReader(f, delimiter='\t' if '\t' in header else ',')
+            columns = {name: CSV_COLUMNS.get(name.strip().lower()) for name in reader.fieldnames or []}
+            for row in reader:
+                values = {columns[name]: value for name, value in row.items() if columns.get(name) and value}
+                try:
+                    if 'network' in values:
+                        first, last = _network_keys(values['network'])
+                    else:
+                        first, last = _key(values['start']), _key(values['end'])
+                except (KeyError, ValueError, OverflowError):
+                    continue  # Comment, blank or malformed row
+                record = json.dumps(_clean(values), sort_keys=True)
+                ref = records.setdefault(record, len(records))
+                ranges.append((first, last, ref))
+        ranges.sort()
+
+        blobs = [record.encode('utf-8') for record in records]
+        tmp_file = f'{index_path}.{os.getpid()}.tmp'
+        with open(tmp_file, 'wb') as out:
+            out.write(INDEX_HEADER.pack(INDEX_MAGIC, len(ranges), len(blobs)))
+            out.write(b''.join(start for start, _, _ in ranges))
+            out.write(b''.join(end for _, end, _ in ranges))
+            out.write(b''.join(struct.pack('>I', ref) for _, _, ref in ranges))
+            offset = 0
+            for blob in blobs:
+                out.write(struct.pack('>I', offset))
+                offset += len(blob)
+            out.write(struct.pack('>I', offset))
+            out.write(b''.join(blobs))
+        os.replace(tmp_file, index_path)
+        return len(ranges)
+
+    def _record(self, ref: int) -> dict:
+        start, end = struct.unpack_from('>II', self._map, self._offsets + 4 * ref)
+        return json.loads(self._map[self._blob + start:self._blob + end])
+
+    def lookup(self, ip: str) -> Optional[dict]:
+        key = _key(ip)
+        i = bisect.bisect_right(self._starts, key) - 1
+        if i < 0 or key > self._ends[i]:
+            return None
+        ref = struct.unpack_from('>I', self._map, self._refs + 4 * i)[0]
+        return self._record(ref) or None
+
+    def close(self) -> None:
+        self._map.close()
+        self._file.close()
+
+
+class GeoDatabase:
+    """One or more local databases answering geolocation and ASN lookups"""
+
+    def __init__(self, paths: List[str]):
+        """
+        Args:
+            paths: .mmdb files and/or CSV range tables, in order of precedence
+        """
+        self.paths = [path for path in paths if path]
+        self._readers = []
+        self._signatures = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+        self._open()
+
+    def _signature(self) -> tuple:
+        signature = []
+        for path in self.paths:
+            try:
+                st = os.stat(path)
+                signature.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+
+    def _open(self) -> None:
+        readers = []
+        for path in self.paths:
+            try:
+                reader = MMDBReader(path) if path.lower().endswith('.mmdb') else RangeReader(path)
+                readers.append(reader)
+            except Exception as e:
+                print(f"Warning: Could not open geolocation database {path}: {e}")
+        old, self._readers = self._readers, readers
+        self._signatures = self._signature()
+        self._checked = time.monotonic()
+        for reader in old:
+            try:
+                reader.close()
+            except Exception:
+                pass
+
+    def _reload_if_changed(self) -> None:
+        if time.monotonic() - self._checked < CHANGE_CHECK_INTERVAL:
+            return
+        with self._lock:
+            if time.monotonic() - self._checked < CHANGE_CHECK_INTERVAL:
+                return
+            self._checked = time.monotonic()
+            if self._signature() != self._signatures:
+                self._open()
+
+    @property
+    def available(self) -> bool:
+        return bool(self._readers)
+
+    def lookup(self, ip: str) -> Optional[Dict[str, object]]:
+        """Location/ASN fields known locally for ``ip`` (None if no database covers it)"""
+        self._reload_if_changed()
+        record = {}
+        for reader in self._readers:
+            try:
+                found = reader.lookup(ip)
+            except (ValueError, TypeError):
+                return None  # Not an IP address
+            except Exception:
+                continue
+            for field, value in (found or {}).items():
+                record.setdefault(field, value)
+        return record or None
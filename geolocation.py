@@ -0,0 +1,486 @@
+#!/usr/bin/env python3
+"""
+IP geolocation shared by the web app and the checker
+The free and keyed geolocation APIs (ip-api.com, ipapi.co, ipdata.co,
+ipapi.com) are queried concurrently and the first provider that knows where
+an IP is wins; providers that also report threat flags (Tor, proxy, known
+attacker) are waited for when the caller needs those flags.
+
+Every provider answer is cached per IP - in memory (LRU) and in SQLite so
+it survives restarts and is shared between workers - for a week (a day for
+threat flags, which change faster). The location of each resolved IP is
+also kept for its /24 (/48 for IPv6), which answers country-only lookups
+for neighbouring addresses without any request.
+
+When a local database is configured (geo_database: .mmdb or CSV ranges),
+location and ASN come from it and providers are only queried for the
+threat flags it cannot supply.
+"""
+
+import ipaddress
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, List, Optional
+
+from cache_db import SQLitePool, MaintenanceThread
+from geo_database import GeoDatabase
+from http_pool import get_session
+from singleflight import SingleFlight
+
+
+GEO_TTL = 7 * 86400        # Location answers (country, city, ASN) barely change
+THREAT_TTL = 86400         # Answers carrying threat flags are refreshed daily
+MEMORY_ENTRIES = 5000      # IPs kept in the in-process LRU
+MAX_ROWS = 200000          # Cached answers kept on disk (oldest dropped first)
+PROVIDER_TIMEOUT = 5       # Seconds per provider request
+DEFAULT_DEADLINE = 8.0     # Seconds a lookup waits for providers overall
+DEFAULT_DB_FILE = os.path.join(os.path.expanduser('~'), '.domain_reputation_cache_geo.db')
+
+LOCATION_FIELDS = ['country', 'country_code', 'region', 'city', 'latitude', 'longitude',
+                   'timezone', 'isp', 'organization', 'asn']
+NETWORK_FIELDS = ['country', 'country_code', 'region', 'city', 'timezone', 'isp', 'organization', 'asn']
+FLAG_FIELDS = ['is_proxy', 'is_vpn', 'is_tor']
+
+
+def _answer(**fields) -> dict:
+    """Normalized provider answer"""
+    answer = {field: fields.get(field) for field in LOCATION_FIELDS}
+    for flag in FLAG_FIELDS:
+        answer[flag] = bool(fields.get(flag))
+    answer['threats'] = fields.get('threats') or []
+    return answer
+
+
+def _query_ip_api(ip: str, api_key: Optional[str]) -> Optional[dict]:
+    """IP-API.com (free, no key required - comprehensive data)"""
+    response = get_session('ip-api').get(
+        f'http://ip-api.com/json/{ip}?fields=status,country,countryCode,region,city,lat,lon,timezone,isp,org,as,proxy,hosting',
+        timeout=PROVIDER_TIMEOUT
+    )
+    if response.status_code != 200:
+        return None
+    data = response.json()
+    if data.get('status') != 'success':
+        return None
+    return _answer(
+        country=data.get('country'), country_code=data.get('countryCode'),
+        region=data.get('region'), city=data.get('city'),
+        latitude=data.get('lat'), longitude=data.get('lon'), timezone=data.get('timezone'),
+        isp=data.get('isp'), organization=data.get('org'), asn=data.get('as'),
+        is_proxy=data.get('proxy', False),
+        is_vpn=data.get('hosting', False),  # hosting often indicates VPN/datacenter
+    )
+
+
+def _query_ipapi_co(ip: str, api_key: Optional[str]) -> Optional[dict]:
+    """IPApi.co (free alternative)"""
+    response = get_session('ipapi').get(f'https://ipapi.co/{ip}/json/', timeout=PROVIDER_TIMEOUT)
+    if response.status_code != 200:
+        return None
+    data = response.json()
+    if data.get('error'):
+        return None
+    return _answer(
+        country=data.get('country_name'), country_code=data.get('country_code'),
+        region=data.get('region'), city=data.get('city'),
+        latitude=data.get('latitude'), longitude=data.get('longitude'), timezone=data.get('timezone'),
+        isp=data.get('org'), asn=data.get('asn'),
+    )
+
+
+def _query_ipdata(ip: str, api_key: Optional[str]) -> Optional[dict]:
+    """IPData.co (enhanced threat intelligence, API key required)"""
+    response = get_session('ipdata').get(
+        f'https://api.ipdata.co/{ip}?api-key={api_key}',
+        headers={'Accept': 'application/json'},
+        timeout=PROVIDER_TIMEOUT
+    )
+    if response.status_code != 200:
+        return None
+    data = response.json()
+    if 'message' in data and 'error' in str(data.get('message', '')).lower():
+        return None
+
+    threats = []
+    threat_data = data.get('threat') or {}
+    if threat_data.get('is_threat'):
+        threats.append('KNOWN_THREAT')
+    if threat_data.get('is_tor'):
+        threats.append('TOR_EXIT_NODE')
+    if threat_data.get('is_proxy'):
+        threats.append('PROXY')
+    if threat_data.get('is_anonymous'):
+        threats.append('ANONYMOUS_PROXY')
+    if threat_data.get('is_known_attacker'):
+        threats.append('KNOWN_ATTACKER')
+    if threat_data.get('is_known_abuser'):
+        threats.append('KNOWN_ABUSER')
+    if threat_data.get('is_bogon'):
+        threats.append('BOGON_IP')
+
+    asn = data.get('asn') or {}
+    return _answer(
+        country=data.get('country_name'), country_code=data.get('country_code'),
+        region=data.get('region'), city=data.get('city'),
+        latitude=data.get('latitude'), longitude=data.get('longitude'),
+        timezone=(data.get('time_zone') or {}).get('name'),
+        isp=asn.get('name') or data.get('org'), organization=data.get('org'), asn=asn.get('asn'),
+        is_tor=threat_data.get('is_tor'), is_proxy=threat_data.get('is_proxy'), is_vpn=threat_data.get('is_vpn'),
+        threats=threats,
+    )
+
+
+def _query_ipapi(ip: str, api_key: Optional[str]) -> Optional[dict]:
+    """IPApi.com (access key required; HTTP on the free tier)"""
+    response = get_session('ipapi').get(
+        f"http://api.ipapi.com/{ip}?access_key={api_key}&format=1"
+        "&fields=country_name,country_code,region_name,city,latitude,longitude,connection,threat",
+        headers={'Accept': 'application/json'},
+        timeout=PROVIDER_TIMEOUT
+    )
+    if response.status_code != 200:
+        return None
+    data = response.json()
+    if 'error' in data:
+        return None
+
+    threats = []
+    threat_data = data.get('threat') or {}
+    if threat_data.get('is_tor'):
+        threats.append('TOR_EXIT_NODE')
+    if threat_data.get('is_proxy'):
+        threats.append('PROXY')
+    if threat_data.get('types'):
+        threats.extend(threat_data['types'])
+
+    connection = data.get('connection') or {}
+    return _answer(
+        country=data.get('country_name'), country_code=data.get('country_code'),
+        region=data.get('region_name'), city=data.get('city'),
+        latitude=data.get('latitude'), longitude=data.get('longitude'),
+        isp=connection.get('isp'), asn=connection.get('asn'),
+        is_tor=threat_data.get('is_tor'), is_proxy=threat_data.get('is_proxy'),
+        threats=threats,
+    )
+
+
+# name -> (label, query function, API key name, rate limit key, answer TTL, reports threat flags)
+PROVIDERS = {
+    'ip-api': ('IP-API.com', _query_ip_api, None, 'ip-api', GEO_TTL, False),
+    'ipdata': ('IPData.co', _query_ipdata, 'ipdata', 'ipdata', THREAT_TTL, True),
+    'ipapi': ('IPApi.com', _query_ipapi, 'ipapi', 'ipapi', THREAT_TTL, True),
+    'ipapi.co': ('IPApi.co', _query_ipapi_co, None, 'ipapi_co', GEO_TTL, False),
+}
+
+# Default providers, in the order their fields take precedence when answers are merged
+DEFAULT_PROVIDERS = ['ip-api', 'ipdata', 'ipapi.co']
+
+LOCAL_SOURCE = 'local'  # Answers from the local database (ahead of every provider)
+LOCAL_LABEL = 'Local GeoIP database'
+
+_database = None
+
+
+def configure_database(paths: Optional[List[str]] = None) -> None:
+    """Use local .mmdb / CSV range databases for location and ASN lookups
+
+    Also reads $GEOIP_DATABASE (comma-separated) when no paths are given.
+    """
+    global _database
+    if paths is None and os.getenv('GEOIP_DATABASE'):
+        paths = os.getenv('GEOIP_DATABASE').split(',')
+    paths = [path.strip() for path in paths or [] if path.strip()]
+    if _database and _database.paths == paths:
+        return
+    _database = GeoDatabase(paths) if paths else None
+
+
+def network_prefix(ip: str) -> str:
+    """/24 (IPv4) or /48 (IPv6) network holding ``ip``"""
+    address = ipaddress.ip_address(ip)
+    prefix = 24 if address.version == 4 else 48
+    return str(ipaddress.ip_network(f'{address}/{prefix}', strict=False))
+
+
+def has_location(answer: Optional[dict]) -> bool:
+    return bool(answer and (answer.get('country_code') or answer.get('country')))
+
+
+class GeoLocator:
+    """Cached, concurrent IP geolocation over several providers"""
+
+    def __init__(self, db_file: Optional[str] = None, memory_entries: int = MEMORY_ENTRIES, workers: int = 8):
+        """
+        Args:
+            db_file: SQLite file for the persistent cache (memory only if omitted)
+            memory_entries: IPs kept in the in-process LRU
+            workers: Provider requests running at once
+        """
+        self.memory_entries = memory_entries
+        self._memory = OrderedDict()  # ip -> {provider: (answer, fetched)}
+        self._networks = OrderedDict()  # prefix -> (location, fetched)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='drc-geo')
+        self._flights = SingleFlight()
+        self._maintenance = None
+
+        self._db = None
+        if db_file:
+            try:
+                self._db = SQLitePool(db_file, size=4)
+                self._db.script('''
+                    CREATE TABLE IF NOT EXISTS geo_answers (
+                        ip TEXT,
+                        provider TEXT,
+                        answer TEXT,
+                        fetched REAL,
+                        PRIMARY KEY (ip, provider)
+                    );
+                    CREATE INDEX IF NOT EXISTS idx_geo_answers_fetched ON geo_answers (fetched);
+                    CREATE TABLE IF NOT EXISTS geo_networks (
+                        prefix TEXT PRIMARY KEY,
+                        location TEXT,
+                        fetched REAL
+                    );
+                ''')
+                self._maintenance = MaintenanceThread(self.purge, 3600, name='drc-geo-maintenance')
+                self._maintenance.start()
+            except Exception as e:
+                print(f"Warning: Could not open geolocation cache, using memory only: {e}")
+                self._db = None
+
+    # -- cache -------------------------------------------------------------
+
+    def _remember(self, ip: str, provider: str, answer: dict, fetched: float) -> None:
+        with self._lock:
+            entry = self._memory.setdefault(ip, {})
+            entry[provider] = (answer, fetched)
+            self._memory.move_to_end(ip)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def _cached(self, ip: str) -> Dict[str, dict]:
+        """Fresh cached answers for ``ip`` by provider"""
+        with self._lock:
+            entry = self._memory.get(ip)
+            if entry is not None:
+                self._memory.move_to_end(ip)
+                entry = dict(entry)
+        if entry is None:
+            entry = {}
+            if self._db:
+                try:
+                    for provider, answer, fetched in self._db.query(
+                            'SELECT provider, answer, fetched FROM geo_answers WHERE ip = ?', (ip,)):
+                        entry[provider] = (json.loads(answer), fetched)
+                        self._remember(ip, provider, entry[provider][0], fetched)
+                except Exception:
+                    pass
+        now = time.time()
+        return {
+            provider: answer for provider, (answer, fetched) in entry.items()
+            if provider in PROVIDERS and now - fetched < PROVIDERS[provider][4]
+        }
+
+    def _store(self, ip: str, provider: str, answer: dict) -> None:
+        now = time.time()
+        self._remember(ip, provider, answer, now)
+        location = {field: answer.get(field) for field in NETWORK_FIELDS} if has_location(answer) else None
+        if location:
+            with self._lock:
+                self._networks[network_prefix(ip)] = (location, now)
+                while len(self._networks) > self.memory_entries:
+                    self._networks.popitem(last=False)
+        if self._db:
+            try:
+                self._db.execute(
+                    'INSERT OR REPLACE INTO geo_answers (ip, provider, answer, fetched) VALUES (?, ?, ?, ?)',
+                    (ip, provider, json.dumps(answer), now)
+                )
+                if location:
+                    self._db.execute(
+                        'INSERT OR REPLACE INTO geo_networks (prefix, location, fetched) VALUES (?, ?, ?)',
+                        (network_prefix(ip), json.dumps(location), now)
+                    )
+            except Exception as e:
+                print(f"Warning: Could not cache geolocation for {ip}: {e}")
+
+    def _network(self, ip: str) -> Optional[dict]:
+        """Location last seen for another address of the same network"""
+        prefix = network_prefix(ip)
+        with self._lock:
+            entry = self._networks.get(prefix)
+        if entry is None and self._db:
+            try:
+                rows = self._db.query('SELECT location, fetched FROM geo_networks WHERE prefix = ?', (prefix,))
+                if rows:
+                    entry = (json.loads(rows[0][0]), rows[0][1])
+            except Exception:
+                pass
+        if entry and time.time() - entry[1] < GEO_TTL:
+            return entry[0]
+        return None
+
+    def purge(self) -> None:
+        """Drop expired answers and keep the on-disk cache bounded"""
+        if not self._db:
+            return
+        cutoff = time.time() - GEO_TTL
+        self._db.execute('DELETE FROM geo_answers WHERE fetched < ?', (cutoff,))
+        self._db.execute('DELETE FROM geo_networks WHERE fetched < ?', (cutoff,))
+        self._db.execute(
+            'DELETE FROM geo_answers WHERE fetched < (SELECT fetched FROM geo_answers '
+            'ORDER BY fetched DESC LIMIT 1 OFFSET ?)', (MAX_ROWS,)
+        )
+
+    # -- lookups -----------------------------------------------------------
+
+    def _fetch(self, provider: str, ip: str, api_key: Optional[str], rate_limiter, end: float) -> Optional[dict]:
+        """
+        Query one provider (one request per IP and provider at a time) and cache its answer.
+
+        ``end`` is the caller's deadline (time.monotonic()): a request that has
+        not started by then is skipped, and a rate-limit wait never runs past it.
+        """
+        _, query, _, rate_key, _, _ = PROVIDERS[provider]
+
+        def fetch():
+            cached = self._cached(ip).get(provider)
+            if cached:
+                return cached  # Answered while this request was queued
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                return None  # Queued past the caller's deadline; nobody would read the answer
+            if rate_limiter and not rate_limiter.acquire(rate_key, timeout=remaining):
+                return None  # Out of quota for longer than the caller will wait (no token taken)
+            answer = query(ip, api_key)
+            if answer:
+                self._store(ip, provider, answer)
+            return answer
+
+        return self._flights.do(['geo', provider, ip], fetch)
+
+    def locate(self, ip: str, api_keys: Optional[Dict[str, str]] = None, providers: Optional[List[str]] = None,
+               threats: bool = False, rate_limiter=None, approximate_ok: bool = False,
+               deadline: float = DEFAULT_DEADLINE) -> dict:
+        """
+        Geolocate ``ip`` from the local database, the cache or the providers.
+
+        Args:
+            ip: IPv4 or IPv6 address
+            api_keys: Keys for keyed providers (those without a key are skipped)
+            providers: Providers to use, in order of precedence (DEFAULT_PROVIDERS if omitted)
+            threats: Also wait for the providers that report threat flags
+            rate_limiter: RateLimiter whose quotas apply to the providers
+            approximate_ok: Accept the cached location of the IP's /24 instead of querying
+            deadline: Seconds to wait for providers (late answers are still cached)
+
+        Returns:
+            Merged record: location fields, is_proxy/is_vpn/is_tor, ``threats``,
+            ``providers`` (answer per provider), ``sources_used``, ``cached`` and
+            ``approximate`` (location taken from the network prefix)
+        """
+        try:
+            ip = str(ipaddress.ip_address(str(ip).strip()))
+        except ValueError:
+            return self._merge(str(ip), {}, [], cached=False)
+        api_keys = api_keys or {}
+        providers = [
+            p for p in (providers or DEFAULT_PROVIDERS)
+            if p in PROVIDERS and (not PROVIDERS[p][2] or api_keys.get(PROVIDERS[p][2]))
+        ]
+        local = _database.lookup(ip) if _database else None
+        if has_location(local):
+            # Location and ASN are known locally: providers only add threat flags
+            providers = [p for p in providers if PROVIDERS[p][5]] if threats else []
+        else:
+            local = None
+        order = ([LOCAL_SOURCE] if local else []) + providers
+        answers = {p: answer for p, answer in self._cached(ip).items() if p in providers}
+        if local:
+            answers[LOCAL_SOURCE] = _answer(**local)
+        missing = [p for p in providers if p not in answers]
+        threat_missing = [p for p in missing if PROVIDERS[p][5]]
+
+        def satisfied():
+            return any(has_location(a) for a in answers.values()) and not (threats and threat_missing)
+
+        if not missing or satisfied():
+            return self._merge(ip, answers, order, cached=True)
+        if approximate_ok and not threats:
+            location = self._network(ip)
+            if location:
+                return self._merge(ip, answers, order, cached=True, approximate=location)
+
+        # Fan out to every missing provider; return at the first good answer
+        end = time.monotonic() + deadline
+        futures = {
+            self._executor.submit(self._fetch, p, ip, api_keys.get(PROVIDERS[p][2] or ''), rate_limiter, end): p
+            for p in missing
+        }
+        pending = set(futures)
+        while pending and not satisfied():
+            done, pending = wait(pending, timeout=max(0.0, end - time.monotonic()), return_when=FIRST_COMPLETED)
+            if not done:
+                break  # Deadline: the stragglers keep running and fill the cache
+            for future in done:
+                provider = futures[future]
+                if provider in threat_missing:
+                    threat_missing.remove(provider)
+                try:
+                    answer = future.result()
+                except Exception:
+                    answer = None
+                if answer:
+                    answers[provider] = answer
+
+        approximate = None
+        if not any(has_location(a) for a in answers.values()):
+            approximate = self._network(ip)
+        return self._merge(ip, answers, order, cached=False, approximate=approximate)
+
+    @staticmethod
+    def _merge(ip: str, answers: Dict[str, dict], providers: List[str], cached: bool,
+               approximate: Optional[dict] = None) -> dict:
+        """Combine provider answers: first non-empty field wins, flags and threats add up"""
+        record = {'ip': ip}
+        record.update({field: None for field in LOCATION_FIELDS})
+        record.update({flag: False for flag in FLAG_FIELDS})
+        record.update({'threats': [], 'sources_used': [], 'providers': {}, 'cached': cached,
+                       'approximate': bool(approximate)})
+        for provider in providers:
+            answer = answers.get(provider)
+            if not answer:
+                continue
+            record['providers'][provider] = answer
+            record['sources_used'].append(PROVIDERS[provider][0] if provider in PROVIDERS else LOCAL_LABEL)
+            for field in LOCATION_FIELDS:
+                if record[field] in (None, '') and answer.get(field) not in (None, ''):
+                    record[field] = answer[field]
+            for flag in FLAG_FIELDS:
+                record[flag] = record[flag] or bool(answer.get(flag))
+            record['threats'] += [t for t in answer.get('threats', []) if t not in record['threats']]
+        if approximate:
+            for field in NETWORK_FIELDS:
+                if record[field] in (None, ''):
+                    record[field] = approximate.get(field)
+        return record
+
+
+configure_database()
+
+_locator = None
+_locator_lock = threading.Lock()
+
+
+def get_geolocator(db_file: Optional[str] = None) -> GeoLocator:
+    """The process-wide GeoLocator (the first caller picks its cache file)"""
+    global _locator
+    with _locator_lock:
+        if _locator is None:
+            _locator = GeoLocator(db_file or DEFAULT_DB_FILE)
+        return _locator
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Shared HTTP connection pools for upstream providers
+One keep-alive requests.Session per provider, each with a sized
+connection pool and a common retry policy, so TLS handshakes to an API
+happen once per worker instead of once per lookup.
+"""
+
+import threading
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+DEFAULT_USER_AGENT = 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+
+# Connections kept alive per host; providers not listed use the registry default
+POOL_SIZES = {
+    'virustotal': 8,        # 4 lookups/minute on the public API, small pool is plenty
+    'shodan': 4,            # 1 request/second
+    'securitytrails': 4,
+    'abuseipdb': 16,
+    'alienvault_otx': 16,
+    'abusech': 16,          # MalwareBazaar + ThreatFox
+    'urlscan': 16,
+}
+
+# Transient server errors are retried with backoff; 429s are left to the rate limiter.
+# Only idempotent methods are replayed (urllib3's default set).
+RETRY_POLICY = {
+    'total': 2,
+    'backoff_factor': 1,
+    'status_forcelist': (500, 502, 503, 504),
+    'allowed_methods': Retry.DEFAULT_ALLOWED_METHODS,
+    'raise_on_status': False,  # Hand the final 5xx response back to the caller
+}
+
+# Providers whose POST endpoints only read (abuse.ch get_info/search_ioc queries),
+# so their POSTs are retried too. Anything else - AbuseIPDB reports, APIVoid
+# lookups that spend paid credits - is never sent twice.
+READ_ONLY_POST_PROVIDERS = {'abusech'}
+
+
+class SessionRegistry:
+    """Lazily created keep-alive sessions keyed by provider name"""
+
+    def __init__(self, pool_maxsize: int = 20, retries: Optional[int] = None):
+        """
+        Args:
+            pool_maxsize: Default connections kept per host
+            retries: Override for RETRY_POLICY['total']
+        """
+        self.pool_maxsize = pool_maxsize
+        self.retries = retries
+        self._sessions: Dict[str, requests.Session] = {}
+        self._lock = threading.Lock()
+
+    def _build(self, name: str, retries: Optional[int]) -> requests.Session:
+        policy = dict(RETRY_POLICY)
+        if retries is not None:
+            policy['total'] = retries
+        elif self.retries is not None:
+            policy['total'] = self.retries
+        if name in READ_ONLY_POST_PROVIDERS:
+            policy['allowed_methods'] = policy['allowed_methods'] | {'POST'}
+
+        adapter = HTTPAdapter(
+            pool_connections=4,  # Distinct hosts kept per provider (http/https, mirrors)
+            pool_maxsize=POOL_SIZES.get(name, self.pool_maxsize),
+            max_retries=Retry(**policy)
+        )
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers.update({'User-Agent': DEFAULT_USER_AGENT})
+        return session
+
+    def session(self, name: str = 'default', retries: Optional[int] = None) -> requests.Session:
+        """
+        Get the shared session for a provider.
+
+        Args:
+            name: Provider name (e.g. 'virustotal'); one pool per name
+            retries: Retry count used when the session is first created
+        """
+        session = self._sessions.get(name)
+        if session is None:
+            with self._lock:
+                session = self._sessions.get(name)
+                if session is None:
+                    session = self._build(name, retries)
+                    self._sessions[name] = session
+        return session
+
+    def close(self) -> None:
+        """Close every pooled connection (e.g. before forking workers)"""
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+
+_registry = SessionRegistry()
+
+
+def get_session(name: str = 'default', retries: Optional[int] = None) -> requests.Session:
+    """Shared keep-alive session for ``name`` from the process-wide registry"""
+    return _registry.session(name, retries)
+
+
+def configure(pool_maxsize: Optional[int] = None, retries: Optional[int] = None) -> None:
+    """Adjust defaults for sessions that have not been created yet"""
+    if pool_maxsize:
+        _registry.pool_maxsize = pool_maxsize
+    if retries is not None:
+        _registry.retries = retries
@@ -0,0 +1,772 @@
+#!/usr/bin/env python3
+"""
+IP reputation pipeline
+Runs every IP provider (AbuseIPDB, VirusTotal, Shodan, DNS blacklists,
+reverse DNS, plus any extra providers supplied by the caller) concurrently,
+each with its own deadline, and combines whatever finished into one verdict.
+Providers that miss their deadline are reported as timed out instead of
+holding up the whole response.
+
+Bulk lookups (e.g. every source address in a firewall log) dedupe the input,
+group it by /24 (IPv4) or /64 (IPv6), use batch endpoints where a provider
+has one (AbuseIPDB check-block, comma-separated Shodan hosts) and sweep the
+DNS blacklists for a whole group at once.
+"""
+
+import ipaddress
+import logging
+import re
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError, as_completed
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import dnsbl
+from http_pool import get_session
+from rate_limiter import parse_retry_after
+
+
+logger = logging.getLogger(__name__)
+
+# Seconds each provider may take before its result is reported as timed out
+IP_PROVIDER_DEADLINES = {
+    'abuseipdb': 12,
+    'virustotal': 12,
+    'shodan': 20,
+    'networksdb': 15,
+    'blacklist_check': 10,
+    'hostname': 5,
+    'geolocation': 15,
+}
+
+DNSBL_ZONES = [
+    # Tier 1 - Most Important (High Authority)
+    'zen.spamhaus.org',          # Spamhaus combined list
+    'bl.spamcop.net',            # SpamCop
+    'b.barracudacentral.org',    # Barracuda
+    'dnsbl.sorbs.net',           # SORBS aggregate
+    'bl.blocklist.de',           # Blocklist.de
+    'cbl.abuseat.org',           # Composite Blocking List
+    'psbl.surriel.com',          # Passive Spam Block List
+
+    # Tier 2 - Important (Widely Used)
+    'dnsbl-1.uceprotect.net',    # UCEProtect Level 1
+    'dnsbl-2.uceprotect.net',    # UCEProtect Level 2
+    'spam.dnsbl.sorbs.net',      # SORBS spam sources
+    'http.dnsbl.sorbs.net',      # SORBS HTTP proxies
+    'misc.dnsbl.sorbs.net',      # SORBS misc
+    'smtp.dnsbl.sorbs.net',      # SORBS SMTP
+    'socks.dnsbl.sorbs.net',     # SORBS SOCKS
+    'web.dnsbl.sorbs.net',       # SORBS web servers
+    'zombie.dnsbl.sorbs.net',    # SORBS zombies
+
+    # Tier 3 - Additional Coverage
+    'dyna.spamrats.com',         # SpamRats dynamic
+    'spam.spamrats.com',         # SpamRats spam
+    'noptr.spamrats.com',        # SpamRats no PTR
+    'ubl.unsubscore.com',        # Lashback UBL
+    'rbl.realtimeblacklist.com', # RBL
+    'ix.dnsbl.manitu.net',       # NiX Spam
+    'dnsbl.inps.de',             # INPS
+    'bl.mailspike.net',          # Mailspike
+    'bl.spameatingmonkey.net',   # Spam Eating Monkey
+    'dnsbl.cobion.com',          # Cobion
+    'rbl.efnetrbl.org',          # EFnet RBL
+    'blackholes.mail-abuse.org', # MAPS RBL
+    'dnsbl.httpbl.org',          # Project Honey Pot
+    'truncate.gbudb.net'         # GBUdb
+]
+
+# A provider returns (formatted_result, score) - score None means it does not
+# count towards the verdict - or None when it does not apply (e.g. no API key).
+ProviderResult = Optional[Tuple[dict, Optional[float]]]
+Provider = Callable[[str, dict, object], ProviderResult]
+
+_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix='drc-ip')
+
+DNSBL_SWEEP_TIMEOUT = 4.0  # Global deadline for all DNSBL queries, retransmissions included
+
+# Shodan plans without HTTPS support are detected once per API key, not per lookup
+_shodan_schemes = {}
+
+
+# Longest wait for a rate-limit token outside analyze_ip() (which uses each
+# provider's own deadline instead)
+RATE_LIMIT_MAX_WAIT = 15
+
+# Deadline and cancellation event of the provider call running on this thread
+_provider_call = threading.local()
+
+
+def take_rate_token(rate_limiter, key: str) -> bool:
+    """
+    Take the API quota token for ``key`` right before a request.
+
+    Waits at most until the deadline of the provider call running on this
+    thread (RATE_LIMIT_MAX_WAIT outside analyze_ip()). Returns False when no
+    token frees up in time or the call is abandoned while waiting; no token is
+    consumed in either case.
+    """
+    if not rate_limiter:
+        return True
+    deadline = getattr(_provider_call, 'deadline', None)
+    timeout = max(0.0, deadline - time.monotonic()) if deadline else RATE_LIMIT_MAX_WAIT
+    return rate_limiter.acquire(key, timeout=timeout, cancelled=getattr(_provider_call, 'cancelled', None))
+
+
+def _take_bulk_token(rate_limiter, key: str, exhausted: Optional[set]) -> bool:
+    """
+    take_rate_token() for bulk runs: once a quota could not be served in time
+    it is recorded in ``exhausted`` and skipped for the rest of the run.
+    """
+    if exhausted is not None and key in exhausted:
+        return False
+    if take_rate_token(rate_limiter, key):
+        return True
+    if exhausted is not None:
+        exhausted.add(key)
+    return False
+
+
+def rate_limited(source: str, key: str) -> Tuple[dict, None]:
+    """Card reported instead of a result when a provider's quota is exhausted"""
+    return {
+        'source': source, 'status': 'error',
+        'message': f'Rate limited: {key} API quota exhausted, try again later'
+    }, None
+
+
+def api_error(source: str, key: str, response, rate_limiter=None) -> Tuple[dict, None]:
+    """Error card for a failed API response; a 429 also makes every caller back off ``key``"""
+    if response.status_code == 429:
+        if rate_limiter:
+            rate_limiter.penalize(key, parse_retry_after(response.headers.get('Retry-After')))
+        message = f'{source} rate limit exceeded - try again later'
+    else:
+        message = f'{source} API error: HTTP {response.status_code}'
+    return {'source': source, 'status': 'error', 'message': message}, None
+
+
+def _abuse_verdict(confidence: int) -> Tuple[str, float]:
+    """Map an AbuseIPDB confidence score to (reputation, score)"""
+    if confidence >= 75:
+        return 'malicious', -3
+    elif confidence >= 25:
+        return 'suspicious', -2
+    return 'clean', 1
+
+
+def check_abuseipdb(ip_address: str, api_keys: dict, rate_limiter=None) -> ProviderResult:
+    """AbuseIPDB check endpoint (IPv4 and IPv6)"""
+    if not api_keys.get('abuseipdb'):
+        return None
+
+    if not take_rate_token(rate_limiter, 'abuseipdb'):
+        return rate_limited('AbuseIPDB', 'abuseipdb')
+    abuse_resp = get_session('abuseipdb').get(
+        'https://api.abuseipdb.com/api/v2/check',
+        headers={'Key': api_keys['abuseipdb'], 'Accept': 'application/json'},
+        params={'ipAddress': ip_address, 'maxAgeInDays': 90},
+        timeout=10
+    )
+    if abuse_resp.status_code != 200:
+        return api_error('AbuseIPDB', 'abuseipdb', abuse_resp, rate_limiter)
+
+    ad = abuse_resp.json().get('data', {})
+    confidence = ad.get('abuseConfidenceScore', 0)
+    abuse_rep, score = _abuse_verdict(confidence)
+    return {
+        'source': 'AbuseIPDB',
+        'status': 'success',
+        'reputation': abuse_rep,
+        'details': {
+            'confidence': f"{confidence}%",
+            'reports': ad.get('totalReports', 0),
+            'last_reported': ad.get('lastReportedAt') or 'N/A',
+            'country': ad.get('countryCode', 'Unknown'),
+            'isp': ad.get('isp', 'Unknown'),
+            'usage_type': ad.get('usageType', 'Unknown'),
+        }
+    }, score
+
+
+def check_virustotal(ip_address: str, api_keys: dict, rate_limiter=None) -> ProviderResult:
+    """VirusTotal v3 IP address report"""
+    if not api_keys.get('virustotal'):
+        return None
+
+    vt_url = f"https://www.virustotal.com/api/v3/ip_addresses/{ip_address}"
+    headers = {'x-apikey': api_keys['virustotal']}
+    if not take_rate_token(rate_limiter, 'virustotal'):
+        return rate_limited('VirusTotal', 'virustotal')
+    response = get_session('virustotal').get(vt_url, headers=headers, timeout=10)
+    if response.status_code != 200:
+        return api_error('VirusTotal', 'virustotal', response, rate_limiter)
+
+    vt_data = response.json().get('data', {}).get('attributes', {})
+    stats = vt_data.get('last_analysis_stats', {})
+    malicious = stats.get('malicious', 0)
+    suspicious = stats.get('suspicious', 0)
+
+    if malicious >= 5:
+        vt_reputation, score = 'malicious', -3
+    elif malicious >= 2 or suspicious >= 5:
+        vt_reputation, score = 'suspicious', -2
+    else:
+        vt_reputation, score = 'clean', 1
+
+    return {
+        'source': 'VirusTotal',
+        'status': 'success',
+        'reputation': vt_reputation,
+        'details': {
+            'malicious': malicious,
+            'suspicious': suspicious,
+            'harmless': stats.get('harmless', 0),
+            'undetected': stats.get('undetected', 0),
+            'country': vt_data.get('country', 'Unknown'),
+            'as_owner': vt_data.get('as_owner', 'Unknown')
+        }
+    }, score
+
+
+def _shodan_scheme(shodan_key: str) -> str:
+    """Detect HTTPS support: the dev plan has https=false and must use HTTP"""
+    scheme = _shodan_schemes.get(shodan_key)
+    if scheme is None:
+        try:
+            info_resp = get_session('shodan').get(
+                f"https://api.shodan.io/api-info?key={shodan_key}", timeout=5
+            )
+            scheme = "https" if info_resp.json().get("https", False) else "http"
+            _shodan_schemes[shodan_key] = scheme
+        except Exception:
+            scheme = "https"  # Not remembered, so the next lookup tries again
+    return scheme
+
+
+def format_shodan_host(sd: dict, ip_address: str) -> Tuple[dict, float]:
+    """Turn a /shodan/host response into a result card and score"""
+    # Build services list: "80/tcp (Apache httpd 2.4.51)"
+    services = []
+    for entry in sd.get('data', []):
+        port = entry.get('port', '')
+        transport = entry.get('transport', 'tcp')
+        product = entry.get('product', '')
+        version = entry.get('version', '')
+        module = entry.get('_shodan', {}).get('module', '')
+        label = product or module or ''
+        if version:
+            label = f"{label} {version}".strip()
+        svc = f"{port}/{transport}"
+        if label:
+            svc += f" ({label})"
+        services.append(svc)
+
+    open_ports = sorted({e.get('port', 0) for e in sd.get('data', [])})
+    vulns_raw = sd.get('vulns', {})
+    vulns = list(vulns_raw.keys()) if isinstance(vulns_raw, dict) else (vulns_raw if isinstance(vulns_raw, list) else [])
+    tags = sd.get('tags', [])
+    hostnames = sd.get('hostnames', [])
+    domains_found = sd.get('domains', [])
+    location_parts = [p for p in [sd.get('city'), sd.get('region_code'), sd.get('country_name')] if p]
+
+    ssl_info = ''
+    for entry in sd.get('data', []):
+        if 'ssl' in entry:
+            cert = entry['ssl'].get('cert', {})
+            cn = cert.get('subject', {}).get('CN', '')
+            expires = cert.get('expires', '')
+            if cn:
+                ssl_info = cn + (f' (exp: {expires})' if expires else '')
+            break
+
+    suspicious_set = {21, 22, 23, 25, 135, 139, 445, 1433, 3306, 3389, 5900, 6379, 27017}
+    suspicious_count = len(set(open_ports).intersection(suspicious_set))
+
+    if vulns or suspicious_count > 3 or 'honeypot' in tags:
+        sd_rep, score = 'suspicious', -2
+    elif suspicious_count > 0 or tags:
+        sd_rep, score = 'questionable', -1
+    else:
+        sd_rep, score = 'clean', 0.5
+
+    details = {}
+    if sd.get('org'):
+        details['organization'] = sd['org']
+    if sd.get('isp') and sd.get('isp') != sd.get('org'):
+        details['isp'] = sd['isp']
+    if sd.get('asn'):
+        details['asn'] = sd['asn']
+    if location_parts:
+        details['location'] = ', '.join(location_parts)
+    if sd.get('os'):
+        details['operating_system'] = sd['os']
+    if open_ports:
+        details['open_ports'] = open_ports
+    if services:
+        details['services'] = services
+    if vulns:
+        details['vulnerabilities'] = vulns
+    if tags:
+        details['tags'] = tags
+    if hostnames:
+        details['hostnames'] = hostnames[:10]
+    if domains_found:
+        details['domains'] = domains_found[:10]
+    if ssl_info:
+        details['ssl_certificate'] = ssl_info
+    if sd.get('last_update'):
+        details['last_update'] = sd['last_update']
+
+    return {
+        'source': 'Shodan',
+        'source_id': 'shodan',
+        'status': 'success',
+        'reputation': sd_rep,
+        'details': details,
+        'url': f"https://www.shodan.io/host/{ip_address}",
+    }, score
+
+
+def check_shodan(ip_address: str, api_keys: dict, rate_limiter=None) -> ProviderResult:
+    """Shodan host lookup (does not consume query credits)"""
+    shodan_key = api_keys.get('shodan')
+    if not shodan_key:
+        return None
+
+    scheme = _shodan_scheme(shodan_key)
+    if not take_rate_token(rate_limiter, 'shodan'):
+        return rate_limited('Shodan', 'shodan')
+    shodan_resp = get_session('shodan').get(
+        f"{scheme}://api.shodan.io/shodan/host/{ip_address}?key={shodan_key}",
+        timeout=15,
+        verify=(scheme == "https")
+    )
+    if shodan_resp.status_code == 200:
+        return format_shodan_host(shodan_resp.json(), ip_address)
+    if shodan_resp.status_code == 404:
+        return {
+            'source': 'Shodan', 'status': 'not_found',
+            'message': 'No Shodan data for this IP'
+        }, None
+    return api_error('Shodan', 'shodan', shodan_resp, rate_limiter)
+
+
+def blacklist_score(listed: int, checked: int) -> float:
+    """Score contribution of the DNSBL sweep (adjusted for 30+ blacklists)"""
+    listed_percentage = (listed / checked) * 100 if checked else 0
+
+    if listed_percentage >= 20:  # Listed in 20%+ of blacklists (6+)
+        return -3
+    elif listed_percentage >= 10:  # Listed in 10-20% (3-5)
+        return -2
+    elif listed_percentage >= 3:   # Listed in 3-10% (1-2)
+        return -1
+    return 0.5  # Clean or minimal listings
+
+
+def check_blacklists(ip_address: str, api_keys: dict, rate_limiter=None) -> ProviderResult:
+    """DNS blacklist sweep over DNSBL_ZONES (all zones queried at once over UDP)"""
+    return _blacklist_card(dnsbl.sweep(ip_address, DNSBL_ZONES, timeout=DNSBL_SWEEP_TIMEOUT))
+
+
+def _blacklist_card(answers: Dict[str, dict]) -> Tuple[dict, float]:
+    """Turn per-zone DNSBL verdicts into the blacklist result card and score"""
+    listed = [zone for zone, answer in answers.items() if answer['status'] == 'listed']
+    unanswered = [zone for zone, answer in answers.items() if answer['status'] in ('timeout', 'error')]
+
+    details = {
+        'checked': len(DNSBL_ZONES),
+        'listed': len(listed),
+        'blacklists': listed
+    }
+    if listed:
+        details['listing_reasons'] = {zone: answers[zone]['reasons'] for zone in listed}
+    if unanswered:
+        details['unanswered'] = unanswered
+
+    return {
+        'source': 'DNS Blacklists (30+ Sources)',
+        'status': 'success',
+        'details': details
+    }, blacklist_score(len(listed), len(DNSBL_ZONES))
+
+
+def check_hostname(ip_address: str, api_keys: dict, rate_limiter=None) -> ProviderResult:
+    """Reverse DNS (PTR) lookup"""
+    try:
+        hostname = socket.gethostbyaddr(ip_address)[0]
+    except Exception:
+        hostname = 'No hostname'
+    return {'source': 'Reverse DNS', 'status': 'success', 'details': {'hostname': hostname}}, None
+
+
+# Built-in providers as (result key, display name, function), in display order
+IP_PROVIDERS = [
+    ('abuseipdb', 'AbuseIPDB', check_abuseipdb),
+    ('virustotal', 'VirusTotal', check_virustotal),
+    ('shodan', 'Shodan', check_shodan),
+    ('blacklist_check', 'DNS Blacklists (30+ Sources)', check_blacklists),
+    ('hostname', 'Reverse DNS', check_hostname),
+]
+
+
+# Order of the result cards in the response (unlisted providers go last)
+RESULT_ORDER = ['abuseipdb', 'virustotal', 'shodan', 'networksdb', 'blacklist_check', 'geolocation']
+
+
+def reputation_from_scores(scores: List[float]) -> str:
+    """Average the provider scores into a verdict"""
+    if not scores:
+        return 'unknown'
+    avg_score = sum(scores) / len(scores)
+    if avg_score <= -1.5:
+        return 'malicious'
+    elif avg_score <= -0.5:
+        return 'suspicious'
+    elif avg_score <= 0.3:
+        return 'questionable'
+    return 'clean'
+
+
+def _ordered_cards(results: Dict[str, dict]) -> List[dict]:
+    """Result cards in display order, with reverse DNS folded into the blacklist card"""
+    hostname = results.pop('hostname', {}).get('details', {}).get('hostname', 'No hostname')
+    if 'blacklist_check' in results and results['blacklist_check'].get('status') == 'success':
+        results['blacklist_check']['details']['hostname'] = hostname
+
+    order = {key: i for i, key in enumerate(RESULT_ORDER)}
+    ordered = sorted(results.items(), key=lambda item: order.get(item[0], len(order)))
+    return [result for _, result in ordered]
+
+
+def analyze_ip(ip_address: str, api_keys: dict, rate_limiter=None,
+               extra_providers: Optional[List[Tuple[str, str, Provider]]] = None,
+               deadlines: Optional[Dict[str, float]] = None,
+               log: Optional[logging.Logger] = None) -> dict:
+    """
+    Run all IP providers concurrently and combine their results.
+
+    Args:
+        ip_address: Normalized IP address
+        api_keys: Provider API keys
+        rate_limiter: RateLimiter shared with the domain checker (optional)
+        extra_providers: Additional (key, name, function) providers, appended in order
+        deadlines: Per-provider deadline overrides in seconds
+        log: Logger for provider failures (defaults to this module's logger)
+
+    Returns:
+        Payload with the verdict, result cards, per-provider timings (ms),
+        the providers that timed out and those that returned an error
+        (API errors, rate limits); either makes the payload partial.
+    """
+    log = log or logger
+    providers = IP_PROVIDERS + list(extra_providers or [])
+    limits = dict(IP_PROVIDER_DEADLINES)
+    limits.update(deadlines or {})
+
+    timings = {}
+    started = time.monotonic()
+    futures = []
+    for key, name, fn in providers:
+        cancelled = threading.Event()
+
+        def run(key=key, fn=fn, cancelled=cancelled):
+            t0 = time.monotonic()
+            # Rate-limit waits inside the provider end with its deadline
+            _provider_call.deadline = started + limits.get(key, 15)
+            _provider_call.cancelled = cancelled
+            try:
+                return fn(ip_address, api_keys, rate_limiter), None
+            except Exception as e:
+                return None, e
+            finally:
+                _provider_call.deadline = _provider_call.cancelled = None
+                timings[key] = int((time.monotonic() - t0) * 1000)
+        futures.append((key, name, cancelled, _executor.submit(run)))
+
+    results = {}
+    scores = []
+    timed_out = []
+    failed = []
+    for key, name, cancelled, future in futures:
+        deadline = limits.get(key, 15)
+        remaining = max(0.0, started + deadline - time.monotonic())
+        try:
+            outcome, error = future.result(timeout=remaining)
+        except FuturesTimeoutError:
+            future.cancel()
+            cancelled.set()
+            timed_out.append(key)
+            timings[key] = int(deadline * 1000)
+            results[key] = {'source': name, 'status': 'error', 'message': f'Timed out after {deadline}s'}
+            continue
+
+        if error is not None:
+            log.error(f'{name} IP check failed: {str(error)}')
+            results[key] = {'source': name, 'status': 'error', 'message': 'Check failed'}
+            failed.append(key)
+        elif outcome is not None:
+            result, score = outcome
+            results[key] = result
+            if result.get('status') == 'error':
+                failed.append(key)
+            if score is not None:
+                scores.append(score)
+
+    return {
+        'ip': ip_address,
+        'reputation': reputation_from_scores(scores),
+        'results': _ordered_cards(results),
+        'timings_ms': dict(timings),
+        'timed_out': timed_out,
+        'failed': failed,
+        'partial': bool(timed_out or failed),
+    }
+
+
+# ---- Bulk lookups ----
+
+BULK_MAX_IPS = 10000        # Addresses accepted per bulk request
+SHODAN_BATCH_SIZE = 100     # Hosts per comma-separated /shodan/host call
+BULK_CHUNK_SIZE = 100       # Addresses analyzed together before results are streamed
+
+_TOKEN_SEPARATORS = re.compile(r'[\s,;|"\'()<>=]+')
+
+
+def _parse_ip_token(token: str):
+    """Parse one log token ("1.2.3.4", "1.2.3.4:443", "[2001:db8::1]:443") or return None"""
+    token = token.strip('.')
+    if token.startswith('['):
+        token = token[1:].split(']', 1)[0]
+    elif token.count(':') == 1:
+        token = token.split(':', 1)[0]  # IPv4 with port
+    token = token.split('%', 1)[0].split('/', 1)[0]  # IPv6 zone id, CIDR suffix
+    try:
+        return ipaddress.ip_address(token)
+    except ValueError:
+        return None
+
+
+def extract_ips(lines: Iterable[str]) -> List[str]:
+    """
+    Pull every IP address out of free-form lines (plain lists, CSV, firewall logs).
+
+    Returns normalized addresses, deduplicated, in order of first appearance.
+    """
+    seen = {}
+    for line in lines:
+        for token in _TOKEN_SEPARATORS.split(line):
+            if not token:
+                continue
+            ip = _parse_ip_token(token)
+            if ip is not None:
+                seen.setdefault(str(ip), None)
+    return list(seen)
+
+
+def network_key(ip_address: str) -> str:
+    """The /24 (IPv4) or /64 (IPv6) network an address is grouped under"""
+    ip = ipaddress.ip_address(ip_address)
+    prefix = 24 if ip.version == 4 else 64
+    return str(ipaddress.ip_network(f'{ip}/{prefix}', strict=False))
+
+
+def check_abuseipdb_block(network: str, ip_addresses: List[str], api_keys: dict,
+                          rate_limiter=None, exhausted: Optional[set] = None) -> Optional[Dict[str, ProviderResult]]:
+    """
+    AbuseIPDB check-block for an IPv4 /24: one call covers every address in it.
+
+    Returns ip -> (card, score) for ``ip_addresses``; addresses without reports
+    are clean, and every address gets a rate-limited card when the check-block
+    quota is exhausted (see _take_bulk_token for ``exhausted``). None when no
+    API key is configured.
+    """
+    if not api_keys.get('abuseipdb'):
+        return None
+
+    if not _take_bulk_token(rate_limiter, 'abuseipdb_block', exhausted):
+        return {ip: rate_limited('AbuseIPDB', 'abuseipdb_block') for ip in ip_addresses}
+    resp = get_session('abuseipdb').get(
+        'https://api.abuseipdb.com/api/v2/check-block',
+        headers={'Key': api_keys['abuseipdb'], 'Accept': 'application/json'},
+        params={'network': network, 'maxAgeInDays': 90},
+        timeout=15
+    )
+    if resp.status_code != 200:
+        error, _ = api_error('AbuseIPDB', 'abuseipdb_block', resp, rate_limiter)
+        return {ip: (dict(error), None) for ip in ip_addresses}
+
+    reported = {
+        entry.get('ipAddress'): entry
+        for entry in resp.json().get('data', {}).get('reportedAddress', [])
+    }
+    results = {}
+    for ip in ip_addresses:
+        entry = reported.get(ip, {})
+        confidence = entry.get('abuseConfidenceScore', 0)
+        abuse_rep, score = _abuse_verdict(confidence)
+        results[ip] = ({
+            'source': 'AbuseIPDB',
+            'status': 'success',
+            'reputation': abuse_rep,
+            'details': {
+                'confidence': f"{confidence}%",
+                'reports': entry.get('numReports', 0),
+                'last_reported': entry.get('mostRecentReport') or 'N/A',
+                'country': entry.get('countryCode', 'Unknown'),
+                'network': network,
+            }
+        }, score)
+    return results
+
+
+def check_shodan_batch(ip_addresses: List[str], api_keys: dict,
+                       rate_limiter=None, exhausted: Optional[set] = None) -> Optional[Dict[str, ProviderResult]]:
+    """
+    Shodan host lookups, up to SHODAN_BATCH_SIZE addresses per request.
+
+    Returns ip -> (card, score); addresses Shodan has no data for are not_found,
+    batches the quota could not serve get a rate-limited card. None when no
+    API key is configured.
+    """
+    shodan_key = api_keys.get('shodan')
+    if not shodan_key:
+        return None
+
+    scheme = _shodan_scheme(shodan_key)
+    results = {}
+    for i in range(0, len(ip_addresses), SHODAN_BATCH_SIZE):
+        batch = ip_addresses[i:i + SHODAN_BATCH_SIZE]
+        if not _take_bulk_token(rate_limiter, 'shodan', exhausted):
+            results.update((ip, rate_limited('Shodan', 'shodan')) for ip in batch)
+            continue
+        resp = get_session('shodan').get(
+            f"{scheme}://api.shodan.io/shodan/host/{','.join(batch)}?key={shodan_key}",
+            timeout=30,
+            verify=(scheme == "https")
+        )
+        if resp.status_code == 200:
+            hosts = resp.json()
+            if isinstance(hosts, dict):  # A single address comes back as one object
+                hosts = [hosts]
+            for host in hosts:
+                ip = host.get('ip_str')
+                if ip in batch:
+                    results[ip] = format_shodan_host(host, ip)
+        elif resp.status_code != 404:
+            error, _ = api_error('Shodan', 'shodan', resp, rate_limiter)
+            for ip in batch:
+                results[ip] = (dict(error), None)
+
+    not_found = {'source': 'Shodan', 'status': 'not_found', 'message': 'No Shodan data for this IP'}
+    for ip in ip_addresses:
+        results.setdefault(ip, (dict(not_found), None))
+    return results
+
+
+def _analyze_group(network: str, ip_addresses: List[str], api_keys: dict, rate_limiter,
+                   log: logging.Logger, exhausted: Optional[set] = None) -> Dict[str, Dict[str, ProviderResult]]:
+    """AbuseIPDB, DNSBL and reverse DNS for one network; returns ip -> key -> outcome"""
+    outcomes = {ip: {} for ip in ip_addresses}
+
+    try:
+        if len(ip_addresses) > 1 and ':' not in network:
+            abuse = check_abuseipdb_block(network, ip_addresses, api_keys, rate_limiter, exhausted)
+        elif api_keys.get('abuseipdb'):
+            # The token is taken here so an exhausted quota is skipped for the rest of the run
+            abuse = {
+                ip: check_abuseipdb(ip, api_keys) if _take_bulk_token(rate_limiter, 'abuseipdb', exhausted)
+                else rate_limited('AbuseIPDB', 'abuseipdb')
+                for ip in ip_addresses
+            }
+        else:
+            abuse = None
+        for ip, outcome in (abuse or {}).items():
+            outcomes[ip]['abuseipdb'] = outcome
+    except Exception as e:
+        log.error(f'AbuseIPDB bulk check failed for {network}: {str(e)}')
+        for ip in ip_addresses:
+            outcomes[ip]['abuseipdb'] = ({'source': 'AbuseIPDB', 'status': 'error', 'message': 'Check failed'}, None)
+
+    try:
+        answers = dnsbl.sweep_many(ip_addresses, DNSBL_ZONES, max_tries=3)
+        for ip in ip_addresses:
+            outcomes[ip]['blacklist_check'] = _blacklist_card(answers[ip])
+    except Exception as e:
+        log.error(f'DNS blacklist bulk check failed for {network}: {str(e)}')
+
+    for ip in ip_addresses:
+        outcomes[ip]['hostname'] = check_hostname(ip, api_keys)
+    return outcomes
+
+
+def analyze_ips_bulk(ip_addresses: Iterable[str], api_keys: dict, rate_limiter=None,
+                     concurrency: int = 8, log: Optional[logging.Logger] = None) -> Iterator[dict]:
+    """
+    Analyze many IPs, yielding one payload per address as soon as its chunk completes.
+
+    Addresses are deduplicated and grouped by network_key(); each group is
+    checked concurrently (up to ``concurrency`` groups at a time) while Shodan
+    is queried in batches across groups. VirusTotal is skipped: its 4/minute
+    quota cannot cover bulk input. A provider whose quota is exhausted is
+    reported as rate limited for the remaining addresses while the other
+    providers carry on.
+
+    Yields:
+        {'ip', 'network', 'reputation', 'results'} in the same card format as analyze_ip()
+    """
+    log = log or logger
+    groups = {}
+    for ip in dict.fromkeys(ip_addresses):
+        groups.setdefault(network_key(ip), []).append(ip)
+
+    # Chunks of whole groups, so one Shodan batch and one round of group checks
+    # covers about BULK_CHUNK_SIZE addresses before their results are streamed
+    chunks, current = [], []
+    for network, members in groups.items():
+        current.append((network, members))
+        if sum(len(m) for _, m in current) >= BULK_CHUNK_SIZE:
+            chunks.append(current)
+            current = []
+    if current:
+        chunks.append(current)
+
+    exhausted = set()  # Rate-limit keys that ran out during this run
+    with ThreadPoolExecutor(max_workers=max(1, concurrency) + 1, thread_name_prefix='drc-bulk') as pool:
+        for chunk in chunks:
+            chunk_ips = [ip for _, members in chunk for ip in members]
+            shodan_future = pool.submit(check_shodan_batch, chunk_ips, api_keys, rate_limiter, exhausted)
+            futures = {
+                pool.submit(_analyze_group, network, members, api_keys, rate_limiter, log, exhausted): network
+                for network, members in chunk
+            }
+
+            outcomes = {}
+            for future in as_completed(futures):
+                try:
+                    outcomes.update(future.result())
+                except Exception as e:
+                    log.error(f'Bulk IP check failed for {futures[future]}: {str(e)}')
+            try:
+                shodan = shodan_future.result() or {}
+            except Exception as e:
+                log.error(f'Shodan bulk check failed: {str(e)}')
+                shodan = {ip: ({'source': 'Shodan', 'status': 'error', 'message': 'Check failed'}, None)
+                          for ip in chunk_ips}
+
+            for network, members in chunk:
+                for ip in members:
+                    per_ip = dict(outcomes.get(ip, {}))
+                    if ip in shodan:
+                        per_ip['shodan'] = shodan[ip]
+                    results = {key: outcome[0] for key, outcome in per_ip.items() if outcome}
+                    scores = [outcome[1] for outcome in per_ip.values() if outcome and outcome[1] is not None]
+                    yield {
+                        'ip': ip,
+                        'network': network,
+                        'reputation': reputation_from_scores(scores),
+                        'results': _ordered_cards(results),
+                    }
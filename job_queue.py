@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Background job queue for analyses
+Web requests enqueue a job and return its ID right away; a pool of worker
+threads claims queued jobs from a shared SQLite table and runs them. Every
+process that opens the same database (gunicorn workers, or dedicated
+``worker.py`` processes) takes jobs from one queue, so a small web tier can
+front a larger analysis pool.
+
+Jobs survive restarts: a claimed job carries a lease, and a job whose
+worker died is handed out again once its lease expires.
+"""
+
+import json
+import threading
+import time
+import uuid
+from typing import Callable, Dict, Optional
+
+from cache_db import SQLitePool, MaintenanceThread
+
+
+JOB_LEASE_SECONDS = 300       # A running job not finished by then is given to another worker
+JOB_MAX_ATTEMPTS = 3          # Claims per job before it is marked failed
+JOB_RETENTION_HOURS = 24      # Finished jobs are kept this long for polling
+POLL_INTERVAL = 1.0           # Idle workers check for jobs queued by other processes this often
+
+
+class JobQueue:
+    """SQLite-backed job queue with an in-process worker pool"""
+
+    def __init__(self, db_file: str, handlers: Dict[str, Callable[[dict], dict]], workers: int = 4,
+                 lease: float = JOB_LEASE_SECONDS, logger=None):
+        """
+        Args:
+            db_file: Path to the queue database (shared by every process)
+            handlers: Job kind -> function taking the job params and returning a JSON-serializable result
+            workers: Worker threads started by start() (0: enqueue only)
+            lease: Seconds a claimed job may run before it is considered abandoned
+            logger: Logger for job failures (print() if omitted)
+        """
+        self.handlers = handlers
+        self.workers = workers
+        self.lease = lease
+        self.logger = logger
+        self._db = SQLitePool(db_file, size=max(4, workers + 2))
+        self._db.script('''
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                kind TEXT,
+                params TEXT,
+                status TEXT,
+                result TEXT,
+                error TEXT,
+                attempts INTEGER DEFAULT 0,
+                created REAL,
+                started REAL,
+                finished REAL,
+                lease_until REAL
+            );
+            CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created);
+        ''')
+        self._wakeup = threading.Condition()
+        self._finished = threading.Condition()
+        self._stop = threading.Event()
+        self._threads = []
+        self._maintenance = None
+
+    def _log(self, message: str) -> None:
+        if self.logger:
+            self.logger.error(message)
+        else:
+            print(f"[!] {message}")
+
+    def start(self) -> None:
+        """Start the worker threads and the cleanup of old jobs"""
+        if self._threads:
+            return
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f'drc-job-worker-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        self._maintenance = MaintenanceThread(self.purge, 3600, name='drc-job-maintenance')
+        self._maintenance.start()
+
+    def stop(self) -> None:
+        """Stop taking new jobs (running jobs finish, or are re-queued after their lease)"""
+        self._stop.set()
+        with self._wakeup:
+            self._wakeup.notify_all()
+        if self._maintenance:
+            self._maintenance.stop()
+
+    def submit(self, kind: str, params: dict) -> str:
+        """Queue a job and return its ID"""
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job type: {kind}")
+        job_id = uuid.uuid4().hex
+        self._db.execute(
+            'INSERT INTO jobs (job_id, kind, params, status, created) VALUES (?, ?, ?, ?, ?)',
+            (job_id, kind, json.dumps(params), 'queued', time.time())
+        )
+        with self._wakeup:
+            self._wakeup.notify()
+        return job_id
+
+    def get(self, job_id: str) -> Optional[dict]:
+        """Job status (and result once finished), or None if unknown"""
+        rows = self._db.query(
+            'SELECT job_id, kind, params, status, result, error, attempts, created, started, finished '
+            'FROM jobs WHERE job_id = ?', (job_id,)
+        )
+        if not rows:
+            return None
+        job_id, kind, params, status, result, error, attempts, created, started, finished = rows[0]
+        job = {
+            'job_id': job_id,
+            'type': kind,
+            'params': json.loads(params),
+            'status': status,
+            'attempts': attempts,
+            'created': created,
+            'started': started,
+            'finished': finished,
+        }
+        if result is not None:
+            job['result'] = json.loads(result)
+        if error:
+            job['error'] = error
+        if status == 'queued':
+            job['position'] = self._db.query(
+                "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND created < ?", (created,)
+            )[0][0]
+        return job
+
+    def wait(self, job_id: str, timeout: float) -> Optional[dict]:
+        """Block until the job finishes or ``timeout`` passes, then return get()"""
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self.get(job_id)
+            remaining = deadline - time.monotonic()
+            if job is None or job['status'] in ('done', 'failed') or remaining <= 0:
+                return job
+            # Woken early by jobs finishing here; jobs run by other processes are polled
+            with self._finished:
+                self._finished.wait(min(remaining, POLL_INTERVAL))
+
+    def stats(self) -> Dict[str, int]:
+        """Number of jobs by status"""
+        return dict(self._db.query('SELECT status, COUNT(*) FROM jobs GROUP BY status'))
+
+    def _claim(self) -> Optional[tuple]:
+        """Atomically take the oldest queued (or abandoned) job"""
+        now = time.time()
+        with self._db.connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = conn.execute(
+                    "SELECT job_id, kind, params, attempts FROM jobs "
+                    "WHERE status = 'queued' OR (status = 'running' AND lease_until < ?) "
+                    "ORDER BY created LIMIT 1", (now,)
+                ).fetchone()
+                if row:
+                    conn.execute(
+                        "UPDATE jobs SET status = 'running', started = ?, lease_until = ?, "
+                        "attempts = attempts + 1 WHERE job_id = ?",
+                        (now, now + self.lease, row[0])
+                    )
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+        return row
+
+    def _finish(self, job_id: str, status: str, result=None, error: Optional[str] = None) -> None:
+        self._db.execute(
+            'UPDATE jobs SET status = ?, result = ?, error = ?, finished = ?, lease_until = NULL WHERE job_id = ?',
+            (status, json.dumps(result, default=str) if result is not None else None, error, time.time(), job_id)
+        )
+        with self._finished:
+            self._finished.notify_all()
+
+    def _work(self) -> None:
+        while not self._stop.is_set():
+            try:
+                job = self._claim()
+            except Exception as e:
+                self._log(f"Could not claim job: {e}")
+                job = None
+            if job is None:
+                with self._wakeup:
+                    self._wakeup.wait(POLL_INTERVAL)
+                continue
+
+            job_id, kind, params, attempts = job
+            if attempts >= JOB_MAX_ATTEMPTS:
+                # Claimed again after its worker died too often: probably crashes the worker
+                self._finish(job_id, 'failed', error=f'Abandoned after {attempts} attempts')
+                continue
+            try:
+                result = self.handlers[kind](json.loads(params))
+                self._finish(job_id, 'done', result=result)
+            except Exception as e:
+                self._log(f"Job {job_id} ({kind}) failed: {e}")
+                self._finish(job_id, 'failed', error=str(e))
+
+    def purge(self, hours: float = JOB_RETENTION_HOURS) -> None:
+        """Delete finished jobs older than ``hours``"""
+        self._db.execute(
+            "DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished < ?",
+            (time.time() - hours * 3600,)
+        )
+
+    def run_forever(self) -> None:
+        """Run the worker pool in the foreground (dedicated worker processes)"""
+        self.start()
+        try:
+            while not self._stop.wait(1):
+                pass
+        except KeyboardInterrupt:
+            self.stop()
@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+"""
+Per-source rate limiting for threat intelligence APIs
+Token buckets keyed by source name so each API key's quota is respected
+without slowing down sources that have no quota at all.
+
+Bucket state can live in a SQLite file so that every process using the
+same API keys (e.g. all gunicorn workers) draws from one shared quota.
+"""
+
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+
+# Default quotas as (requests, period_seconds, burst) - free-tier limits
+DEFAULT_RATE_LIMITS = {
+    'virustotal': (4, 60, 4),          # Public API: 4 lookups/minute
+    'abuseipdb': (1000, 86400, 10),    # Free plan: 1000 checks/day
+    'abuseipdb_block': (100, 86400, 5),  # Free plan: 100 check-block calls/day
+    'shodan': (1, 1, 1),               # 1 request/second on all plans
+    'urlscan': (60, 60, 10),           # Search API: 60/minute
+    'securitytrails': (50, 2592000, 5),  # Free plan: 50/month
+    'apivoid': (30, 60, 5),
+    'ipapi': (100, 60, 10),
+    'ipdata': (1500, 86400, 10),       # Free plan: 1500/day
+    'ip-api': (45, 60, 10),            # Free endpoint: 45 requests/minute
+    'ipapi_co': (1000, 86400, 10),     # Free endpoint: 1000/day
+    'networksdb': (5, 60, 5),
+    'alienvault_otx': (150, 60, 20),
+}
+
+# Which quota each analysis source consumes (sources not listed run unthrottled)
+SOURCE_RATE_KEYS = {
+    'virustotal': 'virustotal',
+    'abuseipdb': 'abuseipdb',
+    'shodan': 'shodan',
+    'urlscan': 'urlscan',
+    'securitytrails': 'securitytrails',
+    'urlvoid': 'apivoid',
+    'alienvault_otx': 'alienvault_otx',
+}
+
+PERIODS = {
+    'second': 1,
+    'minute': 60,
+    'hour': 3600,
+    'day': 86400,
+    'month': 2592000,
+}
+
+
+def parse_rate_limit(value: str) -> Optional[Tuple[int, float, int]]:
+    """
+    Parse a config.ini rate limit such as ``4/minute``, ``1000/day:10`` or ``none``.
+
+    The optional ``:N`` suffix sets the burst size; by default the burst is the
+    full quota for per-second/per-minute limits and 10 for longer periods.
+    Returns None when the limit is disabled.
+    """
+    value = value.strip().lower()
+    if value in ('', 'none', 'off', 'unlimited', '0'):
+        return None
+
+    burst = None
+    if ':' in value:
+        value, burst_str = value.split(':', 1)
+        burst = int(burst_str)
+
+    requests_str, period_str = value.split('/', 1)
+    requests = int(requests_str)
+    period_str = period_str.strip()
+    if period_str.replace('.', '', 1).isdigit():
+        period = float(period_str)
+    else:
+        period = PERIODS[period_str.rstrip('s')]
+
+    if burst is None:
+        burst = requests if period <= 60 else min(requests, 10)
+    return requests, period, max(1, burst)
+
+
+class TokenBucket:
+    """Classic token bucket: refills ``rate`` tokens per second up to ``capacity``"""
+
+    def __init__(self, requests: int, period: float, burst: Optional[int] = None):
+        self.rate = requests / float(period)
+        self.capacity = float(burst or requests)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, max_wait: Optional[float] = None) -> Optional[float]:
+        """
+        Take one token, returning how long the caller must wait before using it.
+
+        The token is deducted immediately (the bucket may go negative), so
+        concurrent callers queue up behind each other instead of all waking
+        at once when the next token arrives. With ``max_wait``, nothing is
+        taken and None is returned if the wait would be longer.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            wait = max(0.0, (1 - self.tokens) / self.rate)
+            if max_wait is not None and wait > max_wait:
+                return None
+            self.tokens -= 1
+            return wait
+
+    def refund(self) -> None:
+        """Give back a token that was reserved but not used"""
+        with self._lock:
+            self.tokens = min(self.capacity, self.tokens + 1)
+
+    def drain(self, seconds: float) -> None:
+        """Empty the bucket so that no token is handed out for ``seconds``"""
+        with self._lock:
+            self.tokens = min(self.tokens, -seconds * self.rate)
+            self.updated = time.monotonic()
+
+
+class SQLiteBucketStore:
+    """Token bucket state shared between processes through a SQLite file"""
+
+    def __init__(self, db_file: str):
+        self.db_file = db_file
+        self._local = threading.local()
+        conn = self._connect()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS rate_buckets (
+                key TEXT PRIMARY KEY,
+                tokens REAL,
+                updated REAL
+            )
+        ''')
+        conn.commit()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_file, timeout=10, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def reserve(self, key: str, requests: int, period: float, burst: int, drain: float = 0.0,
+                max_wait: Optional[float] = None) -> Optional[float]:
+        """Atomically take one token (or drain the bucket) and return the wait in seconds
+
+        With ``max_wait``, nothing is taken and None is returned if the wait would be longer.
+        """
+        rate = requests / float(period)
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT tokens, updated FROM rate_buckets WHERE key = ?', (key,)).fetchone()
+            now = time.time()
+            if row:
+                tokens = min(float(burst), row[0] + max(0.0, now - row[1]) * rate)
+            else:
+                tokens = float(burst)
+
+            if drain:
+                tokens = min(tokens, -drain * rate)
+            elif max_wait is not None and (1 - tokens) / rate > max_wait:
+                conn.execute('ROLLBACK')
+                return None
+            else:
+                tokens -= 1
+
+            conn.execute('INSERT OR REPLACE INTO rate_buckets (key, tokens, updated) VALUES (?, ?, ?)',
+                         (key, tokens, now))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+        if drain or tokens >= 0:
+            return 0.0
+        return -tokens / rate
+
+    def refund(self, key: str, burst: int) -> None:
+        """Give back a token that was reserved but not used"""
+        conn = self._connect()
+        conn.execute('UPDATE rate_buckets SET tokens = MIN(?, tokens + 1) WHERE key = ?', (float(burst), key))
+
+
+class RateLimiter:
+    """Registry of token buckets keyed by source name"""
+
+    def __init__(self, limits: Optional[Dict[str, Optional[Tuple[int, float, int]]]] = None,
+                 state_file: Optional[str] = None):
+        """
+        Args:
+            limits: Overrides for DEFAULT_RATE_LIMITS; a value of None disables that limit
+            state_file: SQLite file for cross-process buckets (in-process only if omitted)
+        """
+        self.limits = {}
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self.set_limits(limits)
+
+        self._store = None
+        if state_file:
+            try:
+                self._store = SQLiteBucketStore(state_file)
+            except Exception as e:
+                print(f"Warning: Could not open shared rate limit state, using per-process limits: {e}")
+
+    def set_limits(self, limits: Optional[Dict[str, Optional[Tuple[int, float, int]]]] = None) -> None:
+        """Apply new limit overrides at runtime; buckets whose limit changed start over"""
+        effective = dict(DEFAULT_RATE_LIMITS)
+        if limits:
+            effective.update(limits)
+        effective = {k: v for k, v in effective.items() if v}
+        with self._lock:
+            for key in list(self._buckets):
+                if effective.get(key) != self.limits.get(key):
+                    del self._buckets[key]
+            self.limits = effective
+
+    @staticmethod
+    def limits_from_config(config) -> Dict[str, Optional[Tuple[int, float, int]]]:
+        """Limit overrides from the ``[rate_limits]`` section of a ConfigParser"""
+        limits = {}
+        if config.has_section('rate_limits'):
+            for key, value in config.items('rate_limits'):
+                if key == 'state_file':
+                    continue
+                try:
+                    limits[key] = parse_rate_limit(value)
+                except (ValueError, KeyError):
+                    print(f"Warning: Ignoring invalid rate limit for {key}: {value}")
+        return limits
+
+    @classmethod
+    def from_config(cls, config, default_state_file: Optional[str] = None):
+        """Build a limiter from the ``[rate_limits]`` section of a ConfigParser"""
+        state_file = default_state_file
+        if config.has_option('rate_limits', 'state_file'):
+            value = config.get('rate_limits', 'state_file')
+            state_file = os.path.expanduser(value) if value.strip() else None
+        return cls(cls.limits_from_config(config), state_file)
+
+    def _bucket(self, key):
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = TokenBucket(*self.limits[key])
+                self._buckets[key] = bucket
+            return bucket
+
+    def reserve(self, key: Optional[str], max_wait: Optional[float] = None) -> Optional[float]:
+        """
+        Reserve a token for ``key`` and return the required wait in seconds.
+
+        With ``max_wait``, no token is taken and None is returned when the
+        wait would be longer (the quota is exhausted for now).
+        """
+        if not key or key not in self.limits:
+            return 0.0
+        if self._store:
+            try:
+                return self._store.reserve(key, *self.limits[key], max_wait=max_wait)
+            except Exception:
+                pass  # Shared state unavailable (locked/corrupt) - fall back to this process
+        return self._bucket(key).reserve(max_wait)
+
+    def refund(self, key: Optional[str]) -> None:
+        """Return a reserved token whose request was skipped or cancelled"""
+        if not key or key not in self.limits:
+            return
+        if self._store:
+            try:
+                self._store.refund(key, self.limits[key][2])
+                return
+            except Exception:
+                pass
+        self._bucket(key).refund()
+
+    def penalize(self, key: Optional[str], seconds: Optional[float] = None) -> None:
+        """
+        Record an upstream 429 so every caller backs off.
+
+        Args:
+            key: Quota name
+            seconds: Retry-After value; defaults to one refill interval
+        """
+        if not key or key not in self.limits:
+            return
+        requests, period, burst = self.limits[key]
+        seconds = seconds if seconds else period / float(requests)
+        if self._store:
+            try:
+                self._store.reserve(key, requests, period, burst, drain=seconds)
+                return
+            except Exception:
+                pass
+        self._bucket(key).drain(seconds)
+
+    def acquire(self, key: Optional[str], timeout: Optional[float] = None,
+                cancelled: Optional[threading.Event] = None) -> bool:
+        """
+        Block the calling thread until a token for ``key`` is available.
+
+        Args:
+            key: Quota name
+            timeout: Longest wait in seconds (unbounded if omitted)
+            cancelled: Event that aborts the wait (the token is given back)
+
+        Returns:
+            True once the token is taken; False (nothing consumed) if it is not
+            available within ``timeout`` or the wait was cancelled
+        """
+        wait = self.reserve(key, timeout)
+        if wait is None:
+            return False
+        if wait > 0:
+            if cancelled is not None:
+                if cancelled.wait(wait):
+                    self.refund(key)
+                    return False
+            else:
+                time.sleep(wait)
+        return True
+
+    async def acquire_async(self, key: Optional[str], timeout: Optional[float] = None) -> bool:
+        """Wait (without blocking the event loop) until a token for ``key`` is available
+
+        Same contract as acquire(); a cancelled task gives its token back.
+        """
+        wait = self.reserve(key, timeout)
+        if wait is None:
+            return False
+        if wait > 0:
+            try:
+                await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                self.refund(key)
+                raise
+        return True
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Convert a Retry-After header (delta-seconds form) to seconds, or None"""
+    try:
+        return max(0.0, float(value)) if value else None
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Single-flight request coalescing
+When several callers ask for the same analysis at the same time, only the
+first one (the leader) runs it; the others wait and receive its result.
+
+Within a process followers wait on a threading.Event. Across processes
+(e.g. gunicorn workers) the leader holds an fcntl byte-range lock derived
+from the key and publishes its result to a shared SQLite table; followers
+poll the same lock and read the result once it is released. Followers wait
+at most the caller's timeout and then compute the result themselves.
+
+Results shared across processes travel as JSON. With cross-process
+coalescing enabled the leader returns the same JSON round trip as its
+followers (rebuilt with the caller's ``decode``), so every caller gets the
+same types whichever process computed the result.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Optional
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+from cache_db import SQLitePool
+
+
+class _Call:
+    """One in-flight computation inside this process"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key"""
+
+    RESULT_RETENTION = 300  # Seconds a published result stays in the shared table
+    LOCK_POLL_INTERVAL = 0.2  # Longest pause between attempts to take another worker's lock
+
+    # In-flight calls are process-wide so that separate instances (e.g. a checker
+    # rebuilt after an API key reload) still coalesce with each other.
+    _calls = {}
+    _lock = threading.Lock()
+
+    def __init__(self, state_file: Optional[str] = None):
+        """
+        Args:
+            state_file: Base path for the cross-process lock file and result table;
+                        coalescing is per-process only if omitted or fcntl is unavailable
+        """
+        self._lock_fd = None
+        self._results = None
+        if state_file and FCNTL_AVAILABLE:
+            try:
+                # A single descriptor per process: POSIX record locks are dropped
+                # when *any* descriptor for the file is closed by the process.
+                self._lock_fd = os.open(state_file + '.lock', os.O_RDWR | os.O_CREAT, 0o600)
+                self._results = SQLitePool(state_file, size=4)
+                self._results.script('''
+                    CREATE TABLE IF NOT EXISTS flight_results (
+                        key TEXT PRIMARY KEY,
+                        result TEXT,
+                        completed REAL
+                    )
+                ''')
+            except Exception as e:
+                print(f"Warning: Could not set up shared request coalescing, using per-process only: {e}")
+                self._lock_fd = None
+                self._results = None
+
+    def do(self, key, fn: Callable[[], Any], timeout: Optional[float] = None,
+           encode: Optional[Callable[[Any], Any]] = None,
+           decode: Optional[Callable[[Any], Any]] = None) -> Any:
+        """
+        Run ``fn`` unless an identical call is already in flight, and return its result.
+
+        Args:
+            key: JSON-serializable identity of the call (indicator, sources, options)
+            fn: Zero-argument callable doing the actual work
+            timeout: Seconds a follower waits for the leader before running ``fn``
+                     itself (None: as long as the leader takes)
+            encode: Turns the result into JSON-serializable data for other processes
+            decode: Rebuilds the result from that data (plain JSON values if omitted;
+                    values JSON cannot represent come back as strings)
+
+        Exceptions raised by the leader are re-raised in every in-process follower.
+        """
+        key = json.dumps(key, sort_keys=True, default=str)
+
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+
+        if not leader:
+            if not call.event.wait(timeout):
+                return fn()  # The leader is overdue; do not hold this caller past its deadline
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._do_shared(key, fn, timeout, encode, decode)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+    def _take_lock(self, offset: int, timeout: Optional[float]) -> bool:
+        """Take the byte-range lock at ``offset``, polling until ``timeout``; False if it stayed busy"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        delay = 0.01
+        while True:
+            try:
+                fcntl.lockf(self._lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB, 1, offset)
+                return True
+            except OSError:
+                pass
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return False
+            time.sleep(delay if remaining is None else min(delay, remaining))
+            delay = min(delay * 2, self.LOCK_POLL_INTERVAL)
+
+    @staticmethod
+    def _decode(data: str, decode: Optional[Callable[[Any], Any]]) -> Any:
+        value = json.loads(data)
+        return decode(value) if decode else value
+
+    def _do_shared(self, key: str, fn: Callable[[], Any], timeout: Optional[float],
+                   encode: Optional[Callable[[Any], Any]], decode: Optional[Callable[[Any], Any]]) -> Any:
+        """Coalesce with other processes through the lock file and result table"""
+        if self._lock_fd is None:
+            return fn()
+
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        offset = int(digest[:12], 16)
+        started = time.time()
+
+        locked = self._take_lock(offset, 0)
+        if not locked:
+            # Another worker is computing this key: wait for it, then reuse its result
+            locked = self._take_lock(offset, timeout)
+            if locked:
+                try:
+                    rows = self._results.query(
+                        'SELECT result FROM flight_results WHERE key = ? AND completed >= ?',
+                        (digest, started)
+                    )
+                except Exception:
+                    rows = []
+                if rows:
+                    fcntl.lockf(self._lock_fd, fcntl.LOCK_UN, 1, offset)
+                    return self._decode(rows[0][0], decode)
+            # The leader failed, could not publish or is overdue; compute it ourselves
+            # (without the lock if the leader still holds it)
+
+        try:
+            result = fn()
+            try:
+                data = json.dumps(encode(result) if encode else result, default=str)
+            except Exception as e:
+                print(f"Warning: Could not publish coalesced result: {e}")
+                return result
+            try:
+                now = time.time()
+                self._results.execute(
+                    'INSERT OR REPLACE INTO flight_results (key, result, completed) VALUES (?, ?, ?)',
+                    (digest, data, now)
+                )
+                self._results.execute('DELETE FROM flight_results WHERE completed < ?',
+                                      (now - self.RESULT_RETENTION,))
+            except Exception as e:
+                print(f"Warning: Could not publish coalesced result: {e}")
+            return self._decode(data, decode)  # The same form the followers receive
+        finally:
+            if locked:
+                fcntl.lockf(self._lock_fd, fcntl.LOCK_UN, 1, offset)
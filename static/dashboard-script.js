@@ -510,67 +510,32 @@ async function performSearch(type, value) {
 }
 
 async function performSearchWithProgress(endpoint, body, value) {
-    // Add initial progress messages
     addTerminalLine('info', '🚀 Iniciando análisis de dominio...');
-    await sleep(400);
-    
     addTerminalLine('info', '📡 Conectando con fuentes de inteligencia...');
-    await sleep(300);
+    addTerminalLine('info', '\n📊 Resultados por fuente:');
     
-    // Make actual API call
     const startTime = Date.now();
-    // Backend now handles parallelization with individual timeouts
-    const response = await fetch(endpoint, {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify(body)
-    });
-    
-    const data = await response.json();
-    if (!response.ok) throw new Error(data.error || 'Error en el análisis');
+    let data = null;
     
-    // Show results from each API source
-    addTerminalLine('info', '\n📊 Resultados por fuente:');
-    await sleep(200);
-    
-    if (data.results && data.results.length > 0) {
-        for (const result of data.results) {
-            await sleep(150);
-            
-            let statusIcon = '';
-            let statusType = 'info';
-            let statusText = '';
-            
-            // Determine status based on result
-            if (result.status === 'success' || result.status === 'clean') {
-                statusIcon = '✓';
-                statusType = 'success';
-                statusText = result.reputation ? `[${result.reputation.toUpperCase()}]` : '[OK]';
-            } else if (result.status === 'error') {
-                statusIcon = '✗';
-                statusType = 'error';
-                statusText = '[ERROR]';
-            } else if (result.status === 'suspicious' || result.status === 'malicious') {
-                statusIcon = '⚠';
-                statusType = 'warning';
-                statusText = `[${result.status.toUpperCase()}]`;
-            } else if (result.status === 'info') {
-                statusIcon = 'ℹ';
-                statusType = 'info';
-                statusText = '[INFO]';
-            } else {
-                statusIcon = '○';
-                statusType = 'info';
-                statusText = `[${result.status || 'N/A'}]`;
-            }
-            
-            const sourceName = result.source || 'Unknown';
-            const message = `${statusIcon} ${sourceName.padEnd(20)} ${statusText}`;
-            addTerminalLine(statusType, message);
+    // Stream each source as soon as it finishes; fall back to the single response
+    if (window.EventSource) {
+        try {
+            data = await streamDomainCheck(value);
+        } catch (err) {
+            if (!err.fallback) throw err;
         }
     }
-    
-    await sleep(300);
+    if (!data) {
+        const response = await fetch(endpoint, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify(body)
+        });
+        
+        data = await response.json();
+        if (!response.ok) throw new Error(data.error || 'Error en el análisis');
+        (data.results || []).forEach(addTerminalResultLine);
+    }
     
     // Show summary
     const elapsed = ((Date.now() - startTime) / 1000).toFixed(1);
@@ -580,17 +545,128 @@ async function performSearchWithProgress(endpoint, body, value) {
     addTerminalLine('info', '\n' + '─'.repeat(50));
     addTerminalLine('success', `✓ Análisis completado en ${elapsed}s`);
     addTerminalLine('info', `📊 Total: ${totalSources} fuentes | ✓ Exitosas: ${successCount}`);
+    if (data.partial) {
+        addTerminalLine('warning', '⚠ Algunas fuentes no respondieron a tiempo');
+    }
     addTerminalLine('info', `🎯 Reputación general: ${data.overall_reputation?.toUpperCase() || 'UNKNOWN'}`);
     
-    await sleep(800);
-    
-    // Display results (keep terminal visible)
+    // Display final results (keep terminal visible)
     displayResults('domain', data);
     
     currentAnalysisData = data;
     if (resetBtn) resetBtn.style.display = 'inline-flex';
 }
 
+// Open /api/check/stream and render every source card as it arrives.
+// Resolves with the same shape /api/check returns. Rejects with
+// err.fallback = true if the stream could not be opened at all.
+function streamDomainCheck(value) {
+    return new Promise((resolve, reject) => {
+        const source = new EventSource(`/api/check/stream?domain=${encodeURIComponent(value)}`);
+        const results = [];
+        let started = false;
+        
+        source.addEventListener('start', (e) => {
+            started = true;
+            startDomainResults(JSON.parse(e.data));
+        });
+        
+        source.addEventListener('result', (e) => {
+            const result = JSON.parse(e.data);
+            results.push(result);
+            addTerminalResultLine(result);
+            appendDomainResultCard(result);
+        });
+        
+        source.addEventListener('done', (e) => {
+            source.close();
+            resolve({ ...JSON.parse(e.data), results });
+        });
+        
+        source.addEventListener('analysis_error', (e) => {
+            source.close();
+            reject(new Error(JSON.parse(e.data).error || 'Error en el análisis'));
+        });
+        
+        // Connection failures (rate limit, proxy without streaming, network)
+        source.onerror = () => {
+            source.close();
+            const err = new Error('Se perdió la conexión con el servidor');
+            err.fallback = !started;
+            reject(err);
+        };
+    });
+}
+
+// Show the results panel with a pending verdict while sources stream in
+function startDomainResults(info) {
+    const container = resultsContainers.domain;
+    const overallRep = document.getElementById('overallReputation');
+    const resultsGrid = document.getElementById('resultsGrid');
+    const manualDiv = document.getElementById('manualInvestigation');
+    const manualGrid = document.getElementById('manualToolsGrid');
+    
+    if (container) container.style.display = 'block';
+    if (overallRep) {
+        overallRep.innerHTML = `
+            <h3>${info.type === 'hash' ? 'Hash' : 'Dominio'}: <span style="color: var(--text-primary);">${info.domain}</span></h3>
+            <div class="reputation-badge reputation-unknown">⏳ ANALIZANDO...</div>
+        `;
+    }
+    if (resultsGrid) resultsGrid.innerHTML = '';
+    if (manualGrid) manualGrid.innerHTML = '';
+    if (manualDiv) manualDiv.style.display = 'none';
+}
+
+// Add one streamed source card (manual investigation tools go to their own grid)
+function appendDomainResultCard(result) {
+    if (result.status === 'info') {
+        const manualDiv = document.getElementById('manualInvestigation');
+        const manualGrid = document.getElementById('manualToolsGrid');
+        if (manualDiv && manualGrid) {
+            manualDiv.style.display = 'block';
+            manualGrid.appendChild(createSourceCard(result));
+        }
+        return;
+    }
+    const resultsGrid = document.getElementById('resultsGrid');
+    if (resultsGrid) resultsGrid.appendChild(createSourceCard(result));
+}
+
+// One terminal line per source result
+function addTerminalResultLine(result) {
+    let statusIcon = '';
+    let statusType = 'info';
+    let statusText = '';
+    
+    // Determine status based on result
+    if (result.status === 'success' || result.status === 'clean') {
+        statusIcon = '✓';
+        statusType = 'success';
+        statusText = result.reputation ? `[${result.reputation.toUpperCase()}]` : '[OK]';
+    } else if (result.status === 'error') {
+        statusIcon = '✗';
+        statusType = 'error';
+        statusText = '[ERROR]';
+    } else if (result.status === 'suspicious' || result.status === 'malicious') {
+        statusIcon = '⚠';
+        statusType = 'warning';
+        statusText = `[${result.status.toUpperCase()}]`;
+    } else if (result.status === 'info') {
+        statusIcon = 'ℹ';
+        statusType = 'info';
+        statusText = '[INFO]';
+    } else {
+        statusIcon = '○';
+        statusType = 'info';
+        statusText = `[${result.status || 'N/A'}]`;
+    }
+    
+    const sourceName = result.source || 'Unknown';
+    const message = `${statusIcon} ${sourceName.padEnd(20)} ${statusText}`;
+    addTerminalLine(statusType, message);
+}
+
 function showError(type, message) {
     const error = errorMessages[type];
     if (error) {
@@ -1217,7 +1293,7 @@ async function loadHistory() {
     if (empty) empty.style.display = 'none';
     
     try {
-        const response = await fetch('/api/statistics');
+        const response = await fetch('/api/statistics?limit=200');
         const data = await response.json();
         
         historyData = data.recent_searches || [];
@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Search statistics store
+Every lookup is appended to an indexed SQLite history and the dashboard
+aggregates (counters, per-country reputation counts, hourly and daily
+histograms, most searched indicators) are bumped in the same transaction,
+so concurrent web workers never lose updates and /api/statistics reads
+small pre-aggregated tables instead of re-reading the whole history.
+
+A generation number moves with every write; it is what the statistics
+endpoint uses as its ETag, so an unchanged dashboard poll costs one row read.
+"""
+
+import json
+import os
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from cache_db import SQLitePool
+
+
+SUMMARY_KEYS = ['total', 'domains', 'ips', 'hashes', 'malicious', 'suspicious', 'clean']
+THREAT_REPUTATIONS = ('malicious', 'suspicious', 'questionable')  # Counted on the threat map
+
+# Histogram granularities as (bucket format over the ISO timestamp, buckets kept)
+TIMELINE_BUCKETS = {
+    'hour': (13, 24 * 30),   # '2024-05-01T13', 30 days of hours
+    'day': (10, 365 * 2),    # '2024-05-01', two years of days
+}
+
+AGGREGATES_VERSION = 2  # Bump when the aggregate tables change; they are rebuilt from history
+
+
+class StatsStore:
+    """Append-only search history with atomic, incrementally maintained aggregates"""
+
+    def __init__(self, db_file: str, legacy_file: Optional[str] = None):
+        """
+        Args:
+            db_file: Path to the statistics database
+            legacy_file: stats.json from older versions, imported once if present
+        """
+        self.db_file = db_file
+        self._db = SQLitePool(db_file, size=4)
+        self._db.script('''
+            CREATE TABLE IF NOT EXISTS searches (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp TEXT,
+                type TEXT,
+                target TEXT,
+                reputation TEXT,
+                country TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_searches_type ON searches (type, id);
+            CREATE INDEX IF NOT EXISTS idx_searches_target ON searches (target);
+            CREATE TABLE IF NOT EXISTS counters (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS country_reputation (
+                country TEXT,
+                reputation TEXT,
+                count INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (country, reputation)
+            );
+            CREATE TABLE IF NOT EXISTS timeline (
+                granularity TEXT,
+                bucket TEXT,
+                reputation TEXT,
+                count INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (granularity, bucket, reputation)
+            );
+            CREATE TABLE IF NOT EXISTS indicators (
+                target TEXT,
+                type TEXT,
+                count INTEGER NOT NULL DEFAULT 0,
+                last_seen TEXT,
+                last_reputation TEXT,
+                PRIMARY KEY (target, type)
+            );
+            CREATE INDEX IF NOT EXISTS idx_indicators_count ON indicators (count DESC);
+            CREATE TABLE IF NOT EXISTS stats_version (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                generation INTEGER NOT NULL,
+                updated REAL NOT NULL
+            );
+            INSERT OR IGNORE INTO stats_version (id, generation, updated) VALUES (1, 0, 0);
+            CREATE TABLE IF NOT EXISTS stats_meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            );
+            DROP TABLE IF EXISTS country_threats;
+        ''')
+        self._upgrade_aggregates()
+        if legacy_file and os.path.exists(legacy_file):
+            self._import_legacy(legacy_file)
+
+    @staticmethod
+    def _bump(conn, search_type: str, target: str, reputation: Optional[str],
+              country: Optional[str], timestamp: str) -> None:
+        """Update every aggregate for one search (inside the caller's transaction)"""
+        summary_key = 'hashes' if search_type == 'hash' else f"{search_type}s"
+        names = ['total', summary_key]
+        if reputation in ('malicious', 'suspicious', 'clean'):
+            names.append(reputation)
+        conn.executemany(
+            'INSERT INTO counters (name, value) VALUES (?, 1) '
+            'ON CONFLICT(name) DO UPDATE SET value = value + 1',
+            [(name,) for name in names]
+        )
+        StatsStore._bump_aggregates(conn, search_type, target, reputation, country, timestamp)
+
+    @staticmethod
+    def _bump_aggregates(conn, search_type: str, target: str, reputation: Optional[str],
+                         country: Optional[str], timestamp: Optional[str]) -> None:
+        """Per-country, histogram and indicator counts (the counters are kept separately)"""
+        if country:
+            conn.execute(
+                'INSERT INTO country_reputation (country, reputation, count) VALUES (?, ?, 1) '
+                'ON CONFLICT(country, reputation) DO UPDATE SET count = count + 1',
+                (country, reputation or 'unknown')
+            )
+        if timestamp:
+            conn.executemany(
+                'INSERT INTO timeline (granularity, bucket, reputation, count) VALUES (?, ?, ?, 1) '
+                'ON CONFLICT(granularity, bucket, reputation) DO UPDATE SET count = count + 1',
+                [(granularity, timestamp[:width], reputation or 'unknown')
+                 for granularity, (width, _) in TIMELINE_BUCKETS.items()]
+            )
+        conn.execute(
+            'INSERT INTO indicators (target, type, count, last_seen, last_reputation) VALUES (?, ?, 1, ?, ?) '
+            'ON CONFLICT(target, type) DO UPDATE SET count = count + 1, '
+            'last_seen = excluded.last_seen, last_reputation = excluded.last_reputation',
+            (target, search_type, timestamp, reputation)
+        )
+
+    @staticmethod
+    def _touch(conn) -> int:
+        """Advance the generation (ETag) and last-modified time; returns the new generation"""
+        conn.execute('UPDATE stats_version SET generation = generation + 1, updated = ? WHERE id = 1',
+                     (time.time(),))
+        return conn.execute('SELECT generation FROM stats_version WHERE id = 1').fetchone()[0]
+
+    @staticmethod
+    def _prune_timeline(conn) -> None:
+        """Drop histogram buckets that fell out of the kept window"""
+        for granularity, (width, keep) in TIMELINE_BUCKETS.items():
+            rows = conn.execute(
+                'SELECT DISTINCT bucket FROM timeline WHERE granularity = ? ORDER BY bucket DESC LIMIT 1 OFFSET ?',
+                (granularity, keep)
+            ).fetchall()
+            if rows:
+                conn.execute('DELETE FROM timeline WHERE granularity = ? AND bucket <= ?', (granularity, rows[0][0]))
+
+    def record(self, search_type: str, target: str, reputation: Optional[str],
+               country: Optional[str] = None, timestamp: Optional[str] = None) -> None:
+        """Append a search and update the aggregates atomically"""
+        with self._db.connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                timestamp = timestamp or datetime.now().isoformat()
+                conn.execute(
+                    'INSERT INTO searches (timestamp, type, target, reputation, country) VALUES (?, ?, ?, ?, ?)',
+                    (timestamp, search_type, target, reputation, country)
+                )
+                self._bump(conn, search_type, target, reputation, country, timestamp)
+                if self._touch(conn) % 1000 == 0:
+                    self._prune_timeline(conn)
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+
+    def summary(self) -> Dict[str, int]:
+        """Totals by search type and reputation"""
+        summary = {key: 0 for key in SUMMARY_KEYS}
+        summary.update(dict(self._db.query('SELECT name, value FROM counters')))
+        return summary
+
+    def recent(self, limit: int = 20, offset: int = 0, search_type: Optional[str] = None) -> List[dict]:
+        """Newest searches first"""
+        sql = 'SELECT timestamp, type, target, reputation, country FROM searches'
+        params = []
+        if search_type:
+            sql += ' WHERE type = ?'
+            params.append(search_type)
+        sql += ' ORDER BY id DESC LIMIT ? OFFSET ?'
+        params += [limit, offset]
+        return [
+            {'timestamp': timestamp, 'type': type_, 'target': target, 'reputation': reputation, 'country': country}
+            for timestamp, type_, target, reputation, country in self._db.query(sql, params)
+        ]
+
+    def version(self) -> Tuple[int, float]:
+        """(generation, last modified epoch) - changes whenever any statistic does"""
+        generation, updated = self._db.query('SELECT generation, updated FROM stats_version WHERE id = 1')[0]
+        return generation, updated
+
+    def threat_map(self, limit: int = 20) -> List[tuple]:
+        """(country, searches with a bad verdict) for the most affected countries"""
+        placeholders = ', '.join('?' for _ in THREAT_REPUTATIONS)
+        return [tuple(row) for row in self._db.query(
+            f'SELECT country, SUM(count) AS threats FROM country_reputation WHERE reputation IN ({placeholders}) '
+            'GROUP BY country ORDER BY threats DESC, country LIMIT ?', (*THREAT_REPUTATIONS, limit)
+        )]
+
+    def country_reputation(self) -> Dict[str, Dict[str, int]]:
+        """country -> reputation -> searches"""
+        by_country = {}
+        for country, reputation, count in self._db.query(
+                'SELECT country, reputation, count FROM country_reputation'):
+            by_country.setdefault(country, {})[reputation] = count
+        return by_country
+
+    def timeline(self, granularity: str = 'hour', buckets: int = 24) -> List[dict]:
+        """The latest ``buckets`` histogram buckets, oldest first: {'bucket', 'total', <reputation>: n}"""
+        rows = self._db.query(
+            'SELECT bucket, reputation, count FROM timeline WHERE granularity = ? AND bucket >= '
+            '(SELECT MIN(bucket) FROM (SELECT DISTINCT bucket FROM timeline WHERE granularity = ? '
+            'ORDER BY bucket DESC LIMIT ?)) ORDER BY bucket',
+            (granularity, granularity, buckets)
+        )
+        series = {}
+        for bucket, reputation, count in rows:
+            entry = series.setdefault(bucket, {'bucket': bucket, 'total': 0})
+            entry[reputation] = count
+            entry['total'] += count
+        return list(series.values())
+
+    def top_indicators(self, limit: int = 10) -> List[dict]:
+        """Most searched domains, IPs and hashes"""
+        return [
+            {'target': target, 'type': type_, 'count': count, 'last_seen': last_seen, 'reputation': reputation}
+            for target, type_, count, last_seen, reputation in self._db.query(
+                'SELECT target, type, count, last_seen, last_reputation FROM indicators '
+                'ORDER BY count DESC LIMIT ?', (limit,)
+            )
+        ]
+
+    def _upgrade_aggregates(self) -> None:
+        """Rebuild the per-search aggregates from history when their layout changed"""
+        with self._db.connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = conn.execute("SELECT value FROM stats_meta WHERE key = 'aggregates_version'").fetchone()
+                if row and int(row[0]) >= AGGREGATES_VERSION:
+                    conn.execute('COMMIT')
+                    return
+                conn.execute('DELETE FROM country_reputation')
+                conn.execute('DELETE FROM timeline')
+                conn.execute('DELETE FROM indicators')
+                for search_type, target, reputation, country, timestamp in conn.execute(
+                        'SELECT type, target, reputation, country, timestamp FROM searches ORDER BY id').fetchall():
+                    self._bump_aggregates(conn, search_type, target, reputation, country, timestamp)
+                conn.execute("INSERT OR REPLACE INTO stats_meta (key, value) VALUES ('aggregates_version', ?)",
+                             (str(AGGREGATES_VERSION),))
+                self._touch(conn)
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+
+    def _import_legacy(self, legacy_file: str) -> None:
+        """Copy history and counters from stats.json once (whichever worker gets there first)"""
+        with self._db.connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                if conn.execute("SELECT 1 FROM stats_meta WHERE key = 'legacy_imported'").fetchone():
+                    conn.execute('COMMIT')
+                    return
+                with open(legacy_file, 'r') as f:
+                    legacy = json.load(f)
+
+                # stats.json kept the newest 100 searches first
+                searches = list(reversed(legacy.get('searches', [])))
+                conn.executemany(
+                    'INSERT INTO searches (timestamp, type, target, reputation, country) VALUES (?, ?, ?, ?, ?)',
+                    [(s.get('timestamp'), s.get('type'), s.get('target'), s.get('reputation'), s.get('country'))
+                     for s in searches]
+                )
+                # Its summary covered every search ever made, not just the kept ones
+                conn.executemany(
+                    'INSERT INTO counters (name, value) VALUES (?, ?) '
+                    'ON CONFLICT(name) DO UPDATE SET value = value + excluded.value',
+                    [(key, int(value)) for key, value in legacy.get('summary', {}).items()
+                     if isinstance(value, (int, float))]
+                )
+                for s in searches:
+                    self._bump_aggregates(conn, s.get('type'), s.get('target'), s.get('reputation'),
+                                          s.get('country'), s.get('timestamp'))
+                conn.execute("INSERT INTO stats_meta (key, value) VALUES ('legacy_imported', ?)",
+                             (str(time.time()),))
+                self._touch(conn)
+                conn.execute('COMMIT')
+            except Exception as e:
+                conn.execute('ROLLBACK')
+                print(f"Warning: Could not import legacy statistics from {legacy_file}: {e}")
+                return
+        try:
+            os.replace(legacy_file, legacy_file + '.migrated')
+        except OSError:
+            pass
@@ -0,0 +1,146 @@
+import socket
+import struct
+import threading
+
+import pytest
+
+import dnsbl
+
+
+def answer(query: bytes, rcode: int = 0, addresses=(), query_id=None, qname=None) -> bytes:
+    """DNS response to ``query`` (question copied, answers compressed to the question name)"""
+    qid = struct.unpack('!H', query[:2])[0] if query_id is None else query_id
+    question = query[12:]
+    if qname is not None:
+        question = dnsbl.build_query(0, qname)[12:]
+    header = struct.pack('!HHHHHH', qid, 0x8180 | rcode, 1, len(addresses), 0, 0)
+    records = b''.join(
+        struct.pack('!HHHIH', 0xC00C, dnsbl.QTYPE_A, dnsbl.QCLASS_IN, 300, 4) + socket.inet_aton(a)
+        for a in addresses
+    )
+    return header + question + records
+
+
+class FakeResolver:
+    """UDP resolver on loopback answering each query with ``respond(query) -> [(packet, reply_socket)]``"""
+
+    def __init__(self, respond, host='127.0.0.1', family=socket.AF_INET):
+        self.respond = respond
+        self.sock = socket.socket(family, socket.SOCK_DGRAM)
+        self.sock.bind((host, 0))
+        self.sock.settimeout(0.1)
+        self.port = self.sock.getsockname()[1]
+        self.queries = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def _serve(self):
+        while not self._stop.is_set():
+            try:
+                query, client = self.sock.recvfrom(512)
+            except socket.timeout:
+                continue
+            self.queries.append(query)
+            for packet, sender in self.respond(query):
+                (sender or self.sock).sendto(packet, client)
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+        self.sock.close()
+
+
+@pytest.fixture
+def resolver():
+    servers = []
+
+    def start(respond, **kwargs):
+        server = FakeResolver(respond, **kwargs)
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.close()
+
+
+def test_query_name_encoding():
+    assert dnsbl.query_name('192.0.2.1', 'zen.spamhaus.org') == '1.2.0.192.zen.spamhaus.org'
+    assert dnsbl.query_name('2001:db8::1', 'bl.example') == (
+        '1.0.0.0.0.0.0.0.0.0.0.0.0.0.0.0.0.0.0.0.0.0.0.0.8.b.d.0.1.0.0.2.bl.example')
+
+
+def test_build_query_packet():
+    packet = dnsbl.build_query(0x1234, '1.2.0.192.zen.spamhaus.org')
+    assert packet[:12] == struct.pack('!HHHHHH', 0x1234, 0x0100, 1, 0, 0, 0)
+    assert packet[12:] == (b'\x011\x012\x010\x03192\x03zen\x08spamhaus\x03org\x00'
+                           + struct.pack('!HH', dnsbl.QTYPE_A, dnsbl.QCLASS_IN))
+
+
+def test_parse_answer():
+    query = dnsbl.build_query(7, '1.2.0.192.zen.spamhaus.org')
+    parsed = dnsbl.parse_response(answer(query, addresses=['127.0.0.2', '127.0.0.4']))
+    assert parsed == (7, '1.2.0.192.zen.spamhaus.org', dnsbl.RCODE_NOERROR, ['127.0.0.2', '127.0.0.4'])
+
+    verdict = dnsbl.decode('zen.spamhaus.org', parsed[3])
+    assert verdict['status'] == 'listed'
+    assert verdict['reasons'] == ['SBL - Spamhaus SBL data', 'XBL - CBL/exploited host']
+    assert dnsbl.decode('zen.spamhaus.org', ['127.255.255.254'])['status'] == 'error'
+
+
+def test_parse_nxdomain():
+    query = dnsbl.build_query(9, '1.2.0.192.bl.example')
+    assert dnsbl.parse_response(answer(query, rcode=dnsbl.RCODE_NXDOMAIN)) == (
+        9, '1.2.0.192.bl.example', dnsbl.RCODE_NXDOMAIN, [])
+
+
+def test_sweep_listed_and_clean(resolver):
+    def respond(query):
+        if b'\x06listed' in query:
+            return [(answer(query, addresses=['127.0.0.2']), None)]
+        return [(answer(query, rcode=dnsbl.RCODE_NXDOMAIN), None)]
+
+    server = resolver(respond)
+    results = dnsbl.sweep('192.0.2.1', ['listed.example', 'clean.example'],
+                          resolver=f'127.0.0.1:{server.port}', timeout=2)
+    assert results['listed.example'] == {'status': 'listed', 'codes': ['127.0.0.2'], 'reasons': ['Listed (127.0.0.2)']}
+    assert results['clean.example'] == {'status': 'clean'}
+
+
+def test_sweep_ignores_mismatched_ids_and_names(resolver):
+    def respond(query):
+        qid = struct.unpack('!H', query[:2])[0]
+        return [
+            (answer(query, addresses=['127.0.0.2'], query_id=qid ^ 0xFFFF), None),
+            (answer(query, addresses=['127.0.0.2'], qname='9.9.9.9.bl.example'), None),
+            (answer(query, rcode=dnsbl.RCODE_NXDOMAIN), None),
+        ]
+
+    server = resolver(respond)
+    results = dnsbl.sweep('192.0.2.1', ['bl.example'], resolver=f'127.0.0.1:{server.port}', timeout=2)
+    assert results == {'bl.example': {'status': 'clean'}}
+
+
+def test_sweep_ignores_answers_from_other_hosts(resolver):
+    spoofer = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        spoofer.bind(('127.0.0.2', 0))
+    except OSError:
+        pytest.skip('127.0.0.2 is not routable to loopback here')
+    try:
+        server = resolver(lambda query: [(answer(query, addresses=['127.0.0.2']), spoofer)])
+        results = dnsbl.sweep('192.0.2.1', ['bl.example'], resolver=f'127.0.0.1:{server.port}',
+                              timeout=0.5, retransmit=0.2)
+        assert results == {'bl.example': {'status': 'timeout'}}
+        assert len(server.queries) > 1  # Retransmitted while waiting
+    finally:
+        spoofer.close()
+
+
+def test_resolver_given_by_host_name(resolver):
+    family, _, _, _, sockaddr = socket.getaddrinfo('localhost', 0, type=socket.SOCK_DGRAM)[0]
+    server = resolver(lambda query: [(answer(query, rcode=dnsbl.RCODE_NXDOMAIN), None)],
+                      host=sockaddr[0], family=family)
+    results = dnsbl.sweep('192.0.2.1', ['bl.example'], resolver=f'localhost:{server.port}', timeout=2)
+    assert results == {'bl.example': {'status': 'clean'}}
@@ -0,0 +1,105 @@
+import os
+import time
+
+import pytest
+
+from feed_index import FeedIndex
+
+
+SHA256 = 'a' * 64
+
+THREATFOX_CSV = '''\
+################################################################
+# ThreatFox IOCs: CSV export
+################################################################
+# "first_seen_utc","ioc_id","ioc_value","ioc_type","threat_type","fk_malware","malware_alias","malware_printable","last_seen_utc","confidence_level","reference","tags","anonymous","reporter"
+"2024-01-01 00:00:00", "1", "203.0.113.7:443", "ip:port", "botnet_cc", "win.cobalt_strike", "", "Cobalt Strike", "", "100", "", "c2", "0", "abuse_ch"
+"2024-01-01 00:00:00", "2", "evil.example", "domain", "payload_delivery", "win.emotet", "", "Emotet", "", "75", "", "", "0", "abuse_ch"
+'''
+
+MALWAREBAZAAR_CSV = '''\
+# MalwareBazaar full data dump
+# "first_seen_utc","sha256_hash","md5_hash","sha1_hash","reporter","file_name","file_type_guess","mime_type","signature","clamav","vtpercent","imphash","ssdeep","tlsh"
+"2024-01-01 00:00:00", "{sha256}", "{md5}", "{sha1}", "abuse_ch", "invoice.exe", "exe", "application/x-dosexec", "AgentTesla", "n/a", "n/a", "n/a", "n/a", "n/a"
+'''.format(sha256=SHA256, md5='b' * 32, sha1='c' * 40)
+
+
+def write(path, text):
+    path.write_text(text, encoding='utf-8')
+    return str(path)
+
+
+@pytest.fixture
+def index(tmp_path):
+    feeds = {
+        'threatfox': write(tmp_path / 'threatfox.csv', THREATFOX_CSV),
+        'malwarebazaar': write(tmp_path / 'bazaar.csv', MALWAREBAZAAR_CSV),
+        'blocklist': write(tmp_path / 'blocklist.txt', '# Networks\n198.51.100.0/24\n2001:db8::/32\n'),
+    }
+    return FeedIndex(feeds, authoritative=['threatfox'])
+
+
+def test_exact_ip_match(index):
+    matches = index.lookup('203.0.113.7')
+    assert [(m['feed'], m['match']) for m in matches] == [('threatfox', 'exact')]
+    assert matches[0]['malware'] == 'Cobalt Strike'
+    assert matches[0]['confidence'] == 100
+    assert index.lookup('203.0.113.8') == []
+
+
+def test_cidr_range_match(index):
+    for ip in ('198.51.100.0', '198.51.100.77', '198.51.100.255', '2001:db8::1'):
+        assert [(m['feed'], m['match']) for m in index.lookup(ip)] == [('blocklist', 'network')], ip
+    assert index.lookup('198.51.101.1') == []
+
+
+def test_parent_domain_match(index):
+    assert [m['match'] for m in index.lookup('evil.example')] == ['exact']
+    assert [m['match'] for m in index.lookup('cdn.evil.example')] == ['parent']
+    assert index.lookup('notevil.example') == []
+
+
+def test_hash_match(index):
+    for value in (SHA256, SHA256.upper(), 'b' * 32, 'c' * 40):
+        matches = index.lookup(value)
+        assert [(m['feed'], m['match']) for m in matches] == [('malwarebazaar', 'exact')], value
+        assert matches[0]['malware'] == 'AgentTesla'
+    assert index.lookup('d' * 64) == []
+
+
+def test_covers_authoritative_feeds_only(index):
+    assert index.covers('threatfox')
+    assert not index.covers('malwarebazaar')
+
+
+def test_reload_after_file_change(tmp_path):
+    path = write(tmp_path / 'list.txt', 'first.example\n')
+    index = FeedIndex({'list': path})
+    assert index.lookup('first.example')
+    assert index.reload() is False
+
+    write(tmp_path / 'list.txt', 'second.example\n')
+    later = time.time() + 10
+    os.utime(path, (later, later))
+    assert index.reload() is True
+    assert index.lookup('first.example') == []
+    assert [m['match'] for m in index.lookup('second.example')] == ['exact']
+
+
+def test_refresh_thread_survives_unchanged_files(tmp_path):
+    path = write(tmp_path / 'list.txt', 'first.example\n')
+    index = FeedIndex({'list': path}, refresh_interval=0.05)
+    index.start()
+    try:
+        time.sleep(0.2)  # Several checks that find nothing new
+        assert index._maintenance.is_alive()
+
+        write(tmp_path / 'list.txt', 'second.example\n')
+        later = time.time() + 10
+        os.utime(path, (later, later))
+        deadline = time.monotonic() + 5
+        while not index.lookup('second.example') and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert index.lookup('second.example')
+    finally:
+        index.stop()
@@ -0,0 +1,121 @@
+import multiprocessing
+import threading
+import time
+
+import pytest
+
+from singleflight import FCNTL_AVAILABLE, SingleFlight
+
+
+class Result(dict):
+    """Stands in for AnalysisContext: a dict carrying an extra attribute"""
+
+    def __init__(self, values, stamp):
+        super().__init__(values)
+        self.stamp = stamp
+
+
+def encode(result):
+    return {'values': dict(result), 'stamp': result.stamp}
+
+
+def decode(data):
+    return Result(data['values'], data['stamp'])
+
+
+def _leader(state_file, started, release, outcome):
+    def fn():
+        started.set()
+        release.wait(10)
+        if outcome == 'fail':
+            raise RuntimeError('leader failed')
+        return Result({'verdict': 'clean', 'when': time.gmtime(0)}, 'leader')
+
+    try:
+        SingleFlight(state_file).do('key', fn, encode=encode, decode=decode)
+    except RuntimeError:
+        pass
+
+
+@pytest.fixture
+def leader(tmp_path):
+    if not FCNTL_AVAILABLE:
+        pytest.skip('cross-process coalescing needs fcntl')
+    context = multiprocessing.get_context('fork')
+    state_file = str(tmp_path / 'flights.db')
+    processes = []
+
+    def start(outcome='ok'):
+        started, release = context.Event(), context.Event()
+        process = context.Process(target=_leader, args=(state_file, started, release, outcome))
+        process.start()
+        processes.append((process, release))
+        assert started.wait(10)
+        return state_file, release
+
+    yield start
+    for process, release in processes:
+        release.set()
+        process.join(10)
+
+
+def test_in_process_followers_share_the_leader_result():
+    flights = SingleFlight()
+    calls = []
+    gate = threading.Event()
+
+    def fn():
+        calls.append(1)
+        gate.wait(5)
+        return {'verdict': 'clean'}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flights.do('key', fn))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    gate.set()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert results == [{'verdict': 'clean'}] * 5
+
+
+def test_cross_process_follower_gets_same_type_as_leader(leader):
+    state_file, release = leader()
+    threading.Timer(0.2, release.set).start()
+    follower = SingleFlight(state_file).do('key', lambda: pytest.fail('follower computed'), timeout=10,
+                                           encode=encode, decode=decode)
+
+    assert isinstance(follower, Result)
+    assert follower.stamp == 'leader'
+    assert follower['verdict'] == 'clean'
+    assert isinstance(follower['when'], list)  # JSON form, as the leader itself returns (below)
+
+    own = SingleFlight(state_file).do('other', lambda: Result({'when': time.gmtime(0)}, 'own'),
+                                      encode=encode, decode=decode)
+    assert isinstance(own, Result) and own.stamp == 'own'
+    assert own['when'] == follower['when']
+
+
+def test_cross_process_follower_stops_waiting_at_its_timeout(leader):
+    state_file, _ = leader()  # Never released while the follower waits
+    started = time.monotonic()
+    result = SingleFlight(state_file).do('key', lambda: Result({'verdict': 'own'}, 'own'), timeout=0.3,
+                                         encode=encode, decode=decode)
+    assert result.stamp == 'own'
+    assert time.monotonic() - started < 2
+
+
+def test_cross_process_follower_computes_when_leader_fails(leader):
+    state_file, release = leader('fail')
+    threading.Timer(0.2, release.set).start()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        return Result({'verdict': 'own'}, 'own')
+
+    result = SingleFlight(state_file).do('key', fn, timeout=10, encode=encode, decode=decode)
+    assert calls == [1]
+    assert result.stamp == 'own'
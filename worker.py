@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+"""
+Dedicated analysis worker
+Runs queued /api/jobs analyses without serving HTTP. Start as many as
+needed next to a web tier running with JOB_WORKERS=0.
+"""
+
+import argparse
+import os
+
+from app import get_job_queue
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run queued analysis jobs")
+    parser.add_argument('--workers', type=int, default=int(os.getenv('JOB_WORKERS', '8')),
+                        help='Worker threads in this process')
+    args = parser.parse_args()
+
+    queue = get_job_queue(workers=args.workers)
+    if queue is None:
+        raise SystemExit("Domain reputation checker not available")
+    print(f"Processing analysis jobs with {args.workers} workers (Ctrl+C to stop)")
+    queue.run_forever()